@@ -0,0 +1,248 @@
+"""
+Throughput benchmarks for FileEncryptor.
+
+Measures encrypt/decrypt MB/s and per-file latency over a range of synthetic
+file sizes, the cost of key derivation (cold and cached), directory mode at
+1..N workers and peak RSS per phase. Results are written as JSON so runs can
+be compared across commits.
+
+Usage:
+    python benchmarks/bench_encryption.py --max-size 256MB --output bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import Crypto
+from encryption import FileEncryptor, session_keys
+
+SIZES = ['1KB', '64KB', '1MB', '16MB', '256MB', '1GB', '10GB']
+UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+PASSWORD = "benchmark-password"
+
+
+def parse_size(text):
+    """Convert '64KB' style sizes to bytes"""
+    text = text.strip().upper()
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter so each phase is measured on its own (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes, or None if unavailable"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+def write_synthetic_file(path, size, block=os.urandom(1024 * 1024)):
+    """Write size bytes of incompressible data without holding it all in memory"""
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:min(len(block), remaining)])
+            remaining -= min(len(block), remaining)
+
+
+def summarize(latencies, size):
+    """Latency percentiles and throughput for a list of per-file timings"""
+    latencies = sorted(latencies)
+    total_time = sum(latencies)
+    return {
+        'files': len(latencies),
+        'mb_per_s': (size * len(latencies) / (1024 ** 2)) / total_time if total_time else None,
+        'latency_mean_ms': statistics.mean(latencies) * 1000,
+        'latency_p50_ms': latencies[len(latencies) // 2] * 1000,
+        'latency_p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def bench_kdf(encryptor, rounds):
+    """Time a cold PBKDF2 derivation and a cached lookup"""
+    cold = []
+    for _ in range(rounds):
+        session_keys.clear()
+        start = time.perf_counter()
+        encryptor.derive_key(PASSWORD)
+        cold.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        encryptor.derive_key(PASSWORD)
+    cached = (time.perf_counter() - start) / 1000
+
+    return {
+        'cold_mean_ms': statistics.mean(cold) * 1000,
+        'cached_mean_us': cached * 1e6,
+    }
+
+
+def bench_file_sizes(encryptor, work_dir, sizes, time_budget):
+    """Encrypt and decrypt single files of each size, repeating small sizes"""
+    results = []
+    for size in sizes:
+        path = os.path.join(work_dir, f"file_{size}.bin")
+        write_synthetic_file(path, size)
+        reset_peak_rss()
+
+        encrypt_times, decrypt_times = [], []
+        deadline = time.perf_counter() + time_budget
+        while True:
+            start = time.perf_counter()
+            encryptor.encrypt_file(path, path + '.enc')
+            encrypt_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            encryptor.decrypt_file(path + '.enc', path + '.out')
+            decrypt_times.append(time.perf_counter() - start)
+
+            if time.perf_counter() > deadline or len(encrypt_times) >= 1000:
+                break
+
+        results.append({
+            'size_bytes': size,
+            'encrypt': summarize(encrypt_times, size),
+            'decrypt': summarize(decrypt_times, size),
+            'peak_rss_bytes': peak_rss_bytes(),
+        })
+        for leftover in (path, path + '.enc', path + '.out'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        print(f"  {size:>12} B  encrypt {results[-1]['encrypt']['mb_per_s']:.1f} MB/s  "
+              f"decrypt {results[-1]['decrypt']['mb_per_s']:.1f} MB/s")
+    return results
+
+
+def bench_directory(encryptor, work_dir, file_count, file_size, max_workers):
+    """Encrypt and decrypt a directory of small files at increasing worker counts"""
+    directory = os.path.join(work_dir, 'directory')
+    os.makedirs(directory)
+    for i in range(file_count):
+        write_synthetic_file(os.path.join(directory, f"doc_{i}.txt"), file_size)
+
+    worker_counts = sorted({1, 2, 4, 8, 16, max_workers} & set(range(1, max_workers + 1)))
+    results = []
+    for workers in worker_counts:
+        reset_peak_rss()
+
+        start = time.perf_counter()
+        encrypted = encryptor.encrypt_directory(directory, password=PASSWORD, workers=workers)
+        encrypt_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decrypted = encryptor.decrypt_directory(directory, password=PASSWORD, workers=workers)
+        decrypt_time = time.perf_counter() - start
+
+        results.append({
+            'workers': workers,
+            'files': file_count,
+            'file_size_bytes': file_size,
+            'encrypt_files_per_s': len(encrypted['encrypted']) / encrypt_time,
+            'decrypt_files_per_s': len(decrypted['decrypted']) / decrypt_time,
+            'failed': len(encrypted['failed']) + len(decrypted['failed']),
+            'peak_rss_bytes': peak_rss_bytes(),
+        })
+        print(f"  {workers:>2} workers  encrypt {results[-1]['encrypt_files_per_s']:.0f} files/s  "
+              f"decrypt {results[-1]['decrypt_files_per_s']:.0f} files/s")
+
+    shutil.rmtree(directory)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark DocuVault file encryption")
+    parser.add_argument('--max-size', default='256MB',
+                        help="Largest synthetic file size to benchmark (up to 10GB)")
+    parser.add_argument('--time-budget', type=float, default=2.0,
+                        help="Seconds spent repeating each file size")
+    parser.add_argument('--kdf-rounds', type=int, default=3,
+                        help="Cold key derivations to average")
+    parser.add_argument('--dir-files', type=int, default=1000,
+                        help="Number of files in the directory benchmark")
+    parser.add_argument('--dir-file-size', default='4KB',
+                        help="Size of each file in the directory benchmark")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1,
+                        help="Largest worker count for directory mode")
+    parser.add_argument('--codec', default='none',
+                        help="Compression before encryption: none, auto, zlib or lzma")
+    parser.add_argument('--work-dir', default=None,
+                        help="Scratch directory (defaults to a temporary directory)")
+    parser.add_argument('--output', default='bench_results.json',
+                        help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    max_size = parse_size(args.max_size)
+    sizes = [parse_size(size) for size in SIZES if parse_size(size) <= max_size]
+
+    work_dir = tempfile.mkdtemp(prefix='docuvault-bench-', dir=args.work_dir)
+    encryptor = FileEncryptor()
+    encryptor.key_file = os.path.join(work_dir, 'keys.json')
+    encryptor.set_master_password(PASSWORD)
+    encryptor.codec = args.codec
+
+    try:
+        print("Key derivation")
+        kdf = bench_kdf(encryptor, args.kdf_rounds)
+        print(f"  cold {kdf['cold_mean_ms']:.0f} ms  cached {kdf['cached_mean_us']:.1f} us")
+
+        print("File sizes")
+        file_sizes = bench_file_sizes(encryptor, work_dir, sizes, args.time_budget)
+
+        print("Directory mode")
+        directory = bench_directory(encryptor, work_dir, args.dir_files,
+                                    parse_size(args.dir_file_size), args.max_workers)
+    finally:
+        session_keys.clear()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pycryptodome': Crypto.__version__,
+        'codec': args.codec,
+        'kdf': kdf,
+        'file_sizes': file_sizes,
+        'directory': directory,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,13 @@ import sqlite3
 import subprocess
 import requests
 from utility import CustomDirectoryDialog, CustomFileDialog, compare_path, txt_from_pdf
-from database import log_action
+from database import log_action, set_user_automation_folder
 from filemanager import FileManager, allow_access, restrict_access
 from encryption import FileEncryptor
+from watcher import file_watcher
+from queue import Queue, Empty
 import subprocess
 import tempfile
-import time
 import threading
 import os
 from datetime import timedelta,datetime
@@ -120,7 +121,11 @@ class AutomationWindow(tk.Toplevel):
         """Initialize the encryption system"""
         self.encryptor = FileEncryptor()
         self.encrypted_files = {}  # Track opened encrypted files
-        self.file_watchers = {}    # Track file watchers for auto-encryption
+        self.file_watchers = {}    # Temp files handed to the shared watcher -> encrypted original
+        self.watcher_results = Queue()  # (temp_file, error) posted by the watcher thread
+        # Release in-memory decrypted copies however the window goes away
+        self.bind("<Destroy>", self.on_destroy, add="+")
+        self.watcher_poll_pending = False
         
     def encrypt_selected_files(self):
         """Encrypt selected files in the automation folder"""
@@ -144,7 +149,7 @@ class AutomationWindow(tk.Toplevel):
                 file_path = item_values[1]
                 
                 # Skip already encrypted files
-                if file_path.endswith('.enc'):
+                if self.encryptor.is_file_encrypted(file_path):
                     continue
                     
                 try:
@@ -183,7 +188,7 @@ class AutomationWindow(tk.Toplevel):
                 file_path = item_values[1]
                 
                 # Skip non-encrypted files
-                if not file_path.endswith('.enc'):
+                if not self.encryptor.is_file_encrypted(file_path):
                     continue
                     
                 try:
@@ -425,16 +430,8 @@ class AutomationWindow(tk.Toplevel):
             os.makedirs(self.automation_folder, exist_ok=True)
             
             # Update database
-            conn = sqlite3.connect('docuvault.db')
-            conn.execute('PRAGMA foreign_keys = ON')
-            cursor = conn.cursor()
-            
             try:
-                cursor.execute(
-                    'UPDATE users SET automation_folder = ? WHERE username = ?',
-                    (self.automation_folder, self.username)
-                )
-                conn.commit()
+                set_user_automation_folder(self.username, self.automation_folder).result()
                 
                 # Update parent if it's the FileManagerGUI
                 if hasattr(self.parent, 'update_automation_folder'):
@@ -442,8 +439,6 @@ class AutomationWindow(tk.Toplevel):
                     
             except sqlite3.Error as e:
                 messagebox.showerror("Database Error", f"Update failed: {str(e)}")
-            finally:
-                conn.close()
                 
             # Recreate the UI now that we have an automation folder
             for widget in self.winfo_children():
@@ -553,7 +548,9 @@ class AutomationWindow(tk.Toplevel):
                     if os.path.isfile(item_path):
                         # Add icon based on file type
                         ext = os.path.splitext(item)[1].lower()
-                        if ext in ['.txt', '.doc', '.docx', '.pdf']:
+                        if self.encryptor.is_file_encrypted(item_path):
+                            icon = "🔒 "  # Encrypted file icon
+                        elif ext in ['.txt', '.doc', '.docx', '.pdf']:
                             icon = "📄 "  # Document icon
                         elif ext in ['.jpg', '.jpeg', '.png', '.gif']:
                             icon = "🖼️ "  # Image icon
@@ -642,6 +639,8 @@ class AutomationWindow(tk.Toplevel):
                     context_menu.add_separator()
                     # Check if the file is encrypted
                     if self.encryptor.is_file_encrypted(item_path):
+                        context_menu.add_command(label="Preview", command=lambda: self.preview_encrypted_file(item_path))
+                        context_menu.add_command(label="Open Read-Only", command=lambda: self.open_file(item_path, read_only=True))
                         context_menu.add_command(label="Decrypt", command=self.decrypt_selected_files)
                     else:
                         context_menu.add_command(label="Encrypt", command=self.encrypt_selected_files)
@@ -697,10 +696,15 @@ class AutomationWindow(tk.Toplevel):
         self.grab_release()  # Release modal grab if any
         self.destroy()
 
-    def open_file(self, item_path):
+    def on_destroy(self, event):
+        """Close the sealed memory copies when the window itself (not a child widget) is destroyed"""
+        if event.widget is self:
+            self.encryptor.close_memory_views()
+
+    def open_file(self, item_path, read_only=False):
         """Override open_file to handle encrypted files"""
         # Check if the file is encrypted
-        is_encrypted = item_path.endswith('.enc')
+        is_encrypted = self.encryptor.is_file_encrypted(item_path)
         
         if is_encrypted:
             # Get master password if not set
@@ -713,13 +717,23 @@ class AutomationWindow(tk.Toplevel):
                 self.encryptor.set_master_password(password)
                 
             try:
-                # Decrypt to a temporary file
-                temp_file = self.encryptor.decrypt_file(item_path, temp=True)
+                # Decrypt into memory (read-only) or the private viewing directory
+                temp_file = self.encryptor.decrypt_for_viewing(item_path, read_only=read_only)
                 
                 # Open the temporary file
                 if os.path.isfile(temp_file):
                     success, message = self.file_manager.open_file(temp_file)
                     
+                    if temp_file in self.encryptor.memory_views:
+                        # Sealed copy: nothing to watch or re-encrypt
+                        if not success:
+                            messagebox.showerror("Error", message)
+                        elif not read_only:
+                            messagebox.showinfo("Read-only",
+                                                "No in-memory location is available for an editable copy, "
+                                                "so the file was opened read-only.")
+                        return
+                        
                     if not success:
                         messagebox.showerror("Error", message)
                         # Clean up temp file if open fails
@@ -727,7 +741,15 @@ class AutomationWindow(tk.Toplevel):
                         return
                         
                     # Start a file watcher to monitor when the file is closed
-                    self.start_file_watcher(temp_file, item_path)
+                    try:
+                        self.start_file_watcher(temp_file, item_path)
+                    except OSError as e:
+                        # e.g. the inotify watch limit; don't leave untracked plaintext behind
+                        self.encryptor.cleanup_temp_file(temp_file)
+                        messagebox.showerror("File Watcher Error",
+                                             "Could not watch the decrypted copy for changes, so it was "
+                                             f"removed rather than left on disk unattended.\n\n{str(e)}")
+                        return
                     
                     # Track the opened encrypted file
                     self.encrypted_files[temp_file] = item_path
@@ -747,53 +769,83 @@ class AutomationWindow(tk.Toplevel):
             else:
                 messagebox.showinfo("Info", "Selected item cannot be opened")
             
+    def preview_encrypted_file(self, item_path, preview_bytes=64 * 1024):
+        """Show the beginning of an encrypted file, decrypting only the chunks it touches"""
+        if not hasattr(self.encryptor, 'master_password') or not self.encryptor.master_password:
+            password = simpledialog.askstring("Decryption Password", 
+                                            "Enter decryption password:", 
+                                            show='*')
+            if not password:
+                return
+            self.encryptor.set_master_password(password)
+            
+        try:
+            with self.encryptor.open_encrypted(item_path) as reader:
+                data = reader.read(preview_bytes)
+                total_size = reader.size
+        except ValueError as e:
+            messagebox.showinfo("Preview", f"Preview not available: {str(e)}")
+            return
+        except Exception as e:
+            messagebox.showerror("Decryption Error", f"Failed to preview file: {str(e)}")
+            return
+            
+        if b'\x00' in data:
+            text = f"Binary file ({total_size} bytes) - open it to view its contents."
+        else:
+            text = data.decode('utf-8', errors='replace')
+            if total_size > len(data):
+                text += f"\n\n... ({total_size - len(data)} more bytes)"
+                
+        preview_window = tk.Toplevel(self)
+        preview_window.title(f"Preview - {os.path.basename(item_path)}")
+        preview_window.geometry("700x500")
+        
+        text_widget = tk.Text(preview_window, wrap=tk.WORD)
+        scrollbar = ttk.Scrollbar(preview_window, orient="vertical", command=text_widget.yview)
+        text_widget.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        text_widget.pack(expand=True, fill=tk.BOTH)
+        
+        text_widget.insert("1.0", text)
+        text_widget.configure(state="disabled")
+            
     def start_file_watcher(self, temp_file, original_encrypted_file):
-        """Start a thread to watch for file modifications and handle re-encryption"""
-        if temp_file in self.file_watchers:
-            # Stop existing watcher
-            self.file_watchers[temp_file]['running'] = False
+        """Have the shared watcher re-encrypt temp_file once it has been left alone (raises OSError on failure)"""
+        file_watcher.watch(temp_file, self.reencrypt_idle_file, inactivity=10)
+        self.file_watchers[temp_file] = original_encrypted_file
+        if not self.watcher_poll_pending:
+            self.watcher_poll_pending = True
+            self.after(500, self.poll_watcher_results)
             
-        # Create a new watcher thread
-        watcher_data = {'running': True, 'last_modified': os.path.getmtime(temp_file)}
-        self.file_watchers[temp_file] = watcher_data
+    def reencrypt_idle_file(self, temp_file):
+        """Runs on the watcher thread: re-encrypt and remove a file nobody is writing to"""
+        error = None
+        try:
+            # Only changed chunks are re-sealed; a file that was just viewed costs nothing
+            self.encryptor.release_temp_file(temp_file)
+        except Exception as e:
+            error = e
+        self.watcher_results.put((temp_file, error))
         
-        def watch_file():
-            check_interval = 2  # seconds
-            inactivity_threshold = 10  # seconds
-            last_activity = time.time()
-            
-            while watcher_data['running']:
-                try:
-                    if os.path.exists(temp_file):
-                        current_mtime = os.path.getmtime(temp_file)
-                        
-                        # Check if file was modified
-                        if current_mtime != watcher_data['last_modified']:
-                            watcher_data['last_modified'] = current_mtime
-                            last_activity = time.time()
-                        
-                        # Check if file has been inactive for the threshold period
-                        if time.time() - last_activity > inactivity_threshold:
-                            # Re-encrypt the file
-                            try:
-                                self.encryptor.encrypt_file(temp_file, original_encrypted_file)
-                                # Remove the temp file
-                                os.remove(temp_file)
-                                # Remove from tracking
-                                if temp_file in self.encrypted_files:
-                                    del self.encrypted_files[temp_file]
-                                # Stop the watcher
-                                watcher_data['running'] = False
-                                break
-                            except Exception as e:
-                                messagebox.showerror('Error', f"Error re-encrypting file: {str(e)}")
-                    else:
-                        # File no longer exists, stop watching
-                        watcher_data['running'] = False
-                        break
-                except Exception as e:
-                    messagebox.showerror('Error',f"Error in file watcher: {str(e)}")
-                time.sleep(check_interval)
+    def poll_watcher_results(self):
+        """Apply re-encryption results on the Tk thread"""
+        if not self.winfo_exists():
+            return
+        while True:
+            try:
+                temp_file, error = self.watcher_results.get_nowait()
+            except Empty:
+                break
+            self.file_watchers.pop(temp_file, None)
+            self.encrypted_files.pop(temp_file, None)
+            if error is not None:
+                messagebox.showerror('Error', f"Error re-encrypting file: {str(error)}")
+                
+        if self.file_watchers:
+            self.after(500, self.poll_watcher_results)
+        else:
+            self.watcher_poll_pending = False
 
     def open_with(self, item_path):
         """Open a file with a selected application"""
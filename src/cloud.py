@@ -1,6 +1,5 @@
 import os
 import time
-import sqlite3
 import nc_py_api
 from tkinter import messagebox
 from threading import Thread
@@ -10,7 +9,7 @@ import bcrypt
 import hashlib
 import base64
 from math import log
-from database import log_action
+from database import log_action, cloud_credentials, CloudCredentials
 
 class CloudManager:
     def __init__(self, username, gui_callback=None):
@@ -24,39 +23,21 @@ class CloudManager:
         self.salt = None
         self.nc = None # Nextcloud connection instance
         self.search_queue = Queue() # Used for threaded search results
-        self._init_db()
         self._load_credentials()
 
-    def _init_db(self):
-        """Create table for secure storage of cloud credentials if it doesn't exist."""
-        with sqlite3.connect('docuvault.db') as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS cloud_credentials
-                (username TEXT PRIMARY KEY,
-                server_url TEXT,
-                encrypted_user BLOB,
-                encrypted_pass BLOB,
-                encryption_salt BLOB)
-            ''')
-            conn.commit()
-
     def _get_salt(self):
         """
         Retrieve or generate an encryption salt for this user.
         This salt is used in key derivation.
         """
-        with sqlite3.connect('docuvault.db') as conn:
-            result = conn.execute(
-                'SELECT encryption_salt FROM cloud_credentials WHERE username = ?',
-                (self.username,)
-            ).fetchone()
-        if not result:
+        stored = cloud_credentials.get(self.username)
+        if not stored:
             if self.salt:
                 return self.salt
             new_salt = os.urandom(16)
             self.salt = new_salt
             return new_salt
-        return result[0]
+        return stored.encryption_salt
 
     def _get_encryption_key(self, master_password):
         """
@@ -95,42 +76,22 @@ class CloudManager:
         encrypted_user = cipher.encrypt(cloud_user.encode())
         encrypted_pass = cipher.encrypt(cloud_pass.encode())
         
-        with sqlite3.connect('docuvault.db') as conn:
-            cursor = conn.cursor()
-            
-            # First check if the username already exists
-            cursor.execute("SELECT COUNT(*) FROM cloud_credentials WHERE username = ?", (self.username,))
-            result = cursor.fetchone()
-            
-            # If the username doesn't exist (count is 0), insert the new record
-            if result[0] == 0:
-                conn.execute('''INSERT INTO cloud_credentials 
-                            VALUES (?, ?, ?, ?, ?)''',
-                            (self.username, server_url, encrypted_user,
-                            encrypted_pass, self._get_salt()))
-                conn.commit()
-                messagebox.showinfo("Cloud Info", "Cloud credentials stored securely.")
-            
-            else:
-                confirm = messagebox.askyesno("Cloud Info","Cloud credentials already exist. Do you want to update?")
-                if confirm:
-                    conn.execute('''UPDATE cloud_credentials 
-                                SET server_url = ?, encrypted_user = ?, encrypted_pass = ?, encryption_salt = ?
-                                WHERE username = ?''',
-                                (server_url, encrypted_user, encrypted_pass, self._get_salt(), self.username))
-                    conn.commit()
-                    messagebox.showinfo("Cloud Info", "Cloud credentials stored securely.")
+        credentials = CloudCredentials(server_url, encrypted_user, encrypted_pass, self._get_salt())
+        
+        # Ask before replacing credentials that already exist
+        if cloud_credentials.get(self.username) is not None:
+            confirm = messagebox.askyesno("Cloud Info","Cloud credentials already exist. Do you want to update?")
+            if not confirm:
+                return
+        cloud_credentials.save(self.username, credentials)
+        messagebox.showinfo("Cloud Info", "Cloud credentials stored securely.")
 
     def _load_credentials(self):
         """
         Load and decrypt stored credentials from the database.
         Then, initiate a Nextcloud connection.
         """
-        with sqlite3.connect('docuvault.db') as conn:
-            data = conn.execute(
-                'SELECT server_url, encrypted_user, encrypted_pass FROM cloud_credentials WHERE username = ?',
-                (self.username,)
-            ).fetchone()
+        data = cloud_credentials.get(self.username)
         if not data:
             messagebox.showinfo("Cloud Info", "No matching Cloud credentials found. Please setup Cloud.")
             return
@@ -142,9 +103,9 @@ class CloudManager:
             fernet_key = base64.urlsafe_b64encode(hashlib.sha256(key).digest())
             cipher = Fernet(fernet_key)
             try:
-                self.server_url = data[0]
-                self.nc_user = cipher.decrypt(data[1]).decode()
-                self.nc_pass = cipher.decrypt(data[2]).decode()
+                self.server_url = data.server_url
+                self.nc_user = cipher.decrypt(data.encrypted_user).decode()
+                self.nc_pass = cipher.decrypt(data.encrypted_pass).decode()
                 self.connect()
             except Exception as e:
                 self.schedule_ui(self.gui.show_error, f"Decryption Error: Wrong master password")
@@ -1,5 +1,7 @@
 import tkinter as tk
 import os
+import queue
+import threading
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import customtkinter as ctk
@@ -8,6 +10,91 @@ import numpy as np
 from PIL import Image, ImageTk
 from tkinter import messagebox
 from utility import CustomDirectoryDialog
+from diskusage import disk_usage
+from database import get_activity_summary_async
+
+
+class BlittedPieChart:
+    """Donut chart embedded in Tk that redraws its wedges by blitting.
+
+    The figure is fully drawn once to capture an empty background; data
+    updates only restore that background and draw the animated artists on
+    top of it instead of re-rendering the whole FigureCanvasTkAgg.
+    """
+
+    def __init__(self, master, figsize=(3.5, 3), dpi=100):
+        self.fig, self.ax = plt.subplots(figsize=figsize, dpi=dpi)
+        self.fig.patch.set_facecolor('none')
+        self.ax.set_facecolor('none')
+        self.ax.set(frame_on=False, xticks=[], yticks=[],
+                    xlim=(-1.25, 1.25), ylim=(-1.25, 1.25), aspect='equal')
+
+        self.artists = []
+        self.background = None
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        # Re-capture the background whenever a full draw happens (e.g. resize)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.draw()
+
+        self.show_message("Loading...")
+
+    def get_tk_widget(self):
+        return self.canvas.get_tk_widget()
+
+    def on_draw(self, event):
+        """Cache the static background and paint the animated artists over it"""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    def show_message(self, text):
+        """Show a placeholder message in place of the chart"""
+        message = self.ax.text(0, 0, text, ha='center', va='center', fontsize=9, color='gray')
+        self.replace_artists([message])
+
+    def update(self, data):
+        """Replace the chart contents with a new {label: count} mapping"""
+        wedges, texts, autotexts = self.ax.pie(
+            data.values(),
+            labels=None,
+            autopct='%1.1f%%',
+            startangle=90,
+            shadow=False,
+            colors=plt.cm.tab10.colors[:len(data)],
+            wedgeprops={'width': 0.5, 'edgecolor': 'white', 'linewidth': 1},
+            textprops={'fontsize': 8, 'fontweight': 'bold'}
+        )
+
+        # Legend sits outside the axes, so blitting covers the whole figure
+        legend = self.ax.legend(
+            wedges,
+            data.keys(),
+            title="File Types",
+            loc="center left",
+            bbox_to_anchor=(1, 0, 0.5, 1),
+            fontsize=7
+        )
+        self.replace_artists(list(wedges) + list(texts) + list(autotexts) + [legend])
+
+    def replace_artists(self, artists):
+        """Swap the animated artists and blit them onto the cached background"""
+        for artist in self.artists:
+            artist.remove()
+        for artist in artists:
+            artist.set_animated(True)
+        self.artists = artists
+        self.blit()
+
+    def blit(self):
+        if self.background is None:
+            return
+        self.canvas.restore_region(self.background)
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+        self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
+
 
 class Dashboard:
     def __init__(self, parent, first_time=True):
@@ -18,6 +105,10 @@ class Dashboard:
         self.parent = parent
         self.first_time = first_time
         self.callback_ids = [] # Track scheduled callbacks
+        self.results = queue.Queue() # (panel, success, value) from background loaders
+        self.pending_panels = set()
+        self.panel_renderers = {}
+        self.ticks = 0 # Seconds since the dashboard opened
         
         # Create more compact window
         self.dashboard_window = ctk.CTkToplevel(parent.root)
@@ -63,10 +154,59 @@ class Dashboard:
         # Create right panel with chart and storage
         self.create_right_panel()
         
+        # Create bottom panel with activity trends
+        self.create_activity_panel()
+        
+        # Panels start as skeletons; fill them in as background work completes
+        self.load_in_background('stats', self.compute_file_stats, self.fill_stats)
+        self.load_in_background('chart', self.get_file_type_distribution, self.fill_chart)
+        self.load_in_background('storage', lambda: self.get_disk_usage(os.path.expanduser("~")),
+                                self.fill_storage)
+        self.load_in_background('mounts', disk_usage.all_usage, self.fill_mounts)
+        self.load_in_background('activity', lambda: get_activity_summary_async(self.parent.username).result(),
+                                self.fill_activity)
+        
         # Schedule updates
         update_id = self.dashboard_window.after(1000, self.update_time)
         self.callback_ids.append(update_id)
     
+    def load_in_background(self, panel, compute, render):
+        """Run compute() on a worker thread and hand its result to render() on the Tk thread"""
+        if not self.pending_panels:
+            poll_id = self.dashboard_window.after(50, self.poll_results)
+            self.callback_ids.append(poll_id)
+        self.pending_panels.add(panel)
+        self.panel_renderers[panel] = render
+        
+        def worker():
+            try:
+                self.results.put((panel, True, compute()))
+            except Exception as e:
+                self.results.put((panel, False, e))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def poll_results(self):
+        """Drain finished background computations and render their panels"""
+        if not self.dashboard_window.winfo_exists():
+            return
+            
+        while True:
+            try:
+                panel, success, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending_panels.discard(panel)
+            try:
+                self.panel_renderers[panel](value if success else None)
+            except tk.TclError:
+                # Widgets were destroyed while the result was in flight
+                return
+                
+        if self.pending_panels:
+            poll_id = self.dashboard_window.after(50, self.poll_results)
+            self.callback_ids.append(poll_id)
+    
     def toggle_fullscreen(self):
         """Toggle between fullscreen and normal window mode"""
         if self.dashboard_window.attributes('-fullscreen'):
@@ -80,6 +220,14 @@ class Dashboard:
             current_time = datetime.now().strftime("%H:%M:%S")
             self.time_label.configure(text=current_time)
             
+        # Refresh storage from the disk usage cache once it goes stale
+        self.ticks += 1
+        if self.ticks % max(1, int(disk_usage.ttl)) == 0 and 'storage' not in self.pending_panels:
+            self.load_in_background('storage', lambda: self.get_disk_usage(os.path.expanduser("~")),
+                                    self.fill_storage)
+        if self.ticks % max(1, int(disk_usage.ttl)) == 0 and 'mounts' not in self.pending_panels:
+            self.load_in_background('mounts', disk_usage.all_usage, self.fill_mounts)
+            
         # Schedule next update
         if hasattr(self, 'dashboard_window') and self.dashboard_window.winfo_exists():
             update_id = self.dashboard_window.after(1000, self.update_time)
@@ -136,11 +284,6 @@ class Dashboard:
         )
         title.pack(pady=(5, 10))
         
-        # Get file counts
-        home_dir = os.path.join(os.path.expanduser("~"), r"OneDrive\Desktop")
-        text_count, image_count, video_count = self.parent.count_files_by_type(home_dir)
-        total_count = max(1, text_count + image_count + video_count)
-        
         # Create more compact stat display
         stat_container = ctk.CTkFrame(stats_frame, fg_color="transparent")
         stat_container.pack(fill="both", expand=True, padx=5)
@@ -148,12 +291,32 @@ class Dashboard:
         # Configure grid for stat items
         stat_container.grid_columnconfigure((0, 1, 2), weight=1)
         
-        # Create smaller stat items
-        self.create_stat_item(stat_container, 0, "Text", text_count, total_count, "#5DA7DB")
-        self.create_stat_item(stat_container, 1, "Image", image_count, total_count, "#7077A1")
-        self.create_stat_item(stat_container, 2, "Video", video_count, total_count, "#F6AE99")
+        # Create smaller stat items; counts are filled in once the scan completes
+        self.stat_labels = {}
+        self.create_stat_item(stat_container, 0, "Text", "#5DA7DB")
+        self.create_stat_item(stat_container, 1, "Image", "#7077A1")
+        self.create_stat_item(stat_container, 2, "Video", "#F6AE99")
+    
+    def compute_file_stats(self):
+        """Count text, image and video files (runs on a worker thread)"""
+        home_dir = os.path.join(os.path.expanduser("~"), r"OneDrive\Desktop")
+        return self.parent.count_files_by_type(home_dir)
+    
+    def fill_stats(self, counts):
+        """Fill the stat items with the scanned counts"""
+        if counts is None:
+            for count_label, percentage_label in self.stat_labels.values():
+                count_label.configure(text="-")
+                percentage_label.configure(text="unavailable")
+            return
+            
+        total_count = max(1, sum(counts))
+        for title, count in zip(("Text", "Image", "Video"), counts):
+            count_label, percentage_label = self.stat_labels[title]
+            count_label.configure(text=str(count))
+            percentage_label.configure(text=f"{(count / total_count) * 100:.1f}%")
     
-    def create_stat_item(self, parent, column, title, count, total, color):
+    def create_stat_item(self, parent, column, title, color):
         """Create smaller stat display item"""
         item = ctk.CTkFrame(parent, fg_color=color, corner_radius=6)
         item.grid(row=0, column=column, padx=3, pady=3, sticky="nsew")
@@ -170,21 +333,22 @@ class Dashboard:
         # Count
         count_label = ctk.CTkLabel(
             item,
-            text=str(count),
+            text="...",
             font=ctk.CTkFont(size=16, weight="bold"),
             text_color="white"
         )
         count_label.pack(pady=0)
         
         # Percentage
-        percentage = (count / total) * 100
         percentage_label = ctk.CTkLabel(
             item,
-            text=f"{percentage:.1f}%",
+            text="Scanning...",
             font=ctk.CTkFont(size=10),
             text_color="white"
         )
         percentage_label.pack(pady=(0, 5))
+        
+        self.stat_labels[title] = (count_label, percentage_label)
     
     def create_compact_navigation(self, parent):
         """Create compact navigation section"""
@@ -283,9 +447,16 @@ class Dashboard:
         )
         title.pack(pady=(5, 5))
         
-        # Get file type data
-        file_types = self.get_file_type_distribution()
-        
+        # Chart starts with a placeholder and is blitted once data arrives
+        self.chart = BlittedPieChart(chart_frame)
+        self.chart.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+    
+    def fill_chart(self, file_types):
+        """Render the file type distribution into the chart"""
+        if file_types is None:
+            self.chart.show_message("Could not scan files")
+            return
+            
         # Filter out small values
         threshold = 0.03 # 3%
         other_sum = 0
@@ -306,40 +477,7 @@ class Dashboard:
         if other_sum > 0:
             filtered_types["Other"] = other_sum
         
-        # Create smaller figure
-        fig, ax = plt.subplots(figsize=(3.5, 3), dpi=100)
-        fig.patch.set_facecolor('none')
-        ax.set_facecolor('none')
-        
-        # Create compact pie chart
-        wedges, _, autotexts = ax.pie(
-            filtered_types.values(),
-            labels=None,
-            autopct='%1.1f%%',
-            startangle=90,
-            shadow=False,
-            colors=plt.cm.tab10.colors[:len(filtered_types)],
-            wedgeprops={'width': 0.5, 'edgecolor': 'white', 'linewidth': 1},
-            textprops={'fontsize': 8, 'fontweight': 'bold'}
-        )
-        
-        # Set equal aspect ratio
-        ax.axis('equal')
-        
-        # Add smaller legend
-        ax.legend(
-            wedges,
-            filtered_types.keys(),
-            title="File Types",
-            loc="center left",
-            bbox_to_anchor=(1, 0, 0.5, 1),
-            fontsize=7
-        )
-        
-        # Create canvas widget
-        canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+        self.chart.update(filtered_types)
     
     def create_compact_storage(self, parent):
         """Create compact storage display"""
@@ -354,9 +492,32 @@ class Dashboard:
         )
         title.pack(pady=(5, 5))
         
-        # Get disk usage stats
+        # Create progress bar
+        self.storage_bar = ctk.CTkProgressBar(storage_frame, width=250, height=15, mode="indeterminate")
+        self.storage_bar.pack(pady=10)
+        self.storage_bar.start()
+        
+        # Percentage and size labels
+        self.storage_label = ctk.CTkLabel(
+            storage_frame,
+            text="Calculating...",
+            font=ctk.CTkFont(size=12)
+        )
+        self.storage_label.pack(pady=0)
+        
+        # Free space on every other mounted filesystem
+        self.mounts_label = ctk.CTkLabel(
+            storage_frame,
+            text="",
+            font=ctk.CTkFont(size=11),
+            justify="left"
+        )
+        self.mounts_label.pack(pady=(5, 5))
+    
+    def fill_storage(self, usage):
+        """Show disk usage once it has been measured"""
         try:
-            total, used, free = self.get_disk_usage(os.path.expanduser("~"))
+            total, used, free = usage
             percentage_used = (used / total) * 100
         except Exception:
             # Fallback values
@@ -373,21 +534,73 @@ class Dashboard:
         else:
             progress_color = "#F44336" # Red
         
-        # Create progress bar
-        progress_bar = ctk.CTkProgressBar(storage_frame, width=250, height=15)
-        progress_bar.set(percentage_used/100)
-
-        progress_bar.configure(progress_color=progress_color)
-        progress_bar.pack(pady=10)
+        if self.storage_bar.cget("mode") == "indeterminate":
+            self.storage_bar.stop()
+        self.storage_bar.configure(mode="determinate", progress_color=progress_color)
+        self.storage_bar.set(percentage_used/100)
         
-        # Percentage and size labels
         info_text = f"{percentage_used:.1f}% Used • {self.format_size(used)} of {self.format_size(total)}"
-        info_label = ctk.CTkLabel(
-            storage_frame,
-            text=info_text,
-            font=ctk.CTkFont(size=12)
-        )
-        info_label.pack(pady=0)
+        self.storage_label.configure(text=info_text)
+    
+    def fill_mounts(self, usages, limit=5):
+        """List free space for the largest mounts; slow or failed mounts are skipped"""
+        mounts = sorted(((usage[0], mount_point, usage[2]) for mount_point, usage in (usages or {}).items()
+                         if usage and usage[0] > 0), reverse=True)
+        lines = [f"{mount_point}: {self.format_size(free)} free of {self.format_size(total)}"
+                 for total, mount_point, free in mounts[:limit]]
+        self.mounts_label.configure(text="\n".join(lines))
+    
+    def create_activity_panel(self):
+        """Create the activity trends panel (operations per day, top actions, moved folders, bin)"""
+        activity_frame = ctk.CTkFrame(self.dashboard_window)
+        activity_frame.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+        activity_frame.grid_columnconfigure((0, 1, 2, 3), weight=1)
+        
+        self.activity_labels = {}
+        for column, (key, title) in enumerate((('per_day', "Operations (30 days)"),
+                                               ('actions', "Top Actions"),
+                                               ('moved_folders', "Most Moved Folders"),
+                                               ('bin_items', "Moved to Bin (30 days)"))):
+            ctk.CTkLabel(
+                activity_frame,
+                text=title,
+                font=ctk.CTkFont(size=14, weight="bold")
+            ).grid(row=0, column=column, padx=5, pady=(5, 0))
+            
+            label = ctk.CTkLabel(
+                activity_frame,
+                text="Loading...",
+                font=ctk.CTkFont(family="Courier", size=12),
+                justify="left"
+            )
+            label.grid(row=1, column=column, padx=5, pady=5, sticky="n")
+            self.activity_labels[key] = label
+    
+    def fill_activity(self, summary):
+        """Show the activity statistics read from the daily aggregates"""
+        if summary is None:
+            for label in self.activity_labels.values():
+                label.configure(text="-")
+            return
+        
+        # One bar per day, scaled to the busiest day
+        counts = [count for _, count in summary['per_day']]
+        bars = "▁▂▃▄▅▆▇█"
+        peak = max(counts) or 1
+        sparkline = "".join(bars[min(len(bars) - 1, count * len(bars) // (peak + 1))] for count in counts)
+        self.activity_labels['per_day'].configure(
+            text=f"{sparkline}\n{sum(counts)} total • {counts[-1]} today")
+        
+        def rows(items, name=lambda item: item):
+            if not items:
+                return "No activity yet"
+            return "\n".join(f"{name(item)[:24]:<24} {count:>6}" for item, count in items)
+        
+        self.activity_labels['actions'].configure(text=rows(summary['actions']))
+        self.activity_labels['moved_folders'].configure(
+            text=rows(summary['moved_folders'], lambda folder: os.path.basename(folder) or folder))
+        self.activity_labels['bin_items'].configure(
+            text=str(summary['bin_items']), font=ctk.CTkFont(size=20, weight="bold"))
     
     def get_file_type_distribution(self):
         """Get distribution of file types (limited scan)"""
@@ -416,24 +629,11 @@ class Dashboard:
         return file_types
     
     def get_disk_usage(self, path):
-        """Get disk usage statistics"""
-        if os.name == 'posix':
-            # Unix/Linux/MacOS
-            import shutil
-            total, used, free = shutil.disk_usage(path)
-        else:
-            # Windows
-            import ctypes
-            free_bytes = ctypes.c_ulonglong(0)
-            total_bytes = ctypes.c_ulonglong(0)
-            ctypes.windll.kernel32.GetDiskFreeSpaceExW(
-                ctypes.c_wchar_p(path), None, ctypes.pointer(total_bytes), ctypes.pointer(free_bytes)
-            )
-            total = total_bytes.value
-            free = free_bytes.value
-            used = total - free
-            
-        return total, used, free
+        """Get disk usage statistics for the filesystem holding path"""
+        usage = disk_usage.usage(path)
+        if usage is None:
+            raise OSError(f"Disk usage unavailable for {path}")
+        return usage
     
     def format_size(self, size_bytes):
         """Format bytes to human-readable size"""
@@ -1,243 +1,1105 @@
+import math
+import os
+import re
 import threading
-from queue import Queue
-from tkinter import filedialog, messagebox, simpledialog
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Queue, Empty
+from datetime import datetime, timedelta, timezone
+from collections import namedtuple
+from tkinter import filedialog, messagebox, simpledialog, TclError
 import sqlite3
 import bcrypt
 
+class DatabaseFuture(Future):
+    """
+    Result of a queued database task.
+    
+    result(timeout) blocks on a condition variable rather than spinning.
+    GUI code should use after() instead, which delivers completion on the Tk
+    thread without blocking the event loop.
+    """
+    def after(self, widget, callback, interval=50):
+        """
+        Call callback(future) from widget's event loop once the task has finished
+        
+        Tk is not thread-safe, so the widget polls done() with after() rather
+        than being called from the database thread. Polling stops if the
+        widget is destroyed first.
+        """
+        def check():
+            try:
+                if not widget.winfo_exists():
+                    return
+            except TclError:
+                return
+            if self.done():
+                callback(self)
+            else:
+                widget.after(interval, check)
+        check()
+        return self
+
+
 class DatabaseQueue:
-    def __init__(self, db_path='docuvault.db'):
+    """
+    Serializes database writes through one worker thread and connection.
+    
+    The database runs in WAL mode, so reads submitted with read() run on a
+    small pool of query-only connections and never wait behind a write or
+    its fsync. They see what was committed when they start.
+    
+    Tasks submitted with batch=True are group-committed: the worker drains the
+    batch tasks already queued (waiting at most max_latency seconds for more)
+    and runs up to max_batch_size of them in a single transaction, each under
+    its own savepoint so a failing task is rolled back on its own. Batch tasks
+    must not commit; their futures resolve once the whole batch is committed.
+    """
+    def __init__(self, db_path='docuvault.db', max_batch_size=500, max_latency=0.05, readers=4):
         self.queue = Queue()
         self.db_path = db_path
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader')
+        self._reader_local = threading.local()
         self.worker_thread = threading.Thread(target=self._process_queue)
         self.worker_thread.daemon = True
         self.worker_thread.start()
     
     def _process_queue(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
         conn.execute("PRAGMA foreign_keys = ON")
+        # Only takes effect while the file is new, so it must precede the WAL switch
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL lets readers run alongside the writer; NORMAL syncs only at checkpoints
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        pending = None
         while True:
-            task, args, callback = self.queue.get()
+            item = pending or self.queue.get()
+            pending = None
+            task, args, future, callback, batch = item
+            if not batch:
+                self._run_task(conn, task, args, future, callback)
+                self.queue.task_done()
+                continue
+                
+            # Collect more batch tasks until the batch is full, the latency
+            # budget is spent or a task that needs its own transaction arrives
+            batch_items = [item]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch_items) < self.max_batch_size:
+                try:
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        next_item = self.queue.get(timeout=remaining)
+                    else:
+                        next_item = self.queue.get_nowait()
+                except Empty:
+                    break
+                if not next_item[4]:
+                    pending = next_item
+                    break
+                batch_items.append(next_item)
+                
+            self._run_batch(conn, batch_items)
+            for _ in batch_items:
+                self.queue.task_done()
+    
+    def _run_task(self, conn, task, args, future, callback):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = task(conn, *args)
+        except Exception as e:
+            self._finish(future, callback, e)
+        else:
+            self._finish(future, callback, None, result)
+    
+    def _run_batch(self, conn, batch_items):
+        """Run batch tasks in one transaction, each under a savepoint, and commit once"""
+        batch_items = [item for item in batch_items if item[2].set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute("BEGIN")
+            for task, args, future, callback, _ in batch_items:
+                conn.execute("SAVEPOINT batch_task")
+                try:
+                    result = task(conn, *args)
+                    conn.execute("RELEASE batch_task")
+                    outcomes.append((future, callback, None, result))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO batch_task")
+                    conn.execute("RELEASE batch_task")
+                    outcomes.append((future, callback, e, None))
+            conn.commit()
+        except Exception as e:
+            # The commit itself failed: nothing in the batch was written
+            if conn.in_transaction:
+                conn.rollback()
+            outcomes = [(future, callback, e, None) for _, _, future, callback, _ in batch_items]
+            
+        for future, callback, error, result in outcomes:
+            self._finish(future, callback, error, result)
+    
+    @staticmethod
+    def _finish(future, callback, error, result=None):
+        """Run the legacy (success, result) callback, then resolve the future"""
+        if callback:
             try:
-                result = task(conn, *args)
-                if callback:
+                if error is None:
                     callback(True, result)
+                else:
+                    callback(False, str(error))
             except Exception as e:
-                if callback:
-                    callback(False, str(e))
-            finally:
-                self.queue.task_done()
+                print(f"Error in database callback: {e}")
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
     
-    def execute(self, task, args=(), callback=None):
+    def execute(self, task, args=(), callback=None, batch=False):
         """
         Add a task to the queue
-        Returns a tuple (success, result) if callback is provided
-        Otherwise returns None
+        
+        Args:
+            task: Callable run on the database thread as task(conn, *args)
+            args: Extra arguments for task
+            callback: Optional callable(success, result) run on the database thread
+            batch: True for writes that can share a transaction with other
+                writes; such tasks must not call conn.commit() themselves
+                
+        Returns:
+            A DatabaseFuture for the task's return value (or exception)
+        """
+        future = DatabaseFuture()
+        self.queue.put((task, args, future, callback, batch))
+        return future
+    
+    def read(self, task, args=()):
         """
-        result_container = [None, None]  # [success, result]
+        Run a read-only task on the reader pool
         
-        def internal_callback(success, result):
-            result_container[0] = success
-            result_container[1] = result
-            if callback:
-                callback(success, result)
+        Args:
+            task: Callable run as task(conn, *args) on a query-only connection
+            args: Extra arguments for task
+            
+        Returns:
+            A DatabaseFuture for the task's return value (or exception)
+        """
+        future = DatabaseFuture()
         
-        self.queue.put((task, args, internal_callback))
-        return result_container
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                result = task(self._reader_connection(), *args)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+                
+        self._readers.submit(run)
+        return future
+    
+    def _reader_connection(self):
+        """The calling reader thread's own connection, opened on first use"""
+        conn = getattr(self._reader_local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.execute("PRAGMA query_only = ON")
+            self._reader_local.conn = conn
+        return conn
+    
+    def flush(self):
+        """Block until every queued task (including pending batches) has been committed"""
+        self.queue.join()
 
 # Create a global database queue instance
 db_queue = DatabaseQueue()
 
+def _create_tables(cursor):
+    # Create users table FIRST
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        automation_folder TEXT
+    )''')
+    
+    # Then create activity table with foreign key
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_activity (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        username TEXT NOT NULL,
+        action_type TEXT NOT NULL,
+        item_type TEXT NOT NULL,
+        item_path TEXT NOT NULL,
+        details TEXT,
+        FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+    )''')
+    
+    # Create logs table for file operations
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        action TEXT NOT NULL,
+        old_path TEXT NOT NULL,
+        new_path TEXT,
+        username TEXT,
+        FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+    )''')
+
+def _index_activity_logs(cursor):
+    # Covering indexes: per-user log pages are read from the index alone,
+    # already in timestamp order (the rowid id is stored in every index)
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_user_activity_user_time
+    ON user_activity (username, timestamp, action_type, item_type, item_path, details)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_user_activity_time ON user_activity (timestamp)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_logs_user_time
+    ON logs (username, timestamp, action, old_path, new_path)
+    ''')
+
+def _index_activity_keyset(cursor):
+    # Put id right after timestamp so per-user entries are in (timestamp, id)
+    # order and keyset pages need no sort
+    cursor.execute('DROP INDEX IF EXISTS idx_user_activity_user_time')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_user_activity_user_keyset
+    ON user_activity (username, timestamp, id, action_type, item_type, item_path, details)
+    ''')
+
+def _create_log_rollups(cursor):
+    # Daily per-action counts that replace raw log rows past the retention window
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS activity_rollup (
+        username TEXT NOT NULL,
+        day TEXT NOT NULL,
+        action_type TEXT NOT NULL,
+        item_type TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (username, day, action_type, item_type),
+        FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+    ) WITHOUT ROWID''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS logs_rollup (
+        username TEXT NOT NULL,
+        day TEXT NOT NULL,
+        action TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (username, day, action)
+    ) WITHOUT ROWID''')
+    # Lets retention find the oldest file operation without a scan
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_time ON logs (timestamp)')
+
+def _create_cloud_credentials(cursor):
+    # Previously created by CloudManager on first use
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cloud_credentials
+    (username TEXT PRIMARY KEY,
+    server_url TEXT,
+    encrypted_user BLOB,
+    encrypted_pass BLOB,
+    encryption_salt BLOB)
+    ''')
+
+# Moves into the bin are counted under their own action so bin growth can be read directly
+BIN_ACTION = 'MOVE TO BIN'
+
+# "source -> destination" style item paths (including the mis-encoded arrow in older rows)
+_PATH_ARROW = re.compile(r'\s+(?:copy)?(?:->|\u2192|\u00e2\u2020\u2019)\s+')
+
+def activity_folder(item_path):
+    """
+    The top-level folder an activity row is about, for the dashboard statistics
+    
+    Paths under the home directory are grouped by their first folder below it
+    (e.g. ~/Documents); other paths by their parent directory. For rows that
+    describe a move or copy, the source path is used.
+    """
+    source = _PATH_ARROW.split(item_path or '', 1)[0].strip()
+    if not source:
+        return ''
+    source = os.path.normpath(source)
+    home = os.path.expanduser('~')
+    if source.startswith(home + os.sep):
+        parts = source[len(home) + 1:].split(os.sep)
+        return os.path.join(home, parts[0]) if len(parts) > 1 else home
+    return os.path.dirname(source) or source
+
+def stats_action(action_type, details):
+    """The action an activity row is counted under in activity_daily_stats"""
+    return BIN_ACTION if action_type == 'DELETE' and details == 'Move to Bin' else action_type
+
+def _create_activity_stats(cursor):
+    # Counts per user, day, action and top-level folder, kept current by log_action
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS activity_daily_stats (
+        username TEXT NOT NULL,
+        day TEXT NOT NULL,
+        action_type TEXT NOT NULL,
+        folder TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (username, day, action_type, folder),
+        FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+    ) WITHOUT ROWID''')
+    
+    # Backfill from the existing log; rolled-up days no longer know their folders
+    conn = cursor.connection
+    conn.create_function('activity_folder', 1, activity_folder, deterministic=True)
+    conn.create_function('stats_action', 2, stats_action, deterministic=True)
+    cursor.execute('''
+    INSERT INTO activity_daily_stats (username, day, action_type, folder, count)
+    SELECT username, day, action_type, folder, SUM(count) FROM (
+        SELECT username, day, action_type, '' AS folder, count FROM activity_rollup
+        UNION ALL
+        SELECT username, substr(timestamp, 1, 10), stats_action(action_type, details),
+               activity_folder(item_path), 1
+        FROM user_activity
+    )
+    GROUP BY 1, 2, 3, 4
+    ''')
+
+def _create_file_access_events(cursor):
+    # Append-only record of file opens, replacing file_access_log.json
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS file_access_events (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL,
+        path TEXT NOT NULL,
+        accessed_at REAL NOT NULL,
+        FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+    )''')
+    # "Opened since t" is a range scan of this covering index
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_file_access_user_time
+    ON file_access_events (username, accessed_at, path)
+    ''')
+
+# Frecency: every open adds 1 to a file's score, and scores halve each half-life.
+# Scores are stored as log-space keys measured from the epoch,
+#   key = log(sum(exp(FRECENCY_RATE * t_i)))  so  score(now) = exp(key - FRECENCY_RATE * now).
+# Keys never need rewriting as time passes and order files the same way their
+# current scores do, so "hottest files" is an index scan.
+FRECENCY_HALF_LIFE_DAYS = 7
+FRECENCY_RATE = math.log(2) / (FRECENCY_HALF_LIFE_DAYS * 24 * 3600)
+
+def frecency_key(key, accessed_at):
+    """Return the key after adding one access at accessed_at to a file with key (None if new)"""
+    visit = FRECENCY_RATE * accessed_at
+    if key is None:
+        return visit
+    high, low = max(key, visit), min(key, visit)
+    return high + math.log1p(math.exp(low - high))
+
+def frecency_score(key, now=None):
+    """Current decayed score for a frecency key"""
+    return math.exp(key - FRECENCY_RATE * (time.time() if now is None else now))
+
+class _FrecencyKey:
+    # Aggregate used to backfill keys from file_access_events
+    def __init__(self):
+        self.key = None
+    
+    def step(self, accessed_at):
+        self.key = frecency_key(self.key, accessed_at)
+    
+    def finalize(self):
+        return self.key
+
+def _create_file_frecency(cursor):
+    # One row per opened file with its frecency key, updated on every access
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS file_frecency (
+        username TEXT NOT NULL,
+        path TEXT NOT NULL,
+        score_key REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (username, path),
+        FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
+    ) WITHOUT ROWID''')
+    # Covering indexes for the Frequent (top keys) and Recent (last opened) lists
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_file_frecency_score
+    ON file_frecency (username, score_key, last_access)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_file_frecency_recent
+    ON file_frecency (username, last_access)
+    ''')
+    
+    cursor.connection.create_aggregate('frecency_key', 1, _FrecencyKey)
+    cursor.execute('''
+    INSERT INTO file_frecency (username, path, score_key, last_access)
+    SELECT username, path, frecency_key(accessed_at), MAX(accessed_at)
+    FROM file_access_events
+    GROUP BY username, path
+    ''')
+
+# Schema migrations, applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _create_tables,
+    _index_activity_logs,
+    _index_activity_keyset,
+    _create_log_rollups,
+    _create_cloud_credentials,
+    _create_activity_stats,
+    _create_file_access_events,
+    _create_file_frecency,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn):
+    """
+    Bring the database schema up to SCHEMA_VERSION
+    
+    Each pending migration runs in its own transaction together with the
+    user_version bump, so an interrupted upgrade resumes where it stopped.
+    
+    Returns:
+        The schema version before migrating
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(
+            f"Database schema version {version} is newer than this application ({SCHEMA_VERSION})")
+    
+    if conn.in_transaction:
+        conn.commit()
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            MIGRATIONS[number - 1](cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return version
+
 # Modify existing functions to use the queue
 def create_database():
     def task(conn):
-        cursor = conn.cursor()
         # Enable foreign keys FIRST
-        cursor.execute("PRAGMA foreign_keys = ON")
-        
-        # Create users table FIRST
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL,
-            automation_folder TEXT
-        )''')
-        
-        # Then create activity table with foreign key
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_activity (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            username TEXT NOT NULL,
-            action_type TEXT NOT NULL,
-            item_type TEXT NOT NULL,
-            item_path TEXT NOT NULL,
-            details TEXT,
-            FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
-        )''')
-        
-        # Create logs table for file operations
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            action TEXT NOT NULL,
-            old_path TEXT NOT NULL,
-            new_path TEXT,
-            username TEXT,
-            FOREIGN KEY(username) REFERENCES users(username) ON DELETE CASCADE
-        )''')
-        
-        conn.commit()
+        conn.execute("PRAGMA foreign_keys = ON")
+        migrate(conn)
         return True
     
     return db_queue.execute(task)
 
 def get_db_connection():
-    # This function is kept for backward compatibility
-    conn = sqlite3.connect('docuvault.db')
+    # This function is kept for backward compatibility; prefer the repositories below
+    conn = sqlite3.connect(db_queue.db_path, timeout=30.0)
     conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
-def register_user(username, password, automation_folder):
-    def task(conn, username, password, automation_folder):
-        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        cursor = conn.cursor()
-        
-        if automation_folder:
-            cursor.execute('INSERT INTO users (username, password, automation_folder) VALUES (?, ?, ?)',
-                          (username, hashed, automation_folder))
-        else:
-            cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)',
-                          (username, hashed))
+def user_logs_query(username=None, limit=100):
+    """Return the (query, params) used to read the most recent activity rows"""
+    query = '''
+    SELECT timestamp, action_type, item_type, item_path, details
+    FROM user_activity
+    '''
+    
+    params = ()
+    if username:
+        query += ' WHERE username = ?'
+        params = (username,)
+    
+    query += ' ORDER BY timestamp DESC LIMIT ?'
+    params += (limit,)
+    return query, params
+
+def user_logs_page_query(username=None, before=None, after=None, limit=200,
+                         action_type=None, path=None, since=None, until=None):
+    """
+    Return the (query, params) for one keyset page of activity rows
+    
+    Rows are (id, timestamp, action_type, item_type, item_path, details),
+    ordered newest first, or oldest first when paging with `after`.
+    
+    Args:
+        username: Only rows for this user (default: all users)
+        before: (timestamp, id) of a row; return the rows older than it
+        after: (timestamp, id) of a row; return the rows newer than it
+        limit: Maximum number of rows
+        action_type: Only rows with this action type
+        path: Only rows whose item path contains this text
+        since: Only rows with timestamp >= since ('YYYY-MM-DD[ HH:MM:SS]')
+        until: Only rows with timestamp < until
+    """
+    conditions = []
+    params = []
+    if username:
+        conditions.append('username = ?')
+        params.append(username)
+    if action_type:
+        conditions.append('action_type = ?')
+        params.append(action_type)
+    if path:
+        escaped = path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append("item_path LIKE ? ESCAPE '\\'")
+        params.append(f'%{escaped}%')
+    if since:
+        conditions.append('timestamp >= ?')
+        params.append(since)
+    if until:
+        conditions.append('timestamp < ?')
+        params.append(until)
+    # The plain timestamp bound gives the index a range to seek to; the OR
+    # only filters the rows that share the cursor's timestamp
+    if before:
+        conditions.append('timestamp <= ? AND (timestamp < ? OR id < ?)')
+        params.extend((before[0], before[0], before[1]))
+    if after:
+        conditions.append('timestamp >= ? AND (timestamp > ? OR id > ?)')
+        params.extend((after[0], after[0], after[1]))
+    
+    order = 'ASC' if after else 'DESC'
+    query = '''
+    SELECT id, timestamp, action_type, item_type, item_path, details
+    FROM user_activity
+    '''
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY timestamp {order}, id {order} LIMIT ?'
+    params.append(limit)
+    return query, tuple(params)
+
+# Raw log rows are kept this many days, then folded into the daily rollups
+RETENTION_DAYS = 90
+
+def _roll_up_oldest_day(conn, cutoff):
+    """
+    Fold the oldest day of raw log rows before cutoff into the rollup tables
+    
+    Returns:
+        The day rolled up, or None when no rows are older than cutoff
+    """
+    oldest = conn.execute('''
+    SELECT MIN(oldest) FROM (
+        SELECT MIN(timestamp) AS oldest FROM user_activity
+        UNION ALL
+        SELECT MIN(timestamp) FROM logs
+    )''').fetchone()[0]
+    if oldest is None or oldest >= cutoff:
+        return None
+    
+    day = oldest[:10]
+    try:
+        upper = min(cutoff, (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'))
+    except ValueError:
+        upper = cutoff
+    
+    # Counts and deletions commit together, so a row is never counted twice or lost
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN")
+    try:
+        conn.execute('''
+        INSERT INTO activity_rollup (username, day, action_type, item_type, count)
+        SELECT username, substr(timestamp, 1, 10), action_type, item_type, COUNT(*)
+        FROM user_activity WHERE timestamp < ?
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (username, day, action_type, item_type) DO UPDATE SET count = count + excluded.count
+        ''', (upper,))
+        conn.execute('DELETE FROM user_activity WHERE timestamp < ?', (upper,))
         
+        conn.execute('''
+        INSERT INTO logs_rollup (username, day, action, count)
+        SELECT COALESCE(username, ''), substr(timestamp, 1, 10), action, COUNT(*)
+        FROM logs WHERE timestamp < ?
+        GROUP BY 1, 2, 3
+        ON CONFLICT (username, day, action) DO UPDATE SET count = count + excluded.count
+        ''', (upper,))
+        conn.execute('DELETE FROM logs WHERE timestamp < ?', (upper,))
         conn.commit()
-        return True
-    
-    def callback(success, result):
-        if success:
-            messagebox.showinfo("Registration", "User registered successfully!")
-        else:
-            messagebox.showerror("Registration Error", "Username already exists.")
+    except Exception:
+        conn.rollback()
+        raise
+    return day
+
+def _incremental_vacuum(conn, pages):
+    """
+    Return up to `pages` free pages to the filesystem
     
-    db_queue.execute(task, (username, password, automation_folder), callback)
+    Returns:
+        Number of free pages still left in the file
+    """
+    if conn.in_transaction:
+        conn.commit()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        # Files created before incremental auto-vacuum would need a full VACUUM
+        # to switch; their free pages are reused by later inserts instead
+        return 0
+    conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+    remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if not remaining:
+        # Shrink the WAL left behind by the deletes (skipped while readers hold it)
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    return remaining
 
-def login_user(username, password):
-    def task(conn, username, password):
-        cursor = conn.cursor()
-        cursor.execute('SELECT password FROM users WHERE username = ?', (username,))
-        result = cursor.fetchone()
+CloudCredentials = namedtuple('CloudCredentials',
+                              ['server_url', 'encrypted_user', 'encrypted_pass', 'encryption_salt'])
+
+
+class UserRepository:
+    """
+    Accounts and per-user settings in the users table.
+    
+    Reads run on the reader pool and writes on the writer thread of `queue`.
+    Methods ending in _async return a DatabaseFuture; the others wait.
+    """
+    def __init__(self, queue=None):
+        self.queue = queue if queue is not None else db_queue
+    
+    def register_async(self, username, password, automation_folder=None):
+        """Hash the password and insert a new user; fails with sqlite3.IntegrityError if taken"""
+        def task(conn, username, password, automation_folder):
+            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+            conn.execute('INSERT INTO users (username, password, automation_folder) VALUES (?, ?, ?)',
+                         (username, hashed, automation_folder or None))
+            conn.commit()
+            return True
+        
+        return self.queue.execute(task, (username, password, automation_folder))
+    
+    def check_password_async(self, username, password):
+        """Resolves to True or False, or None if the username is unknown"""
+        def task(conn, username, password):
+            result = conn.execute('SELECT password FROM users WHERE username = ?', (username,)).fetchone()
+            if not result:
+                return None
+            return bcrypt.checkpw(password.encode('utf-8'), result[0])
         
-        if not result:
-            return None  # Username not found
+        return self.queue.read(task, (username, password))
+    
+    def get_automation_folder(self, username):
+        """Return the user's automation folder, or None if unset or unknown"""
+        def task(conn, username):
+            result = conn.execute('SELECT automation_folder FROM users WHERE username = ?',
+                                  (username,)).fetchone()
+            return result[0] if result and result[0] else None
         
-        if bcrypt.checkpw(password.encode('utf-8'), result[0]):
+        return self.queue.read(task, (username,)).result()
+    
+    def set_automation_folder_async(self, username, automation_folder):
+        """Store (or clear, with None) the user's automation folder"""
+        def task(conn, username, automation_folder):
+            conn.execute('UPDATE users SET automation_folder = ? WHERE username = ?',
+                         (automation_folder, username))
+            conn.commit()
             return True
-        else:
-            return False
+        
+        return self.queue.execute(task, (username, automation_folder))
     
-    result_container = db_queue.execute(task, (username, password))
-    # Wait for result (this is synchronous for login)
-    while result_container[0] is None:
-        pass
-    return result_container[1]
+    def delete(self, username):
+        """Delete a user; foreign key cascades remove their activity rows and rollups"""
+        def task(conn, username):
+            conn.execute('DELETE FROM users WHERE username = ?', (username,))
+            conn.execute('DELETE FROM logs_rollup WHERE username = ?', (username,))
+            conn.commit()
+            return True
+        
+        return self.queue.execute(task, (username,)).result()
 
-def log_action(username, action_type, item_type, item_path, details=None):
-    def task(conn, username, action_type, item_type, item_path, details):
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO user_activity
-        (username, action_type, item_type, item_path, details)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (username, action_type, item_type, item_path, details))
-        conn.commit()
-        return True
+
+class ActivityRepository:
+    """
+    The audit trail: user_activity, logs and their daily rollups.
+    
+    Appends are group-committed by the writer; queries run on the reader pool.
+    """
+    def __init__(self, queue=None):
+        self.queue = queue if queue is not None else db_queue
+    
+    def log_action(self, username, action_type, item_type, item_path, details=None):
+        """
+        Queue an activity row; it is committed together with other queued writes
+        
+        The row's activity_daily_stats count is bumped in the same transaction.
+        """
+        def task(conn, username, action_type, item_type, item_path, details):
+            conn.execute('''
+            INSERT INTO user_activity
+            (username, action_type, item_type, item_path, details)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (username, action_type, item_type, item_path, details))
+            conn.execute('''
+            INSERT INTO activity_daily_stats (username, day, action_type, folder, count)
+            VALUES (?, date('now'), ?, ?, 1)
+            ON CONFLICT (username, day, action_type, folder) DO UPDATE SET count = count + 1
+            ''', (username, stats_action(action_type, details), activity_folder(item_path)))
+            return True
+        
+        return self.queue.execute(task, (username, action_type, item_type, item_path, details), batch=True)
+    
+    def log_file_operation(self, username, action, old_path, new_path=None):
+        """Queue a file operation row; it is committed together with other queued writes"""
+        def task(conn, username, action, old_path, new_path):
+            conn.execute('''
+            INSERT INTO logs
+            (action, old_path, new_path, username)
+            VALUES (?, ?, ?, ?)
+            ''', (action, old_path, new_path, username))
+            return True
+        
+        return self.queue.execute(task, (username, action, old_path, new_path), batch=True)
+    
+    def recent_async(self, username=None, limit=100):
+        """The most recent activity rows; see user_logs_query"""
+        return self.queue.read(lambda conn: conn.execute(*user_logs_query(username, limit)).fetchall())
+    
+    def page_async(self, username=None, before=None, after=None, limit=200, **filters):
+        """One keyset page of activity rows, always newest first; see user_logs_page_query"""
+        def task(conn):
+            rows = conn.execute(*user_logs_page_query(username, before, after, limit, **filters)).fetchall()
+            return rows[::-1] if after else rows
+        
+        return self.queue.read(task)
+    
+    def delete_for_user(self, username):
+        """Delete a user's raw log rows and rollups"""
+        def task(conn, username):
+            conn.execute('DELETE FROM logs WHERE username = ?', (username,))
+            conn.execute('DELETE FROM user_activity WHERE username = ?', (username,))
+            conn.execute('DELETE FROM activity_rollup WHERE username = ?', (username,))
+            conn.execute('DELETE FROM logs_rollup WHERE username = ?', (username,))
+            conn.execute('DELETE FROM activity_daily_stats WHERE username = ?', (username,))
+            conn.commit()
+            return True
+        
+        return self.queue.execute(task, (username,)).result()
     
-    db_queue.execute(task, (username, action_type, item_type, item_path, details))
+    def summary_async(self, username, days=30, top=5, now=None):
+        """
+        Activity statistics for the dashboard, read from activity_daily_stats
+        
+        Only the user's stats rows for the window are touched, never the raw log.
+        
+        Args:
+            username: User to summarize
+            days: Size of the window in days, ending today (UTC)
+            top: Number of actions and folders to return
+            now: Current UTC time (default: now)
+            
+        Returns:
+            A DatabaseFuture for a dict with 'per_day' [(day, count)] covering
+            every day in the window, 'actions' and 'moved_folders'
+            [(name, count)] (largest first) and 'bin_items' (moves into the bin)
+        """
+        now = now or datetime.now(timezone.utc)
+        window = [(now - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days - 1, -1, -1)]
+        
+        def task(conn):
+            rows = conn.execute('''
+            SELECT day, action_type, folder, count FROM activity_daily_stats
+            WHERE username = ? AND day >= ? AND day <= ?
+            ''', (username, window[0], window[-1])).fetchall()
+            
+            per_day = dict.fromkeys(window, 0)
+            actions = {}
+            folders = {}
+            for day, action_type, folder, count in rows:
+                per_day[day] += count
+                actions[action_type] = actions.get(action_type, 0) + count
+                if action_type == 'MOVE' and folder:
+                    folders[folder] = folders.get(folder, 0) + count
+            
+            def largest(counts):
+                return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top]
+            
+            return {
+                'per_day': list(per_day.items()),
+                'actions': largest(actions),
+                'moved_folders': largest(folders),
+                'bin_items': actions.get(BIN_ACTION, 0),
+            }
+        
+        return self.queue.read(task)
+    
+    def apply_retention(self, keep_days=RETENTION_DAYS, now=None, vacuum_pages=1000):
+        """
+        Roll raw log rows older than keep_days into daily counts and shrink the file
+        
+        Each day rolled up, and each batch of pages vacuumed, is its own writer
+        task, so other writes interleave. Blocks until done; run it from a
+        background thread.
+        
+        Args:
+            keep_days: Days of raw rows to keep
+            now: Current UTC time (default: now)
+            vacuum_pages: Pages released per vacuum step
+            
+        Returns:
+            Number of days rolled up
+        """
+        now = now or datetime.now(timezone.utc)
+        # CURRENT_TIMESTAMP is UTC; cut on whole days so every rollup day is complete
+        cutoff = (now - timedelta(days=keep_days)).strftime('%Y-%m-%d')
+        
+        days = 0
+        while self.queue.execute(_roll_up_oldest_day, (cutoff,)).result() is not None:
+            days += 1
+        if days:
+            while self.queue.execute(_incremental_vacuum, (vacuum_pages,)).result():
+                pass
+        return days
 
-def get_user_logs(username=None, limit=100):
-    def task(conn, username, limit):
-        cursor = conn.cursor()
-        query = '''
-        SELECT timestamp, action_type, item_type, item_path, details
-        FROM user_activity
-        '''
+
+# Access events older than this are compacted to the latest one per file
+ACCESS_EVENT_DAYS = 30
+# Files whose frecency has decayed below this are dropped from file_frecency
+FRECENCY_MIN_SCORE = 0.01
+
+def _record_access(conn, username, path, accessed_at):
+    row = conn.execute('SELECT score_key FROM file_frecency WHERE username = ? AND path = ?',
+                       (username, path)).fetchone()
+    conn.execute('INSERT INTO file_access_events (username, path, accessed_at) VALUES (?, ?, ?)',
+                 (username, path, accessed_at))
+    conn.execute('''
+    INSERT INTO file_frecency (username, path, score_key, last_access) VALUES (?, ?, ?, ?)
+    ON CONFLICT (username, path) DO UPDATE SET
+        score_key = excluded.score_key,
+        last_access = MAX(last_access, excluded.last_access)
+    ''', (username, path, frecency_key(row[0] if row else None, accessed_at), accessed_at))
+
+
+class FileAccessRepository:
+    """
+    Append-only log of file opens in file_access_events, plus a frecency
+    score per file in file_frecency.
+    
+    Recording an access is one batched insert and one keyed update, whatever
+    the history size. compact() periodically collapses old events to the
+    latest one per file and drops files that have gone cold.
+    """
+    def __init__(self, queue=None):
+        self.queue = queue if queue is not None else db_queue
+    
+    def record(self, username, path, accessed_at=None):
+        """Queue an access event; it is committed together with other queued writes"""
+        accessed_at = time.time() if accessed_at is None else accessed_at
+        
+        def task(conn, username, path, accessed_at):
+            _record_access(conn, username, path, accessed_at)
+            return True
+        
+        return self.queue.execute(task, (username, path, accessed_at), batch=True)
+    
+    def record_many_async(self, username, accesses):
+        """Insert (path, accessed_at) pairs in one transaction"""
+        def task(conn, username, accesses):
+            for path, accessed_at in accesses:
+                _record_access(conn, username, path, accessed_at)
+            conn.commit()
+            return len(accesses)
         
-        params = ()
-        if username:
-            query += ' WHERE username = ?'
-            params = (username,)
+        return self.queue.execute(task, (username, list(accesses)))
+    
+    def accessed_since(self, username, since):
+        """Return the distinct paths the user opened at or after `since` (a Unix time)"""
+        return [path for path, in self.queue.read(lambda conn: conn.execute(
+            'SELECT DISTINCT path FROM file_access_events WHERE username = ? AND accessed_at >= ?',
+            (username, since)
+        ).fetchall()).result()]
+    
+    def top(self, username, limit=10, since=None, now=None):
+        """
+        Return the user's hottest files, highest frecency first
         
-        query += ' ORDER BY timestamp DESC LIMIT ?'
-        params += (limit,)
+        Args:
+            username: Owner of the access history
+            limit: Maximum number of files
+            since: Only files last opened at or after this Unix time
+            now: Time the scores are computed for (default: now)
         
-        cursor.execute(query, params)
-        return cursor.fetchall()
+        Returns:
+            List of (path, score) tuples
+        """
+        query = 'SELECT path, score_key FROM file_frecency WHERE username = ?'
+        params = [username]
+        if since is not None:
+            query += ' AND last_access >= ?'
+            params.append(since)
+        query += ' ORDER BY score_key DESC LIMIT ?'
+        params.append(limit)
+        
+        rows = self.queue.read(lambda conn: conn.execute(query, params).fetchall()).result()
+        return [(path, frecency_score(key, now)) for path, key in rows]
+    
+    def recent(self, username, limit=10):
+        """Return the user's most recently opened files as (path, last_access) tuples, newest first"""
+        return self.queue.read(lambda conn: conn.execute(
+            'SELECT path, last_access FROM file_frecency WHERE username = ? ORDER BY last_access DESC LIMIT ?',
+            (username, limit)
+        ).fetchall()).result()
     
-    result_container = db_queue.execute(task, (username, limit))
-    # Wait for result (this is synchronous for getting logs)
-    while result_container[0] is None:
-        pass
-    return result_container[1]
+    def scores(self, username, paths, now=None):
+        """Return {path: score} for those of paths the user has opened"""
+        paths = list(paths)
+        
+        def task(conn):
+            keys = {}
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                keys.update(conn.execute(
+                    f"SELECT path, score_key FROM file_frecency WHERE username = ? "
+                    f"AND path IN ({', '.join('?' * len(chunk))})", [username] + chunk
+                ).fetchall())
+            return keys
+        
+        return {path: frecency_score(key, now) for path, key in self.queue.read(task).result().items()}
+    
+    def compact(self, keep_days=ACCESS_EVENT_DAYS, now=None):
+        """
+        Drop all but the latest event per file among events older than keep_days,
+        and forget files whose frecency has fallen below FRECENCY_MIN_SCORE
+        
+        Returns:
+            Number of rows removed
+        """
+        now = time.time() if now is None else now
+        cutoff = now - keep_days * 24 * 3600
+        cold_key = math.log(FRECENCY_MIN_SCORE) + FRECENCY_RATE * now
+        
+        def task(conn, cutoff, cold_key):
+            cursor = conn.execute('''
+            DELETE FROM file_access_events
+            WHERE accessed_at < ? AND id NOT IN (
+                SELECT MAX(id) FROM file_access_events
+                WHERE accessed_at < ?
+                GROUP BY username, path
+            )''', (cutoff, cutoff))
+            removed = cursor.rowcount
+            removed += conn.execute('DELETE FROM file_frecency WHERE score_key < ?', (cold_key,)).rowcount
+            conn.commit()
+            return removed
+        
+        return self.queue.execute(task, (cutoff, cold_key)).result()
 
-def log_file_operation(username, action, item_type,old_path, new_path=None):
-    def task(conn, username, action, old_path, new_path):
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO logs
-        (action, item_type,old_path, new_path, username)
-        VALUES (?, ?, ?, ?)
-        ''', (action, item_type,old_path, new_path, username))
-        conn.commit()
-        return True
+
+class CloudCredentialRepository:
+    """Encrypted Nextcloud credentials, one row per user"""
+    def __init__(self, queue=None):
+        self.queue = queue if queue is not None else db_queue
     
-    db_queue.execute(task, (username, action, old_path, new_path))
+    def get(self, username):
+        """Return the user's CloudCredentials, or None if none are stored"""
+        row = self.queue.read(lambda conn: conn.execute(
+            '''SELECT server_url, encrypted_user, encrypted_pass, encryption_salt
+            FROM cloud_credentials WHERE username = ?''', (username,)
+        ).fetchone()).result()
+        return CloudCredentials(*row) if row else None
+    
+    def save(self, username, credentials):
+        """Insert or replace the user's CloudCredentials"""
+        def task(conn, username, credentials):
+            conn.execute('''
+            INSERT INTO cloud_credentials
+            (username, server_url, encrypted_user, encrypted_pass, encryption_salt)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (username) DO UPDATE SET
+                server_url = excluded.server_url,
+                encrypted_user = excluded.encrypted_user,
+                encrypted_pass = excluded.encrypted_pass,
+                encryption_salt = excluded.encryption_salt
+            ''', (username,) + tuple(credentials))
+            conn.commit()
+            return True
+        
+        return self.queue.execute(task, (username, credentials)).result()
+
+
+# Shared repositories; all database access in the application goes through these
+users = UserRepository()
+activity = ActivityRepository()
+cloud_credentials = CloudCredentialRepository()
+file_access = FileAccessRepository()
+
+# Function API used throughout the GUI, kept as thin wrappers over the repositories
+def register_user(username, password, automation_folder):
+    def callback(future):
+        if future.exception() is None:
+            messagebox.showinfo("Registration", "User registered successfully!")
+        else:
+            messagebox.showerror("Registration Error", "Username already exists.")
+    
+    users.register_async(username, password, automation_folder).add_done_callback(callback)
+
+def login_user(username, password):
+    # Wait for result (this is synchronous for login)
+    try:
+        return users.check_password_async(username, password).result()
+    except sqlite3.Error as e:
+        print(f"Error checking login: {e}")
+        return False
+
+def log_action(username, action_type, item_type, item_path, details=None):
+    activity.log_action(username, action_type, item_type, item_path, details)
+
+def log_file_operation(username, action, item_type,old_path, new_path=None):
+    # The logs table has no item_type column; it is accepted for callers' convenience
+    activity.log_file_operation(username, action, old_path, new_path)
+
+def get_user_logs(username=None, limit=100):
+    """Return the most recent activity rows, waiting for the database thread"""
+    try:
+        return get_user_logs_async(username, limit).result()
+    except sqlite3.Error as e:
+        print(f"Error reading logs: {e}")
+        return []
+
+def get_user_logs_async(username=None, limit=100):
+    """Queue a query for the most recent activity rows and return its DatabaseFuture"""
+    return activity.recent_async(username, limit)
+
+def get_user_logs_page_async(username=None, before=None, after=None, limit=200, **filters):
+    """Queue a query for one page of activity rows (newest first) and return its DatabaseFuture"""
+    return activity.page_async(username, before, after, limit, **filters)
+
+def apply_log_retention(keep_days=RETENTION_DAYS, now=None, vacuum_pages=1000):
+    """Roll old log rows into daily counts; see ActivityRepository.apply_retention"""
+    return activity.apply_retention(keep_days, now, vacuum_pages)
 
 def delete_user_account(username):
     """Delete a user account and associated data"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        # Delete user - foreign key cascade will handle activity records
-        cursor.execute('DELETE FROM users WHERE username = ?', (username,))
-        conn.commit()
-        return True
+        return users.delete(username)
     except sqlite3.Error as e:
         print(f"Error deleting account: {e}")
         return False
-    finally:
-        conn.close()
-
-# def delete_user_logs(username):
-#     """Delete all logs for a user"""
-#     conn = get_db_connection()
-#     cursor = conn.cursor()
-#     try:
-#         cursor.execute('DELETE FROM logs WHERE username = ?', (username,))
-#         conn.commit()
-#         return True
-#     except sqlite3.Error as e:
-#         print(f"Error deleting logs: {e}")
-#         return False
-#     finally:
-#         conn.close()
 
 def delete_user_logs(username):
     """Delete all logs for a user from both logs and user_activity tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        # Delete from logs table
-        cursor.execute('DELETE FROM logs WHERE username = ?', (username,))
-        
-        # Also delete from user_activity table
-        cursor.execute('DELETE FROM user_activity WHERE username = ?', (username,))
-        
-        conn.commit()
-        return True
+        return activity.delete_for_user(username)
     except sqlite3.Error as e:
         print(f"Error deleting logs: {e}")
         return False
-    finally:
-        conn.close()
 
+def get_user_automation_folder(username):
+    """Return the user's automation folder, or None if unset or unknown"""
+    try:
+        return users.get_automation_folder(username)
+    except sqlite3.OperationalError:
+        return None
+
+def set_user_automation_folder(username, automation_folder):
+    """Store (or clear, with None) the user's automation folder; returns the DatabaseFuture"""
+    return users.set_automation_folder_async(username, automation_folder)
+
+def get_activity_summary_async(username, days=30):
+    """Queue the dashboard's activity statistics and return its DatabaseFuture"""
+    return activity.summary_async(username, days)
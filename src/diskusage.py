@@ -0,0 +1,173 @@
+import os
+import re
+import shutil
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+Mount = namedtuple('Mount', ['device', 'mount_point', 'fs_type'])
+
+# Spaces, tabs and backslashes in mount points are octal-escaped (e.g. \040)
+_OCTAL_ESCAPE = re.compile(rb'\\([0-7]{3})')
+
+# Kernel pseudo filesystems that never hold user files
+PSEUDO_FILESYSTEMS = {
+    'proc', 'sysfs', 'devpts', 'devtmpfs', 'cgroup', 'cgroup2', 'securityfs',
+    'debugfs', 'tracefs', 'mqueue', 'pstore', 'bpf', 'autofs', 'configfs',
+    'fusectl', 'hugetlbfs', 'binfmt_misc', 'rpc_pipefs', 'nsfs', 'efivarfs'
+}
+
+
+def parse_mounts(mounts_file='/proc/self/mounts'):
+    """Parse a mounts table into a list of Mount tuples"""
+    mounts = []
+    with open(mounts_file, 'rb') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 3:
+                continue
+            device, mount_point, fs_type = fields[:3]
+            mount_point = _OCTAL_ESCAPE.sub(lambda m: bytes([int(m.group(1), 8)]), mount_point)
+            mounts.append(Mount(os.fsdecode(device), os.fsdecode(mount_point), os.fsdecode(fs_type)))
+    return mounts
+
+
+class DiskUsageService:
+    """
+    Cached disk usage per mounted filesystem.
+
+    Mounts are enumerated from /proc/self/mounts and statvfs results are cached
+    for a short TTL. Each mount has at most one stat call in flight, and callers
+    never wait longer than `timeout` seconds: a slow network mount returns its
+    last known usage (or None) instead of blocking the GUI. Stat calls run on
+    daemon threads so a hung mount can neither starve the others nor keep the
+    application from exiting.
+    """
+
+    def __init__(self, ttl=5.0, timeout=0.5, mounts_file='/proc/self/mounts'):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.mounts_file = mounts_file
+        self._lock = threading.Lock()
+        self._usage = {}      # mount_point -> (checked_at, (total, used, free) or None)
+        self._pending = {}    # mount_point -> Future of an in-flight stat call
+        self._mounts = None
+        self._mounts_read_at = 0
+
+    def mounts(self):
+        """Return the mounted filesystems, re-reading the mount table at most once per TTL"""
+        now = time.monotonic()
+        with self._lock:
+            if self._mounts is not None and now - self._mounts_read_at < self.ttl:
+                return self._mounts
+
+        try:
+            mounts = [m for m in parse_mounts(self.mounts_file)
+                      if m.fs_type not in PSEUDO_FILESYSTEMS]
+        except OSError:
+            # No /proc (Windows, macOS): treat each drive or root as one mount
+            mounts = []
+
+        with self._lock:
+            self._mounts = mounts
+            self._mounts_read_at = now
+        return mounts
+
+    def mount_for(self, path):
+        """
+        Return the mount point that contains path
+        
+        The path is only resolved lexically, never stat'ed, so a hung mount
+        cannot block the caller here. Without a mount table the path itself is
+        returned; statvfs on it still reports its filesystem.
+        """
+        path = os.path.abspath(path)
+        mounts = self.mounts()
+
+        if mounts:
+            best = None
+            for mount in mounts:
+                mount_point = mount.mount_point
+                prefix = mount_point if mount_point.endswith(os.sep) else mount_point + os.sep
+                if path == mount_point or path.startswith(prefix):
+                    if best is None or len(mount_point) > len(best):
+                        best = mount_point
+            if best:
+                return best
+
+        if os.name == 'nt':
+            drive, _ = os.path.splitdrive(path)
+            return drive + os.sep if drive else path
+        return path
+
+    def usage(self, path):
+        """Return (total, used, free) in bytes for the filesystem holding path"""
+        return self.usage_for_mount(self.mount_for(path))
+
+    def usage_for_mount(self, mount_point):
+        """Return cached usage for a mount, refreshing it if the cache entry has expired"""
+        future = self._refresh(mount_point)
+        if future is not None:
+            try:
+                future.result(timeout=self.timeout)
+            except Exception:
+                # Timed out or failed: fall back to whatever we had
+                pass
+
+        with self._lock:
+            entry = self._usage.get(mount_point)
+        return entry[1] if entry else None
+
+    def all_usage(self):
+        """Return {mount_point: usage} for every mount, waiting at most `timeout` in total"""
+        mount_points = [m.mount_point for m in self.mounts()]
+        futures = [f for f in (self._refresh(mp) for mp in mount_points) if f is not None]
+
+        deadline = time.monotonic() + self.timeout
+        for future in futures:
+            try:
+                future.result(timeout=max(0, deadline - time.monotonic()))
+            except Exception:
+                pass
+
+        with self._lock:
+            return {mp: self._usage[mp][1] if mp in self._usage else None
+                    for mp in mount_points}
+
+    def _refresh(self, mount_point):
+        """Start a stat call for mount_point if its entry is stale; return the in-flight future"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._usage.get(mount_point)
+            if entry and now - entry[0] < self.ttl:
+                return None
+            future = self._pending.get(mount_point)
+            if future is None:
+                future = Future()
+                self._pending[mount_point] = future
+                threading.Thread(target=self._stat, args=(mount_point, future),
+                                 name='diskusage', daemon=True).start()
+            return future
+
+    def _stat(self, mount_point, future):
+        try:
+            if hasattr(os, 'statvfs'):
+                st = os.statvfs(mount_point)
+                total = st.f_blocks * st.f_frsize
+                free = st.f_bavail * st.f_frsize
+                used = (st.f_blocks - st.f_bfree) * st.f_frsize
+                usage = (total, used, free)
+            else:
+                usage = tuple(shutil.disk_usage(mount_point))
+        except OSError:
+            usage = None
+
+        with self._lock:
+            self._usage[mount_point] = (time.monotonic(), usage)
+            self._pending.pop(mount_point, None)
+        future.set_result(usage)
+
+
+# Shared service instance used by the dashboard and the encrypted view directory check
+disk_usage = DiskUsageService()
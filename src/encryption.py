@@ -6,23 +6,638 @@ import os
 import base64
 import json
 import hashlib
+import hmac
 import tempfile
 import shutil
+import threading
+import time
+import ctypes
+import ctypes.util
+import io
+import lzma
+import math
+import stat
+import struct
+import sys
+import zlib
+from collections import namedtuple, Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from diskusage import disk_usage
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+if os.name == 'nt':
+    _libc = None
+else:
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    except OSError:
+        _libc = None
+
+
+def _lock_memory(buffer):
+    """Best-effort pin of a bytearray in RAM so key material is never swapped out"""
+    try:
+        address = ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer))
+        if os.name == 'nt':
+            ctypes.windll.kernel32.VirtualLock(ctypes.c_void_p(address), ctypes.c_size_t(len(buffer)))
+        elif _libc is not None:
+            _libc.mlock(ctypes.c_void_p(address), ctypes.c_size_t(len(buffer)))
+    except Exception:
+        # Locking is a hardening measure; the cache still works without it
+        pass
+
+
+def _wipe_memory(buffer):
+    """Overwrite a bytearray with zeros and release its memory lock"""
+    try:
+        address = ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer))
+        ctypes.memset(address, 0, len(buffer))
+        if os.name == 'nt':
+            ctypes.windll.kernel32.VirtualUnlock(ctypes.c_void_p(address), ctypes.c_size_t(len(buffer)))
+        elif _libc is not None:
+            _libc.munlock(ctypes.c_void_p(address), ctypes.c_size_t(len(buffer)))
+    except Exception:
+        for i in range(len(buffer)):
+            buffer[i] = 0
+
+
+class SessionKeyCache:
+    """
+    Cache of derived AES keys for the current session.
+
+    Keys are stored in locked bytearrays indexed by an HMAC of the password
+    keyed with the salt, so PBKDF2 runs once per (password, salt) pair instead
+    of once per file. Concurrent requests for the same key share a single
+    derivation. Call clear() on sign out to wipe every cached key.
+
+    Callers get their own copy of the key, taken under the lock, so clear()
+    never zeroes a key out from under an operation that is still running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = {}       # cache id -> locked bytearray
+        self._pending = {}    # cache id -> Future of an in-flight derivation
+        self._generation = 0  # bumped by clear() so in-flight derivations are not cached
+
+    @staticmethod
+    def _cache_id(password, salt):
+        return hmac.new(salt, password.encode(), hashlib.sha256).digest()
+
+    def get(self, password, salt, derive):
+        """Return a copy of the cached key for (password, salt), calling derive() on a miss"""
+        future, owner = self._claim(password, salt)
+        if owner:
+            self._derive(future, derive)
+        return future.result()
+
+    def prefetch(self, password, salt, derive):
+        """
+        Start deriving the key for (password, salt) on a background thread
+        
+        Returns:
+            A Future that resolves to the key; get() calls for the same key
+            made meanwhile wait on the same derivation
+        """
+        future, owner = self._claim(password, salt)
+        if owner:
+            threading.Thread(target=self._derive, args=(future, derive),
+                             name='key-warmup', daemon=True).start()
+        return future
+
+    def _claim(self, password, salt):
+        """Return (future, owner): a finished future on a hit, the in-flight one, or a new one to fill"""
+        cache_id = self._cache_id(password, salt)
+        with self._lock:
+            key = self._keys.get(cache_id)
+            if key is not None:
+                future = Future()
+                future.set_result(bytes(key))
+                return future, False
+            future = self._pending.get(cache_id)
+            if future is not None:
+                return future, False
+            future = Future()
+            future.cache_id = cache_id
+            future.generation = self._generation
+            self._pending[cache_id] = future
+            return future, True
+
+    def _derive(self, future, derive):
+        try:
+            key = bytearray(derive())
+            _lock_memory(key)
+        except BaseException as e:
+            with self._lock:
+                if self._pending.get(future.cache_id) is future:
+                    del self._pending[future.cache_id]
+            future.set_exception(e)
+            return
+        with self._lock:
+            if self._pending.get(future.cache_id) is future:
+                del self._pending[future.cache_id]
+            result = bytes(key)
+            # A sign out happened meanwhile: hand the key to the waiters only
+            if future.generation == self._generation:
+                self._keys[future.cache_id] = key
+            else:
+                _wipe_memory(key)
+        future.set_result(result)
+
+    def clear(self):
+        """Wipe and forget every cached key"""
+        with self._lock:
+            keys = list(self._keys.values())
+            self._keys.clear()
+            self._pending.clear()
+            self._generation += 1
+        for key in keys:
+            _wipe_memory(key)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+
+# Encrypted file format v3:
+#   header: magic | version | flags | reserved | chunk size | salt | file id
+#   chunks: nonce (12) | ciphertext (<= chunk size) | tag (16), repeated
+# Every chunk is sealed with its own random nonce and authenticates the header,
+# its index and whether it is the final chunk. The header carries a random
+# file id, so chunks cannot be reordered, swapped between files or truncated
+# without detection.
+# v2 files have the same layout without the file id and can still be read.
+# The flags byte holds the id of the codec the plaintext was compressed with
+# before encryption (0 = stored as is); compressed files are chunked after
+# compression, so they can only be read sequentially.
+# Legacy v1 files are nonce (16) | tag (16) | ciphertext with no header.
+MAGIC = b'DVLT'
+FORMAT_VERSION = 3
+FILE_ID_SIZE = 16
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+NONCE_SIZE = 12
+TAG_SIZE = 16
+CHUNK_OVERHEAD = NONCE_SIZE + TAG_SIZE
+HEADER = struct.Struct('>4sBBHI16s16s')
+HEADER_V2 = struct.Struct('>4sBBHI16s')
+# Header layout for each readable version
+HEADER_FORMATS = {2: HEADER_V2, FORMAT_VERSION: HEADER}
+CHUNK_AAD = struct.Struct('>QB')
+
+Header = namedtuple('Header', ['version', 'flags', 'chunk_size', 'salt', 'raw', 'file_id'],
+                    defaults=(None,))
+
+
+# Compression codecs by id. compressor() returns an object with compress() and
+# flush(); decompressor() returns one with decompress() and optionally flush().
+Codec = namedtuple('Codec', ['id', 'name', 'compressor', 'decompressor'])
+_codecs = {}
+
+
+def register_codec(codec_id, name, compressor, decompressor):
+    """
+    Make a compression codec available to encrypt_file and decrypt_file
+    
+    Args:
+        codec_id: Number stored in the file header (1-255, must never be reused)
+        name: Name used to select the codec
+        compressor: Factory for streaming compressor objects
+        decompressor: Factory for streaming decompressor objects
+    """
+    if not 0 <= codec_id <= 255:
+        raise ValueError(f"Codec id out of range: {codec_id}")
+    for codec in _codecs.values():
+        if codec.id == codec_id or codec.name == name:
+            raise ValueError(f"Codec already registered: {codec.id} ({codec.name})")
+    _codecs[codec_id] = Codec(codec_id, name, compressor, decompressor)
+    return _codecs[codec_id]
+
+
+def get_codec(codec):
+    """Look up a codec by id or name"""
+    for registered in _codecs.values():
+        if codec in (registered.id, registered.name):
+            return registered
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+register_codec(0, 'none', None, None)
+register_codec(1, 'zlib', lambda: zlib.compressobj(6), zlib.decompressobj)
+register_codec(2, 'lzma', lzma.LZMACompressor, lzma.LZMADecompressor)
+
+# Types whose contents are already compressed; 'auto' never recompresses them
+COMPRESSED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.mp3', '.aac', '.ogg', '.flac',
+    '.mp4', '.mkv', '.mov', '.avi', '.webm', '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z',
+    '.rar', '.zst', '.docx', '.xlsx', '.pptx', '.odt', '.epub', '.jar', '.apk', '.pdf'
+}
+ENTROPY_SAMPLE_SIZE = 64 * 1024
+# Bits per byte above which a sample is treated as incompressible
+ENTROPY_THRESHOLD = 7.5
+
+
+def sample_entropy(data):
+    """Shannon entropy of data in bits per byte"""
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(count / total * math.log2(count / total) for count in Counter(data).values())
+
+
+def choose_codec(file_path, codec='zlib'):
+    """
+    Decide whether a file is worth compressing before encryption
+    
+    Known compressed types and files whose first bytes look random get
+    'none'; everything else gets `codec`.
+    """
+    if os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return get_codec('none')
+    with open(file_path, 'rb') as f:
+        sample = f.read(ENTROPY_SAMPLE_SIZE)
+    if len(sample) < 64 or sample_entropy(sample) > ENTROPY_THRESHOLD:
+        return get_codec('none')
+    return get_codec(codec)
+
+
+def _compressed_pieces(src, codec, chunk_size):
+    """Yield the compressed form of src cut into chunk_size pieces (the last may be shorter)"""
+    compressor = codec.compressor()
+    buffer = bytearray()
+    while True:
+        block = src.read(chunk_size)
+        buffer += compressor.compress(block) if block else compressor.flush()
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+        if not block:
+            break
+    if buffer:
+        yield bytes(buffer)
+
+
+def make_header(chunk_size, salt, flags=0):
+    """Build a header with a fresh random file id for a new encrypted file"""
+    file_id = get_random_bytes(FILE_ID_SIZE)
+    raw = HEADER.pack(MAGIC, FORMAT_VERSION, flags, 0, chunk_size, salt, file_id)
+    return Header(FORMAT_VERSION, flags, chunk_size, salt, raw, file_id)
+
+
+def read_header(f):
+    """Read a v2 or v3 header from f; returns None and rewinds for legacy v1 files"""
+    start = f.tell()
+    raw = f.read(len(MAGIC) + 1)
+    if len(raw) < len(MAGIC) + 1 or raw[:len(MAGIC)] != MAGIC:
+        f.seek(start)
+        return None
+
+    layout = HEADER_FORMATS.get(raw[len(MAGIC)])
+    if layout is None:
+        raise ValueError(f"Unsupported encrypted file version: {raw[len(MAGIC)]}")
+    raw += f.read(layout.size - len(raw))
+    if len(raw) < layout.size:
+        raise ValueError("Encrypted file is truncated")
+    _, version, flags, _, chunk_size, salt, *file_id = layout.unpack(raw)
+    if chunk_size == 0:
+        raise ValueError("Corrupt encrypted file header")
+    return Header(version, flags, chunk_size, salt, raw, file_id[0] if file_id else None)
+
+
+def chunk_count(header, file_size):
+    """Number of chunk records in a chunked file of file_size bytes"""
+    body = file_size - len(header.raw)
+    record_size = header.chunk_size + CHUNK_OVERHEAD
+    if body < CHUNK_OVERHEAD:
+        raise ValueError("Encrypted file is truncated")
+    count = -(-body // record_size)
+    if body - (count - 1) * record_size < CHUNK_OVERHEAD:
+        raise ValueError("Encrypted file is truncated")
+    return count
+
+
+def seal_chunk(key, header, index, final, plaintext):
+    """Encrypt one chunk bound to its header, index and final marker"""
+    nonce = get_random_bytes(NONCE_SIZE)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(header.raw + CHUNK_AAD.pack(index, final))
+    ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+    return nonce + ciphertext + tag
+
+
+def open_chunk(key, header, index, final, record):
+    """Decrypt and verify one chunk record"""
+    if len(record) < CHUNK_OVERHEAD:
+        raise ValueError("Encrypted chunk is truncated")
+    nonce = record[:NONCE_SIZE]
+    ciphertext = record[NONCE_SIZE:-TAG_SIZE]
+    tag = record[-TAG_SIZE:]
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(header.raw + CHUNK_AAD.pack(index, final))
+    return cipher.decrypt_and_verify(ciphertext, tag)
+
+
+def iter_chunks(f, header, key, file_size):
+    """Yield (index, plaintext) for every chunk of a chunked (v2 or v3) file positioned after its header"""
+    count = chunk_count(header, file_size)
+    record_size = header.chunk_size + CHUNK_OVERHEAD
+    for index in range(count):
+        final = index == count - 1
+        record = f.read(record_size)
+        yield index, open_chunk(key, header, index, final, record)
+
+
+class EncryptedFileReader(io.RawIOBase):
+    """
+    Read-only, seekable view of the plaintext inside a chunked encrypted file.
+    
+    Only the chunks a read touches are decrypted (and verified); a small LRU
+    keeps recently used chunks so sequential reads decrypt each chunk once.
+    """
+
+    def __init__(self, path, key, cache_chunks=4):
+        super().__init__()
+        self._file = open(path, 'rb')
+        try:
+            self.header = read_header(self._file)
+            if self.header is None:
+                raise ValueError("Legacy encrypted files do not support random access")
+            if self.header.flags:
+                raise ValueError("Compressed files do not support random access")
+            file_size = os.fstat(self._file.fileno()).st_size
+            self.chunk_count = chunk_count(self.header, file_size)
+        except Exception:
+            self._file.close()
+            raise
+
+        self.name = path
+        self._key = key
+        self._record_size = self.header.chunk_size + CHUNK_OVERHEAD
+        last_record = file_size - len(self.header.raw) - (self.chunk_count - 1) * self._record_size
+        self.size = (self.chunk_count - 1) * self.header.chunk_size + last_record - CHUNK_OVERHEAD
+        self._position = 0
+        self._cache = OrderedDict()
+        self._cache_chunks = cache_chunks
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def read_chunk(self, index):
+        """Return the decrypted plaintext of chunk index"""
+        if not 0 <= index < self.chunk_count:
+            raise IndexError(f"Chunk index out of range: {index}")
+        chunk = self._cache.get(index)
+        if chunk is not None:
+            self._cache.move_to_end(index)
+            return chunk
+
+        self._file.seek(len(self.header.raw) + index * self._record_size)
+        record = self._file.read(self._record_size)
+        chunk = open_chunk(self._key, self.header, index, index == self.chunk_count - 1, record)
+
+        self._cache[index] = chunk
+        if len(self._cache) > self._cache_chunks:
+            self._cache.popitem(last=False)
+        return chunk
+
+    def readinto(self, buffer):
+        if self._position >= self.size:
+            return 0
+        index, offset = divmod(self._position, self.header.chunk_size)
+        chunk = self.read_chunk(index)
+        count = min(len(buffer), len(chunk) - offset)
+        buffer[:count] = chunk[offset:offset + count]
+        self._position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            self._cache.clear()
+        super().close()
+
+
+# detect_format results keyed by (device, inode, mtime, size)
+_format_cache = {}
+_format_cache_lock = threading.Lock()
+_FORMAT_CACHE_LIMIT = 50000
+
+
+def _sniff_format(file_path):
+    """Read just enough of a file to recognise the encrypted header"""
+    with open(file_path, 'rb') as f:
+        head = f.read(len(MAGIC) + 1)
+    # Plaintext can start with the magic too; only a known version counts
+    if head[:len(MAGIC)] == MAGIC and len(head) == len(MAGIC) + 1 and head[len(MAGIC)] in HEADER_FORMATS:
+        return head[len(MAGIC)]
+    # Legacy v1 output has no header; only its extension identifies it
+    if file_path.endswith('.enc'):
+        return 1
+    return None
+
+
+def detect_format(file_path):
+    """
+    Identify an encrypted file from its first few bytes
+    
+    Returns:
+        The format version (3 or 2 for chunked files, 1 for legacy .enc files),
+        or None if the file is not encrypted or cannot be read
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    cache_key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size, file_path.endswith('.enc'))
+
+    with _format_cache_lock:
+        if cache_key in _format_cache:
+            return _format_cache[cache_key]
+
+    try:
+        version = _sniff_format(file_path)
+    except OSError:
+        return None
+
+    with _format_cache_lock:
+        if len(_format_cache) >= _FORMAT_CACHE_LIMIT:
+            _format_cache.clear()
+        _format_cache[cache_key] = version
+    return version
+
+
+# What a temp copy looked like when it was decrypted: its (size, mtime_ns),
+# whether that mtime is too recent to prove the file unchanged, the plaintext
+# chunk size with per-chunk hashes, and the (size, mtime_ns) of the original
+Fingerprint = namedtuple('Fingerprint', ['signature', 'racy', 'chunk_size', 'chunk_hashes', 'source_signature'])
+
+# Writes within this long of the recorded mtime may not change it (coarse timestamps)
+RACY_WINDOW_NS = 2 * 10**9
+
+
+def _chunk_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _hash_chunks(path, chunk_size):
+    """Per-chunk hashes of a plaintext file, matching how encrypt_file splits it"""
+    hashes = []
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if data or not hashes:
+                hashes.append(_chunk_digest(data))
+            if len(data) < chunk_size:
+                return hashes
+
+
+def _fingerprint(temp_path, source_path, chunk_size, chunk_hashes):
+    signature = _file_signature(temp_path)
+    racy = time.time_ns() - signature[1] < RACY_WINDOW_NS
+    return Fingerprint(signature, racy, chunk_size, chunk_hashes, _file_signature(source_path))
+
+
+def _atomic_output(output_path):
+    """Open a temporary file next to output_path; the caller renames it into place"""
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(output_path), suffix='.part')
+    return os.fdopen(fd, 'wb'), temp_path
+
+
+# Filesystems whose contents live only in memory
+MEMORY_FILESYSTEMS = {'tmpfs', 'ramfs'}
+
+# Directory for decrypted viewing copies, chosen once per process
+_view_dir = None
+_view_dir_lock = threading.Lock()
+
+
+def _is_private_dir(path):
+    """True if path is a real directory owned by this user and closed to everyone else"""
+    st = os.lstat(path)
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def _on_memory_filesystem(path):
+    """True if path is on a tmpfs/ramfs mount according to the mount table"""
+    mount_point = disk_usage.mount_for(path)
+    return any(m.mount_point == mount_point and m.fs_type in MEMORY_FILESYSTEMS
+               for m in disk_usage.mounts())
+
+
+def private_view_dir():
+    """
+    Return a directory for decrypted viewing copies that only this user can read
+    
+    A memory-backed location is used so plaintext never reaches persistent
+    storage: $XDG_RUNTIME_DIR, then /dev/shm. On Linux, OSError is raised if
+    neither is available rather than writing plaintext to disk. Other platforms
+    have no such location and use a private directory under the system temp
+    directory.
+    """
+    global _view_dir
+    with _view_dir_lock:
+        if _view_dir is not None and os.path.isdir(_view_dir):
+            return _view_dir
+            
+        candidates = []
+        if os.name != 'nt':
+            runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+            if runtime_dir:
+                candidates.append(os.path.join(runtime_dir, 'docuvault'))
+            candidates.append(f'/dev/shm/docuvault-{os.getuid()}')
+            
+        for candidate in candidates:
+            parent = os.path.dirname(candidate)
+            try:
+                if not os.path.isdir(parent) or not _on_memory_filesystem(parent):
+                    continue
+                os.makedirs(candidate, mode=0o700, exist_ok=True)
+                # Refuse a directory someone else created or opened up
+                if _is_private_dir(candidate):
+                    _view_dir = candidate
+                    return _view_dir
+            except OSError:
+                continue
+                
+        if sys.platform.startswith('linux'):
+            raise OSError("No memory-backed directory ($XDG_RUNTIME_DIR or /dev/shm) "
+                          "is available for decrypted copies")
+        _view_dir = tempfile.mkdtemp(prefix='docuvault-view-')
+        return _view_dir
+
+
+# Keys derived during this session, shared by every FileEncryptor
+session_keys = SessionKeyCache()
+
+
+def _pbkdf2(password, salt):
+    """Use PBKDF2 to derive a 32-byte (256-bit) key"""
+    return PBKDF2(password.encode(), salt, dkLen=32, count=1000000)
+
+# Salt file contents keyed by (path, mtime, size) so the JSON is parsed only when it changes
+_salt_cache = {}
+
 
 class FileEncryptor:
     def __init__(self, master_password=None):
         self.master_password = master_password
         self.key_file = os.path.join(os.path.expanduser('~'), '.docuvault_keys.json')
         self.temp_files = {}  # Track temporary decrypted files
+        self.codec = 'none'  # Default for encrypt_file: 'none', 'auto' or a codec name
+        self.memory_views = {}  # /proc/<pid>/fd paths of sealed in-memory copies -> fd
+        self.temp_fingerprints = {}  # temp file -> Fingerprint taken when it was decrypted
         
     def set_master_password(self, password):
         """Set or update the master password"""
         self.master_password = password
-        # Generate a new salt and store it
-        salt = get_random_bytes(16)
-        self.save_salt(salt)
+        # Keep the existing salt: legacy files and cached keys depend on it
+        self.get_salt()
         return True
         
+    def warm_up_key(self, password=None):
+        """
+        Derive the session key for password (default: master password) in the background
+        
+        Returns:
+            A Future resolving to the key; encrypt and decrypt calls made
+            before it finishes wait for the same derivation
+        """
+        if password is None:
+            password = self.master_password
+        if not password:
+            raise ValueError("No password provided for key derivation")
+        salt = self.get_salt()
+        return session_keys.prefetch(password, salt, lambda: _pbkdf2(password, salt))
+        
     def save_salt(self, salt):
         """Save the salt to the key file"""
         data = {}
@@ -37,9 +652,26 @@ class FileEncryptor:
         
         with open(self.key_file, 'w') as f:
             json.dump(data, f)
+        self._remember_salt(salt)
+            
+    def _remember_salt(self, salt):
+        """Cache the salt against the key file's current stat signature"""
+        try:
+            st = os.stat(self.key_file)
+            _salt_cache[self.key_file] = ((st.st_mtime_ns, st.st_size), salt)
+        except OSError:
+            _salt_cache.pop(self.key_file, None)
             
     def get_salt(self):
         """Retrieve the salt from the key file"""
+        try:
+            st = os.stat(self.key_file)
+            cached = _salt_cache.get(self.key_file)
+            if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+                return cached[1]
+        except OSError:
+            pass
+            
         if not os.path.exists(self.key_file):
             # If no salt exists, create one
             salt = get_random_bytes(16)
@@ -50,37 +682,46 @@ class FileEncryptor:
             with open(self.key_file, 'r') as f:
                 data = json.load(f)
                 salt = base64.b64decode(data.get('salt', ''))
-                if not salt:
-                    salt = get_random_bytes(16)
-                    self.save_salt(salt)
-                return salt
+            if not salt:
+                salt = get_random_bytes(16)
+                self.save_salt(salt)
+            else:
+                self._remember_salt(salt)
+            return salt
         except Exception as e:
             # If any error occurs, generate a new salt
             salt = get_random_bytes(16)
             self.save_salt(salt)
             return salt
             
-    def derive_key(self, password=None):
-        """Derive an AES key from the master password"""
+    def derive_key(self, password=None, salt=None):
+        """Derive an AES key from the master password (cached for the session)"""
         if password is None:
             password = self.master_password
             
         if not password:
             raise ValueError("No password provided for key derivation")
             
-        salt = self.get_salt()
-        # Use PBKDF2 to derive a 32-byte (256-bit) key
-        key = PBKDF2(password.encode(), salt, dkLen=32, count=1000000)
-        return key
+        if salt is None:
+            salt = self.get_salt()
+        return session_keys.get(password, salt, lambda: _pbkdf2(password, salt))
         
-    def encrypt_file(self, file_path, output_path=None, password=None):
+    def encrypt_file(self, file_path, output_path=None, password=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                     codec=None):
         """
         Encrypt a file using AES-256-GCM
         
+        The file is streamed in fixed-size chunks (format v3), so memory use
+        stays constant regardless of file size. It can optionally be
+        compressed on the way in.
+        
         Args:
             file_path: Path to the file to encrypt
             output_path: Path where to save the encrypted file (default: same as input with .enc extension)
             password: Optional password to use (default: master password)
+            chunk_size: Bytes sealed per chunk
+            codec: 'none', 'auto' (compress only files that look compressible)
+                or a registered codec name (default: self.codec)
             
         Returns:
             Path to the encrypted file
@@ -92,39 +733,51 @@ class FileEncryptor:
         if output_path is None:
             output_path = file_path + '.enc'
             
+        temp_path = None
         try:
-            # Derive the encryption key
-            key = self.derive_key(password)
+            # Derive the encryption key; the salt travels in the header
+            salt = self.get_salt()
+            key = self.derive_key(password, salt)
+            codec = codec or self.codec
+            codec = choose_codec(file_path) if codec == 'auto' else get_codec(codec)
+            header = make_header(chunk_size, salt, flags=codec.id)
             
-            # Generate a random nonce
-            nonce = get_random_bytes(16)
-            
-            # Create cipher
-            cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
-            
-            # Read the file
-            with open(file_path, 'rb') as f:
-                plaintext = f.read()
-                
-            # Encrypt the data
-            ciphertext, tag = cipher.encrypt_and_digest(plaintext)
-            
-            # Write the encrypted file
-            with open(output_path, 'wb') as f:
-                # Format: nonce (16 bytes) + tag (16 bytes) + ciphertext
-                f.write(nonce)
-                f.write(tag)
-                f.write(ciphertext)
+            out, temp_path = _atomic_output(output_path)
+            with open(file_path, 'rb') as src, out:
+                out.write(header.raw)
+                if codec.id:
+                    pieces = _compressed_pieces(src, codec, chunk_size)
+                else:
+                    pieces = iter(lambda: src.read(chunk_size), b'')
                 
+                # Read one chunk ahead so the last chunk can be marked final
+                index = 0
+                chunk = next(pieces, b'')
+                while True:
+                    next_chunk = next(pieces, b'')
+                    final = not next_chunk
+                    out.write(seal_chunk(key, header, index, final, chunk))
+                    if final:
+                        break
+                    chunk = next_chunk
+                    index += 1
+                    
+            shutil.copymode(file_path, temp_path)
+            os.replace(temp_path, output_path)
             return output_path
             
         except Exception as e:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
             raise RuntimeError(f"Encryption failed: {str(e)}")
             
     def decrypt_file(self, file_path, output_path=None, password=None, temp=False):
         """
         Decrypt a file using AES-256-GCM
         
+        Both chunked v2/v3 files and legacy v1 files (nonce + tag + ciphertext)
+        are streamed; the output only appears once it has been authenticated.
+        
         Args:
             file_path: Path to the encrypted file
             output_path: Path where to save the decrypted file (default: original filename without .enc)
@@ -144,95 +797,403 @@ class FileEncryptor:
             else:
                 output_path = file_path + '.dec'
                 
-        # If temp is True, create a temporary file
+        # If temp is True, decrypt into the private viewing directory
         if temp:
-            temp_dir = tempfile.gettempdir()
-            output_path = os.path.join(temp_dir, os.path.basename(file_path))
-            if output_path.endswith('.enc'):
-                output_path = output_path[:-4]
+            output_path = self._view_path(file_path)
                 
+        temp_path = None
         try:
-            # Derive the decryption key
-            key = self.derive_key(password)
-            
-            # Read the encrypted file
-            with open(file_path, 'rb') as f:
-                nonce = f.read(16)
-                tag = f.read(16)
-                ciphertext = f.read()
-                
-            # Create cipher
-            cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
-            
-            # Decrypt the data
-            plaintext = cipher.decrypt_and_verify(ciphertext, tag)
-            
-            # Write the decrypted file
-            with open(output_path, 'wb') as f:
-                f.write(plaintext)
+            chunk_hashes = []
+            out, temp_path = _atomic_output(output_path)
+            with open(file_path, 'rb') as src, out:
+                header = self._decrypt_stream(src, out, password, chunk_hashes)
+                    
+            shutil.copymode(file_path, temp_path)
+            if temp:
+                # Carry the original's mtime so any later write is visible from a stat
+                src_stat = os.stat(file_path)
+                os.utime(temp_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+            os.replace(temp_path, output_path)
                 
             # If temp, store the mapping for cleanup later
             if temp:
                 self.temp_files[output_path] = file_path
+                patchable = header is not None and not header.flags
+                if not patchable:
+                    chunk_hashes = _hash_chunks(output_path, DEFAULT_CHUNK_SIZE)
+                chunk_size = header.chunk_size if patchable else DEFAULT_CHUNK_SIZE
+                self.temp_fingerprints[output_path] = _fingerprint(output_path, file_path, chunk_size, chunk_hashes)
                 
             return output_path
             
         except Exception as e:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
             raise RuntimeError(f"Decryption failed: {str(e)}")
             
-    def cleanup_temp_file(self, temp_path):
+    def decrypt_for_viewing(self, file_path, password=None, read_only=False):
         """
-        Re-encrypt and remove a temporary decrypted file
+        Decrypt a file so an external application can open it
         
         Args:
-            temp_path: Path to the temporary decrypted file
+            file_path: Path to the encrypted file
+            password: Optional password to use (default: master password)
+            read_only: If True and the platform supports it, decrypt into a
+                sealed anonymous memory file instead of the viewing directory
+            
+        Returns:
+            Path to hand to the application. It is a sealed memory file (listed
+            in memory_views) when read_only was requested, or when there is no
+            memory-backed viewing directory to hold an editable copy.
+        """
+        use_memory = hasattr(os, 'memfd_create') and fcntl is not None
+        if read_only and use_memory:
+            return self.decrypt_to_memory(file_path, password)
+        try:
+            private_view_dir()
+        except OSError:
+            if not use_memory:
+                raise
+            # Never put an editable copy on disk; fall back to a read-only one
+            return self.decrypt_to_memory(file_path, password)
+        return self.decrypt_file(file_path, password=password, temp=True)
+        
+    def decrypt_to_memory(self, file_path, password=None):
+        """
+        Decrypt a file into an anonymous memory file that cannot be modified (Linux only)
+        
+        The plaintext never has a name on any filesystem. It is reachable through
+        /proc/<pid>/fd/<fd> for as long as this process keeps the descriptor open,
+        which is enough for an application started from here to open it.
+        
+        Args:
+            file_path: Path to the encrypted file
+            password: Optional password to use (default: master password)
+            
+        Returns:
+            The /proc path of the memory file
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+            
+        name = os.path.basename(file_path)
+        if name.endswith('.enc'):
+            name = name[:-4]
+        fd = os.memfd_create(name, os.MFD_CLOEXEC | os.MFD_ALLOW_SEALING)
+        try:
+            with open(file_path, 'rb') as src, os.fdopen(os.dup(fd), 'wb') as out:
+                self._decrypt_stream(src, out, password)
+            # Seal the contents so viewers cannot change (or grow) the plaintext
+            fcntl.fcntl(fd, fcntl.F_ADD_SEALS, fcntl.F_SEAL_WRITE | fcntl.F_SEAL_GROW |
+                        fcntl.F_SEAL_SHRINK | fcntl.F_SEAL_SEAL)
+        except Exception as e:
+            os.close(fd)
+            raise RuntimeError(f"Decryption failed: {str(e)}")
+            
+        view_path = f"/proc/{os.getpid()}/fd/{fd}"
+        self.memory_views[view_path] = fd
+        return view_path
+        
+    def close_memory_views(self):
+        """Release every in-memory decrypted copy; applications that opened one keep their own handle"""
+        for fd in self.memory_views.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.memory_views.clear()
+        
+    def _view_path(self, file_path):
+        """Pick a path in the private viewing directory for a decrypted copy of file_path"""
+        name = os.path.basename(file_path)
+        if name.endswith('.enc'):
+            name = name[:-4]
+        view_dir = private_view_dir()
+        output_path = os.path.join(view_dir, name)
+        if os.path.exists(output_path) and self.temp_files.get(output_path) != file_path:
+            # A different file with the same name is already open; keep them apart
+            output_path = os.path.join(tempfile.mkdtemp(dir=view_dir), name)
+        return output_path
+        
+    def _decrypt_stream(self, src, out, password=None, chunk_hashes=None):
+        """Decrypt an open chunked or legacy v1 file into out and return its header (None for v1)"""
+        header = read_header(src)
+        if header is not None and header.flags:
+            decompressor = get_codec(header.flags).decompressor()
+            key = self.derive_key(password, header.salt)
+            file_size = os.fstat(src.fileno()).st_size
+            for _, data in iter_chunks(src, header, key, file_size):
+                out.write(decompressor.decompress(data))
+            if hasattr(decompressor, 'flush'):
+                out.write(decompressor.flush())
+        elif header is not None:
+            key = self.derive_key(password, header.salt)
+            file_size = os.fstat(src.fileno()).st_size
+            for _, plaintext in iter_chunks(src, header, key, file_size):
+                out.write(plaintext)
+                if chunk_hashes is not None:
+                    chunk_hashes.append(_chunk_digest(plaintext))
+        else:
+            self._decrypt_legacy(src, out, self.derive_key(password))
+        return header
+            
+    def open_encrypted(self, file_path, password=None):
+        """
+        Open an encrypted file for random-access reading
+        
+        Args:
+            file_path: Path to a chunked encrypted file
+            password: Optional password to use (default: master password)
+            
+        Returns:
+            A read-only, seekable EncryptedFileReader over the plaintext
         """
-        if temp_path in self.temp_files:
-            original_encrypted_path = self.temp_files[temp_path]
+        with open(file_path, 'rb') as f:
+            header = read_header(f)
+        if header is None:
+            raise ValueError("Legacy encrypted files do not support random access")
+        if header.flags:
+            raise ValueError("Compressed files do not support random access")
+        return EncryptedFileReader(file_path, self.derive_key(password, header.salt))
+        
+    def read_range(self, file_path, offset, length, password=None):
+        """Decrypt only the bytes [offset, offset + length) of an encrypted file"""
+        with self.open_encrypted(file_path, password) as reader:
+            reader.seek(offset)
+            data = bytearray()
+            while len(data) < length:
+                block = reader.read(length - len(data))
+                if not block:
+                    break
+                data += block
+            return bytes(data)
+        
+    def _decrypt_legacy(self, src, out, key, block_size=DEFAULT_CHUNK_SIZE):
+        """Stream-decrypt a v1 file (nonce + tag + ciphertext), verifying the tag at the end"""
+        nonce = src.read(16)
+        tag = src.read(16)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        while True:
+            block = src.read(block_size)
+            if not block:
+                break
+            out.write(cipher.decrypt(block))
+        cipher.verify(tag)
+            
+    def sync_temp_file(self, temp_path, password=None):
+        """
+        Write changes made to a temporary decrypted file back into its encrypted original
+        
+        A file whose size and mtime are unchanged costs a single stat; otherwise
+        its plaintext is hashed chunk by chunk. For chunked files only the chunks
+        whose hash changed are re-sealed in place, plus the tail when the chunk
+        count changes (the final marker moves). Changed legacy files, or
+        originals modified by someone else since decryption, are re-encrypted
+        in full.
+        
+        Args:
+            temp_path: Path to the temporary decrypted file
+            password: Optional password to use (default: master password)
             
+        Returns:
+            Number of chunks written (0 if nothing changed)
+        """
+        original_encrypted_path = self.temp_files[temp_path]
+        fingerprint = self.temp_fingerprints.get(temp_path)
+        
+        if fingerprint is not None:
+            if not fingerprint.racy and _file_signature(temp_path) == fingerprint.signature:
+                return 0
             try:
-                # Re-encrypt the file if it still exists
-                if os.path.exists(temp_path):
-                    self.encrypt_file(temp_path, original_encrypted_path)
+                source_unchanged = _file_signature(original_encrypted_path) == fingerprint.source_signature
+            except OSError:
+                source_unchanged = False
+                
+            if source_unchanged:
+                with open(original_encrypted_path, 'rb') as f:
+                    header = read_header(f)
+                if header is not None and not header.flags and header.chunk_size == fingerprint.chunk_size:
+                    try:
+                        return self._patch_chunks(temp_path, original_encrypted_path, header,
+                                                  fingerprint.chunk_hashes, password)
+                    except Exception as e:
+                        raise RuntimeError(f"Encryption failed: {str(e)}")
+                # Legacy and compressed files cannot be patched, but viewing one costs nothing
+                if _hash_chunks(temp_path, fingerprint.chunk_size) == fingerprint.chunk_hashes:
+                    self.temp_fingerprints[temp_path] = _fingerprint(
+                        temp_path, original_encrypted_path, fingerprint.chunk_size, fingerprint.chunk_hashes)
+                    return 0
                     
-                # Delete the temporary file
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+        # Keep the original's compression when rewriting it
+        codec = None
+        try:
+            with open(original_encrypted_path, 'rb') as f:
+                header = read_header(f)
+            if header is not None:
+                codec = get_codec(header.flags).name
+        except (OSError, ValueError):
+            pass
+        self.encrypt_file(temp_path, original_encrypted_path, password, codec=codec)
+        chunk_hashes = _hash_chunks(temp_path, DEFAULT_CHUNK_SIZE)
+        self.temp_fingerprints[temp_path] = _fingerprint(
+            temp_path, original_encrypted_path, DEFAULT_CHUNK_SIZE, chunk_hashes)
+        return len(chunk_hashes)
+        
+    def _patch_chunks(self, temp_path, original_encrypted_path, header, old_hashes, password=None):
+        """
+        Re-seal the changed chunks of a chunked file; returns how many were written
+        
+        The original is copied next to itself, the copy is patched and synced,
+        then renamed over the original, so a crash leaves either the old file or
+        the new one and never a mix of old and new chunks.
+        """
+        chunk_size = header.chunk_size
+        record_size = chunk_size + CHUNK_OVERHEAD
+        size = os.path.getsize(temp_path)
+        count = max(1, -(-size // chunk_size))
+        # From here on chunks must be rewritten because the final marker moves
+        tail_start = count if count == len(old_hashes) else min(count, len(old_hashes)) - 1
+        
+        chunk_hashes = []
+        changed = []
+        with open(temp_path, 'rb') as src:
+            for index in range(count):
+                digest = _chunk_digest(src.read(chunk_size))
+                chunk_hashes.append(digest)
+                if index >= tail_start or digest != old_hashes[index]:
+                    changed.append(index)
                     
-                # Remove from tracking dict
-                del self.temp_files[temp_path]
+        if changed:
+            key = self.derive_key(password, header.salt)
+            out, part_path = _atomic_output(original_encrypted_path)
+            try:
+                with open(temp_path, 'rb') as src, open(original_encrypted_path, 'rb') as original, out:
+                    shutil.copyfileobj(original, out)
+                    for index in changed:
+                        src.seek(index * chunk_size)
+                        plaintext = src.read(chunk_size)
+                        # Record what was actually sealed, even if the file moved on since hashing
+                        chunk_hashes[index] = _chunk_digest(plaintext)
+                        out.seek(len(header.raw) + index * record_size)
+                        out.write(seal_chunk(key, header, index, index == count - 1, plaintext))
+                    out.truncate(len(header.raw) + count * CHUNK_OVERHEAD + size)
+                    out.flush()
+                    os.fsync(out.fileno())
+                shutil.copymode(original_encrypted_path, part_path)
+                os.replace(part_path, original_encrypted_path)
+            except Exception:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
                 
-            except Exception as e:
-                print(f"Error during cleanup: {str(e)}")
+        self.temp_fingerprints[temp_path] = _fingerprint(
+            temp_path, original_encrypted_path, chunk_size, chunk_hashes)
+        return len(changed)
+        
+    def release_temp_file(self, temp_path):
+        """
+        Sync a temporary decrypted file back to its original and delete it
+        
+        Unlike cleanup_temp_file, errors are raised to the caller.
+        """
+        if temp_path not in self.temp_files:
+            return
+        if os.path.exists(temp_path):
+            self.sync_temp_file(temp_path)
+            os.remove(temp_path)
+            
+        # Drop the per-file directory used to separate clashing names
+        parent = os.path.dirname(temp_path)
+        if parent != private_view_dir() and os.path.dirname(parent) == private_view_dir():
+            try:
+                os.rmdir(parent)
+            except OSError:
+                pass
+                
+        # Remove from tracking dicts
+        del self.temp_files[temp_path]
+        self.temp_fingerprints.pop(temp_path, None)
+        
+    def cleanup_temp_file(self, temp_path):
+        """
+        Re-encrypt (if changed) and remove a temporary decrypted file
+        
+        Args:
+            temp_path: Path to the temporary decrypted file
+        """
+        try:
+            self.release_temp_file(temp_path)
+        except Exception as e:
+            print(f"Error during cleanup: {str(e)}")
                 
     def cleanup_all_temp_files(self):
         """Clean up all temporary decrypted files"""
         temp_paths = list(self.temp_files.keys())
         for temp_path in temp_paths:
             self.cleanup_temp_file(temp_path)
+        self.close_memory_views()
             
     def is_file_encrypted(self, file_path):
-        """Check if a file is encrypted (has .enc extension or is in encrypted format)"""
-        if file_path.endswith('.enc'):
-            return True
+        """Check if a file is encrypted, using its header rather than its name or size"""
+        return detect_format(file_path) is not None
             
-        # Try to check file format
-        try:
-            with open(file_path, 'rb') as f:
-                # Read the first 32 bytes (nonce + tag)
-                header = f.read(32)
-                # If file is smaller than 32 bytes, it's not in our encrypted format
-                if len(header) < 32:
-                    return False
+    def _collect_files(self, directory_path, recursive, include):
+        """List the files under directory_path that pass include(file_path)"""
+        collected = []
+        for root, dirs, files in os.walk(directory_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                if include(file_path):
+                    collected.append(file_path)
                     
-                # Try to decrypt with the key
-                # This is a simple heuristic and might give false positives
-                return True
-                
-        except Exception:
-            return False
+            # If not recursive, break after processing the top directory
+            if not recursive:
+                break
+        return collected
+        
+    def _process_files(self, file_paths, process, workers=1, progress_callback=None):
+        """
+        Run process(file_path) for every file, optionally on a thread pool
+        
+        AES in pycryptodome releases the GIL, so threads scale with cores.
+        The progress callback always runs on the calling thread.
+        
+        Returns:
+            (results, failures) where failures holds (file_path, error) tuples
+        """
+        results = []
+        failures = []
+        total = len(file_paths)
+        
+        def record(file_path, result, error):
+            if error is None:
+                results.append(result)
+            else:
+                failures.append((file_path, error))
+            if progress_callback:
+                progress_callback(len(results) + len(failures), total, file_path, error)
+        
+        if workers == 1 or total <= 1:
+            for file_path in file_paths:
+                try:
+                    record(file_path, process(file_path), None)
+                except Exception as e:
+                    record(file_path, None, str(e))
+            return results, failures
             
-    def encrypt_directory(self, directory_path, password=None, recursive=True):
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {pool.submit(process, file_path): file_path for file_path in file_paths}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    record(file_path, future.result(), None)
+                except Exception as e:
+                    record(file_path, None, str(e))
+                    
+        return results, failures
+            
+    def encrypt_directory(self, directory_path, password=None, recursive=True,
+                          workers=1, progress_callback=None, codec=None):
         """
         Encrypt all files in a directory
         
@@ -240,38 +1201,37 @@ class FileEncryptor:
             directory_path: Path to the directory
             password: Optional password to use (default: master password)
             recursive: If True, process subdirectories recursively
+            workers: Number of files encrypted concurrently (None uses every CPU core)
+            progress_callback: Optional callable(done, total, file_path, error) invoked per file
+            codec: Compression passed to encrypt_file (default: self.codec)
         """
         if not os.path.isdir(directory_path):
             raise NotADirectoryError(f"Not a directory: {directory_path}")
             
-        encrypted_files = []
-        failed_files = []
+        # Skip already encrypted files
+        file_paths = self._collect_files(directory_path, recursive,
+                                         lambda file_path: not self.is_file_encrypted(file_path))
         
-        for root, dirs, files in os.walk(directory_path):
-            for file in files:
-                # Skip already encrypted files
-                if file.endswith('.enc'):
-                    continue
-                    
-                file_path = os.path.join(root, file)
-                try:
-                    encrypted_path = self.encrypt_file(file_path, password=password)
-                    # Remove the original file after encryption
-                    os.remove(file_path)
-                    encrypted_files.append(encrypted_path)
-                except Exception as e:
-                    failed_files.append((file_path, str(e)))
-                    
-            # If not recursive, break after processing the top directory
-            if not recursive:
-                break
+        # Derive the key once so the workers all hit the session cache
+        if file_paths:
+            self.derive_key(password)
+            
+        def encrypt(file_path):
+            encrypted_path = self.encrypt_file(file_path, password=password, codec=codec)
+            # Remove the original file after encryption
+            os.remove(file_path)
+            return encrypted_path
+            
+        encrypted_files, failed_files = self._process_files(
+            file_paths, encrypt, workers, progress_callback)
                 
         return {
             'encrypted': encrypted_files,
             'failed': failed_files
         }
         
-    def decrypt_directory(self, directory_path, password=None, recursive=True):
+    def decrypt_directory(self, directory_path, password=None, recursive=True,
+                          workers=1, progress_callback=None):
         """
         Decrypt all encrypted files in a directory
         
@@ -279,39 +1239,28 @@ class FileEncryptor:
             directory_path: Path to the directory
             password: Optional password to use (default: master password)
             recursive: If True, process subdirectories recursively
+            workers: Number of files decrypted concurrently (None uses every CPU core)
+            progress_callback: Optional callable(done, total, file_path, error) invoked per file
         """
         if not os.path.isdir(directory_path):
             raise NotADirectoryError(f"Not a directory: {directory_path}")
             
-        decrypted_files = []
-        failed_files = []
+        # Only process encrypted files
+        file_paths = self._collect_files(directory_path, recursive, self.is_file_encrypted)
         
-        for root, dirs, files in os.walk(directory_path):
-            for file in files:
-                # Only process encrypted files
-                if not file.endswith('.enc'):
-                    continue
-                    
-                file_path = os.path.join(root, file)
-                try:
-                    decrypted_path = self.decrypt_file(file_path, password=password)
-                    # Remove the encrypted file after decryption
-                    os.remove(file_path)
-                    decrypted_files.append(decrypted_path)
-                except Exception as e:
-                    failed_files.append((file_path, str(e)))
-                    
-            # If not recursive, break after processing the top directory
-            if not recursive:
-                break
+        if file_paths:
+            self.derive_key(password)
+            
+        def decrypt(file_path):
+            decrypted_path = self.decrypt_file(file_path, password=password)
+            # Remove the encrypted file after decryption
+            os.remove(file_path)
+            return decrypted_path
+            
+        decrypted_files, failed_files = self._process_files(
+            file_paths, decrypt, workers, progress_callback)
                 
         return {
             'decrypted': decrypted_files,
             'failed': failed_files
         }
-
-
-    def is_file_encrypted(self, file_path):
-        """Check if a file is already encrypted"""
-        return file_path.endswith(".enc")
-
@@ -0,0 +1,125 @@
+import csv
+import gzip
+import json
+import os
+from database import db_queue
+
+# Rows fetched from SQLite per round trip; memory use is bounded by one batch
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = {
+    'user_activity': ('id', 'timestamp', 'username', 'action_type', 'item_type', 'item_path', 'details'),
+    'logs': ('id', 'timestamp', 'username', 'action', 'old_path', 'new_path'),
+}
+
+
+def export_format(path):
+    """Return ('csv' or 'jsonl', compressed) for an export path such as audit.csv.gz"""
+    name = path.lower()
+    compressed = name.endswith('.gz')
+    if compressed:
+        name = name[:-3]
+    for fmt in ('csv', 'jsonl'):
+        if name.endswith('.' + fmt):
+            return fmt, compressed
+    raise ValueError(f"Unsupported export format: {path} (use .csv, .jsonl, optionally .gz)")
+
+
+def export_query(table='user_activity', username=None, since=None, until=None):
+    """
+    Return the (query, params) that reads a log table for export, oldest row first
+
+    Args:
+        table: 'user_activity' or 'logs'
+        username: Only rows for this user (default: all users)
+        since: Only rows with timestamp >= since ('YYYY-MM-DD[ HH:MM:SS]')
+        until: Only rows with timestamp < until
+    """
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown log table: {table}")
+    conditions = []
+    params = []
+    if username:
+        conditions.append('username = ?')
+        params.append(username)
+    if since:
+        conditions.append('timestamp >= ?')
+        params.append(since)
+    if until:
+        conditions.append('timestamp < ?')
+        params.append(until)
+
+    query = f"SELECT {', '.join(EXPORT_COLUMNS[table])} FROM {table}"
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY timestamp, id'
+    return query, tuple(params)
+
+
+def _open_output(path, compressed):
+    if compressed:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def _write_rows(conn, out, fmt, table, query, params, batch_size, progress_callback):
+    columns = EXPORT_COLUMNS[table]
+    writer = csv.writer(out) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+
+    cursor = conn.execute(query, params)
+    written = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        if writer:
+            writer.writerows(rows)
+        else:
+            out.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+        written += len(rows)
+        if progress_callback:
+            progress_callback(written)
+    return written
+
+
+def export_logs(path, table='user_activity', username=None, since=None, until=None,
+                batch_size=EXPORT_BATCH_SIZE, progress_callback=None, queue=None):
+    """
+    Stream a log table to a CSV or JSONL file on the database reader pool
+
+    Rows are pulled from one cursor in fetchmany batches and written as they
+    arrive, so memory stays flat however many rows match. The file is written
+    next to `path` and renamed into place once complete. The format follows
+    the extension: .csv or .jsonl, gzip-compressed when it ends in .gz.
+
+    Args:
+        path: Output file
+        table: 'user_activity' or 'logs'
+        username: Only rows for this user (default: all users)
+        since: Only rows with timestamp >= since
+        until: Only rows with timestamp < until
+        batch_size: Rows fetched per batch
+        progress_callback: Called on the reader thread with the number of rows written so far
+        queue: DatabaseQueue to read from (default: the shared queue)
+
+    Returns:
+        A DatabaseFuture for the number of rows exported
+    """
+    fmt, compressed = export_format(path)
+    query, params = export_query(table, username, since, until)
+    part_path = path + '.part'
+
+    def task(conn):
+        try:
+            with _open_output(part_path, compressed) as out:
+                written = _write_rows(conn, out, fmt, table, query, params, batch_size, progress_callback)
+            os.replace(part_path, path)
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return written
+
+    return (queue if queue is not None else db_queue).read(task)
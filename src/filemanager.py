@@ -7,7 +7,7 @@ import sqlite3
 import subprocess
 import json
 
-from database import log_action,log_file_operation
+from database import log_action, users, file_access
 
 from tkinter import messagebox
 from datetime import datetime, timedelta
@@ -49,54 +49,12 @@ class FileManager:
         self.archive_dir = archive_dir
         self.automation_folder = self.get_automation_folder(username)
 
-        self.db_connection = sqlite3.connect('filemanager.db', timeout=30.0)
-
-
-
     def get_automation_folder(self, username):
         try:
-            conn = sqlite3.connect('docuvault.db')
-            cursor = conn.cursor()
-            cursor.execute('SELECT automation_folder FROM users WHERE username = ?', (username,))
-            result = cursor.fetchone()
-            conn.close()
-            if result and result[0]:
-                return result[0]
-            else:
-                return None
+            return users.get_automation_folder(username)
         except sqlite3.OperationalError:
             return None
 
-    def get_frequently_accessed_files(self, threshold=1):
-        current_time = time.time()
-        frequent_files = []
-        try:
-            with open('file_access_log.json', 'r') as f:
-                log = json.load(f)
-                for file, access_time in log.items():
-                    if current_time - access_time <= threshold * 3600 * 24 and os.path.exists(file):
-                        frequent_files.append(file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
-        return frequent_files
-    
-
-    def update_file_access(self, file_path):
-        current_time = time.time()
-        try:
-            with open('file_access_log.json', 'r+') as f:
-                try:
-                    log = json.load(f)
-                except json.JSONDecodeError:
-                    log = {}
-                log[file_path] = current_time
-                f.seek(0)
-                f.truncate()
-                json.dump(log, f)
-        except FileNotFoundError:
-            with open('file_access_log.json', 'w') as f:
-                json.dump({file_path: current_time}, f)
-
     def apply_filters(self, item_path, extensions, date_limit, size_filter):
         if extensions and os.path.isfile(item_path):
             if os.path.splitext(item_path)[1].lower() not in extensions:
@@ -243,50 +201,94 @@ class FileManager:
     # Functions for tracking file access and backups
     def update_file_access(self, file_path):
         """Track file access time for determining frequently accessed files"""
-        current_time = time.time()
-        log_path = os.path.join(os.path.expanduser('~'), 'file_access_log.json')
-        
         try:
-            try:
-                with open(log_path, 'r') as f:
-                    try:
-                        log = json.load(f)
-                    except json.JSONDecodeError:
-                        log = {}
-            except FileNotFoundError:
-                log = {}
-            
-            log[file_path] = current_time
-            
-            with open(log_path, 'w') as f:
-                json.dump(log, f)
-                
+            # Appends one event; committed with the next batch of queued writes
+            file_access.record(self.username, file_path)
             return True
         except Exception as e:
             print(f"Error updating file access log: {e}")
             return False
 
-    def get_frequently_accessed_files(self, threshold=1):
-        """Get list of files accessed within the threshold period (days)"""
-        current_time = time.time()
-        log_path = os.path.join(os.path.expanduser('~'), 'file_access_log.json')
-        
+    def get_frequently_accessed_files(self, threshold=1, limit=20):
+        """Get the hottest files accessed within the threshold period (days), highest frecency first"""
         try:
-            with open(log_path, 'r') as f:
-                try:
-                    log = json.load(f)
-                    # Return files accessed within threshold days
-                    return [file for file, access_time in log.items()
-                           if current_time - access_time <= threshold * 24 * 3600
-                           and os.path.exists(file)]
-                except json.JSONDecodeError:
-                    return []
-        except FileNotFoundError:
-            return []
-        except Exception as e:
+            since = time.time() - threshold * 24 * 3600
+            return [file for file, score in file_access.top(self.username, limit, since)
+                    if os.path.exists(file)]
+        except sqlite3.Error as e:
             print(f"Error getting frequently accessed files: {e}")
             return []
 
+    def get_quick_access_files(self, limit=10):
+        """
+        Get the Recent and Frequent quick access lists
+        
+        Returns:
+            Tuple of (recent paths, frequent paths), skipping files that no longer exist
+        """
+        try:
+            recent = [file for file, _ in file_access.recent(self.username, limit) if os.path.exists(file)]
+            frequent = [file for file, _ in file_access.top(self.username, limit) if os.path.exists(file)]
+            return recent, frequent
+        except sqlite3.Error as e:
+            print(f"Error getting quick access files: {e}")
+            return [], []
+
+    def rank_by_frecency(self, paths):
+        """Order paths by frecency, most used first; unopened paths keep their order at the end"""
+        paths = list(paths)
+        try:
+            scores = file_access.scores(self.username, paths)
+        except sqlite3.Error as e:
+            print(f"Error ranking files: {e}")
+            return paths
+        return sorted(paths, key=lambda path: -scores.get(path, 0.0))
+
+    def import_legacy_access_log(self, log_paths=None):
+        """
+        Move access times from the old file_access_log.json copies into the access store
+        
+        Older versions wrote the log both to the home directory and to the
+        working directory. Both copies are merged, keeping the latest access
+        time for each path, and renamed to *.imported so they are read only once.
+        
+        Args:
+            log_paths: JSON files to import (default: both legacy locations)
+            
+        Returns:
+            Number of entries imported
+        """
+        if log_paths is None:
+            log_paths = [os.path.join(os.path.expanduser('~'), 'file_access_log.json'),
+                         os.path.abspath('file_access_log.json')]
+        
+        latest = {}
+        read_paths = []
+        for log_path in dict.fromkeys(os.path.abspath(path) for path in log_paths):
+            try:
+                with open(log_path, 'r') as f:
+                    log = json.load(f)
+                accesses = {path: float(access_time) for path, access_time in log.items()}
+            except FileNotFoundError:
+                continue
+            except (OSError, json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+                print(f"Error reading legacy file access log {log_path}: {e}")
+                continue
+            read_paths.append(log_path)
+            for path, access_time in accesses.items():
+                latest[path] = max(access_time, latest.get(path, access_time))
+        
+        if not read_paths:
+            return 0
+        try:
+            count = file_access.record_many_async(self.username, list(latest.items())).result()
+            for log_path in read_paths:
+                os.replace(log_path, log_path + '.imported')
+            return count
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error importing legacy file access log: {e}")
+            return 0
+
     def backup_frequent_files(self, cloud_manager, threshold=1):
         """Backup frequently accessed files to cloud storage"""
         if not cloud_manager or not cloud_manager.nc:
@@ -582,11 +584,7 @@ class FileManager:
                 # Update automation folder reference if it was deleted
                 if item_path == self.automation_folder:
                     self.automation_folder = None
-                    conn = sqlite3.connect('docuvault.db')
-                    cursor = conn.cursor()
-                    cursor.execute('UPDATE users SET automation_folder = NULL WHERE username = ?', (self.username,))
-                    conn.commit()
-                    conn.close()
+                    users.set_automation_folder_async(self.username, None)
                     
             except Exception as e:
                 failed_items.append(f"{os.path.basename(item_path)}: {str(e)}")
@@ -9,12 +9,14 @@ import subprocess
 from filemanager import FileManager, allow_access, restrict_access
 from automation import AutomationWindow
 from utility import CustomDirectoryDialog, compare_path
-from database import log_action, get_user_logs, delete_user_logs
+from database import log_action, get_user_logs_page_async, delete_user_logs, apply_log_retention, file_access
 from cloud import CloudManager
+from export import export_logs
 import schedule
 import matplotlib.pyplot as plt
 import plotly.express as px
 from dashboard import Dashboard
+from encryption import session_keys
 import requests
 import webbrowser
 
@@ -48,25 +50,58 @@ class Tooltip:
             self.tooltip = None
 
 class LogViewer(tk.Toplevel):
+    PAGE_SIZE = 200
+    # Rows kept in the tree at once; pages scrolled far out of view are dropped
+    MAX_ROWS = 1000
+    ACTION_TYPES = ('', 'CREATE', 'COPY', 'MOVE', 'RENAME', 'DELETE', 'RESTORE', 'ARCHIVE',
+                    'BACKUP', 'AUTO_UPLOAD', 'CLOUD', 'CLOUD UPLOAD', 'CLOUD DOWNLOAD',
+                    'CLOUD DELETE', 'CLOUD SHARE', 'ERROR')
+    
     def __init__(self, parent, username):
         super().__init__(parent)
         self.title("Activity Logs")
         self.username = username  # Store username as instance variable
+        self.filters = {}
+        self.generation = 0
+        self.loading = False
+        self.at_start = True   # No newer rows above the first row in the tree
+        self.at_end = False    # No older rows below the last row in the tree
         
         # Create main container
         main_frame = ttk.Frame(self)
         main_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
+        # Filter bar; filtering happens in the database query
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.pack(fill='x', pady=(0, 10))
+        
+        self.action_var = tk.StringVar()
+        self.path_var = tk.StringVar()
+        self.since_var = tk.StringVar()
+        self.until_var = tk.StringVar()
+        
+        ttk.Label(filter_frame, text="Action:").pack(side='left')
+        ttk.Combobox(filter_frame, textvariable=self.action_var, values=self.ACTION_TYPES,
+                     width=15).pack(side='left', padx=(2, 10))
+        ttk.Label(filter_frame, text="Path:").pack(side='left')
+        ttk.Entry(filter_frame, textvariable=self.path_var, width=20).pack(side='left', padx=(2, 10))
+        ttk.Label(filter_frame, text="From (YYYY-MM-DD):").pack(side='left')
+        ttk.Entry(filter_frame, textvariable=self.since_var, width=11).pack(side='left', padx=(2, 10))
+        ttk.Label(filter_frame, text="To:").pack(side='left')
+        ttk.Entry(filter_frame, textvariable=self.until_var, width=11).pack(side='left', padx=(2, 10))
+        ttk.Button(filter_frame, text="Apply", command=self.load_logs).pack(side='left')
+        self.bind('<Return>', lambda event: self.load_logs())
+        
         # Create treeview with scrollbar
         tree_frame = ttk.Frame(main_frame)
         tree_frame.pack(fill='both', expand=True)
         
         self.tree = ttk.Treeview(tree_frame, columns=('Time', 'Action', 'Type', 'Path', 'Details'))
         
-        # Add scrollbar
-        vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-        vsb.pack(side='right', fill='y')
-        self.tree.configure(yscrollcommand=vsb.set)
+        # Add scrollbar; scrolling near either edge fetches the next page
+        self.vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.vsb.pack(side='right', fill='y')
+        self.tree.configure(yscrollcommand=self.on_scroll)
         
         # Configure tree columns
         self.tree.heading('#0', text='ID')
@@ -100,21 +135,148 @@ class LogViewer(tk.Toplevel):
         )
         refresh_button.pack(side='right', padx=5)
         
+        # Export button; exports honour the date filters
+        export_button = ttk.Button(
+            button_frame,
+            text="Export...",
+            command=self.export_logs
+        )
+        export_button.pack(side='left', padx=5)
+        
         # Set window size
-        self.geometry("800x500")
+        self.geometry("900x500")
     
     def load_logs(self):
-        """Load or reload logs into the treeview"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        """Reload the logs from the newest row using the current filters"""
+        filters = self.read_filters()
+        if filters is None:
+            return
         
-        # Get fresh logs
-        logs = get_user_logs(self.username)
+        # Drop pages still in flight for the previous view
+        self.generation += 1
+        self.filters = filters
+        self.at_start = True
+        self.at_end = False
+        self.tree.delete(*self.tree.get_children())
+        self.fetch_page()
+    
+    def read_filters(self):
+        """Return the query filters from the filter bar, or None if a date is invalid"""
+        filters = {
+            'action_type': self.action_var.get().strip() or None,
+            'path': self.path_var.get().strip() or None,
+        }
+        try:
+            since = self.since_var.get().strip()
+            until = self.until_var.get().strip()
+            if since:
+                filters['since'] = datetime.strptime(since, '%Y-%m-%d').strftime('%Y-%m-%d')
+            if until:
+                # The end date is inclusive
+                end = datetime.strptime(until, '%Y-%m-%d') + timedelta(days=1)
+                filters['until'] = end.strftime('%Y-%m-%d')
+        except ValueError:
+            messagebox.showerror("Invalid Date", "Dates must be in YYYY-MM-DD format.")
+            return None
+        return filters
+    
+    def fetch_page(self, before=None, after=None):
+        """Query the page older than `before` (or newer than `after`) without blocking the window"""
+        self.loading = True
+        generation = self.generation
+        future = get_user_logs_page_async(self.username, before, after, self.PAGE_SIZE, **self.filters)
+        future.after(self, lambda future: self.show_page(future, generation, newer=after is not None))
+    
+    def show_page(self, future, generation, newer):
+        """Add a fetched page to the tree, dropping rows at the far end to keep it small"""
+        if generation != self.generation:
+            return
+        self.loading = False
+        try:
+            rows = future.result()
+        except Exception as e:
+            # Stop paging until the next reload
+            self.at_start = self.at_end = True
+            messagebox.showerror("Error", f"Failed to load logs: {e}")
+            return
         
-        # Insert into tree
-        for i, log in enumerate(logs):
-            self.tree.insert('', 'end', text=str(i+1), values=log)
+        if len(rows) < self.PAGE_SIZE:
+            if newer:
+                self.at_start = True
+            else:
+                self.at_end = True
+        if not rows:
+            return
+        
+        children = self.tree.get_children()
+        total = len(children)
+        first_row = self.tree.yview()[0] * total
+        excess = max(0, total + len(rows) - self.MAX_ROWS)
+        
+        if newer:
+            for row in reversed(rows):
+                self.tree.insert('', 0, iid=str(row[0]), text=str(row[0]), values=row[1:])
+            if excess:
+                self.tree.delete(*children[total - excess:])
+                self.at_end = False
+            first_row += len(rows)
+        else:
+            for row in rows:
+                self.tree.insert('', 'end', iid=str(row[0]), text=str(row[0]), values=row[1:])
+            if excess:
+                self.tree.delete(*children[:excess])
+                self.at_start = False
+            first_row -= excess
+        
+        # Keep the rows the user was looking at in place
+        if total:
+            self.tree.yview_moveto(max(0.0, first_row / (total + len(rows) - excess)))
+    
+    def on_scroll(self, first, last):
+        """Update the scrollbar and fetch another page when the view nears either edge"""
+        self.vsb.set(first, last)
+        children = self.tree.get_children()
+        if self.loading or not children:
+            return
+        if float(last) >= 0.9 and not self.at_end:
+            self.fetch_page(before=self.row_key(children[-1]))
+        elif float(first) <= 0.1 and not self.at_start:
+            self.fetch_page(after=self.row_key(children[0]))
+    
+    def row_key(self, item):
+        """The (timestamp, id) keyset cursor of a tree row"""
+        return self.tree.set(item, 'Time'), int(item)
+    
+    def export_logs(self):
+        """Stream this user's activity within the date filters to a CSV or JSONL file"""
+        filters = self.read_filters()
+        if filters is None:
+            return
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            title="Export Activity Log",
+            defaultextension=".csv.gz",
+            filetypes=[("Compressed CSV", "*.csv.gz"), ("Compressed JSON Lines", "*.jsonl.gz"),
+                       ("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+        if not path:
+            return
+        try:
+            future = export_logs(path, username=self.username,
+                                 since=filters.get('since'), until=filters.get('until'))
+        except ValueError as e:
+            messagebox.showerror("Export Failed", str(e), parent=self)
+            return
+        future.after(self, lambda future: self.export_finished(future, path))
+    
+    def export_finished(self, future, path):
+        """Report the outcome of an export"""
+        try:
+            count = future.result()
+        except Exception as e:
+            messagebox.showerror("Export Failed", f"Could not export logs: {e}", parent=self)
+            return
+        messagebox.showinfo("Export Complete", f"Exported {count} log entries to {path}", parent=self)
     
     def confirm_delete_logs(self):
         """Ask for confirmation before deleting logs"""
@@ -204,6 +366,11 @@ class FileManagerGUI:
         self.update_file_list()
             
         schedule.every().day.at("03:00").do(self.backup_frequent_files)
+        # Fold old activity rows into daily counts now and every night
+        schedule.every().day.at("04:00").do(self.apply_log_retention)
+        threading.Thread(target=self.apply_log_retention, name='log-retention', daemon=True).start()
+        threading.Thread(target=self.file_manager.import_legacy_access_log, name='access-log-import',
+                         daemon=True).start()
 
         self.scheduler_thread = threading.Thread(target=self.run_scheduler)
         self.scheduler_thread.daemon = True
@@ -243,6 +410,14 @@ class FileManagerGUI:
                 file_types[ext] = file_types.get(ext, 0) + 1
         return file_types
 
+    def apply_log_retention(self):
+        """Roll activity older than the retention window into daily counts (blocks; runs off the Tk thread)"""
+        try:
+            apply_log_retention()
+            file_access.compact()
+        except sqlite3.Error as e:
+            print(f"Error applying log retention: {e}")
+
     def run_scheduler(self):
         while True:
             schedule.run_pending()
@@ -517,6 +692,8 @@ class FileManagerGUI:
         
         # Start the search
         self.recursive_search_with_filters(search_dir, search_term, extensions, date_limit, size_filter)
+        if self.local_results_found:
+            self.rank_search_results()
         
         # Update results count
         result_count = len(self.search_tree.get_children())
@@ -593,6 +770,12 @@ class FileManagerGUI:
                 continue
             except Exception:
                 continue
+    def rank_search_results(self):
+        """Move the files the user opens most to the top of the search results"""
+        items = {self.search_tree.item(item, "values")[1]: item for item in self.search_tree.get_children()}
+        for index, path in enumerate(self.file_manager.rank_by_frecency(items)):
+            self.search_tree.move(items[path], "", index)
+
     def add_search_result(self, name, path):
         """Add an item to the search results tree"""
         try:
@@ -826,6 +1009,30 @@ class FileManagerGUI:
         # Configure button to show menu when clicked
         sort_btn.config(command=show_sort_menu)
 
+        quick_btn = ttk.Button(left_section, text="Quick Access 🔽")
+        quick_btn.pack(side=tk.LEFT, padx=2)
+
+        # Recent and Frequent files, rebuilt each time the menu opens
+        quick_menu = tk.Menu(self.root, tearoff=0)
+
+        def show_quick_menu(event=None):
+            recent, frequent = self.file_manager.get_quick_access_files()
+            quick_menu.delete(0, tk.END)
+            for title, paths in (("Recent", recent), ("Frequent", frequent)):
+                quick_menu.add_command(label=title, state=tk.DISABLED)
+                for path in paths:
+                    quick_menu.add_command(label=os.path.basename(path) or path,
+                                           command=lambda p=path: self.open_file(p))
+                if not paths:
+                    quick_menu.add_command(label="(none)", state=tk.DISABLED)
+                if title == "Recent":
+                    quick_menu.add_separator()
+            x = quick_btn.winfo_rootx()
+            y = quick_btn.winfo_rooty() + quick_btn.winfo_height()
+            quick_menu.post(x, y)
+
+        quick_btn.config(command=show_quick_menu)
+
         # Center section: File operations
         self.center_section = ttk.Frame(toolbar_frame)
         self.center_section.pack(side=tk.LEFT, padx=20)
@@ -1668,6 +1875,8 @@ class FileManagerGUI:
                 "Are you sure you want to sign out?")
             
             if confirm:
+                # Wipe cached encryption keys before leaving the session
+                session_keys.clear()
                 self.root.destroy()
                 from login import LoginPage
                 login_page = LoginPage()
@@ -1676,6 +1885,8 @@ class FileManagerGUI:
             if hasattr(self, 'activity_timer_id') and self.activity_timer_id:
                 self.root.after_cancel(self.activity_timer_id)
             
+            session_keys.clear()
+            
             # Close the current window
             self.root.destroy()
             
@@ -5,6 +5,7 @@ from tkinter import ttk
 from PIL import Image, ImageTk
 from database import create_database, register_user, login_user
 from automation import AutomationWindow
+from encryption import FileEncryptor
 
 from gui import FileManagerGUI
 from utility import CustomDirectoryDialog
@@ -119,6 +120,9 @@ class LoginPage(tk.Tk):
         if login_result is None:
             messagebox.showinfo("Login Failed", "No user found with this username. Please register first.")
         elif login_result:
+            # The automation window encrypts with the username unless told otherwise;
+            # derive that key while the main window loads
+            FileEncryptor(username).warm_up_key()
             self.destroy()
             app = FileManagerGUI(username)
             app.run()
@@ -0,0 +1,389 @@
+import os
+import io
+import json
+import stat
+import struct
+import tempfile
+import zlib
+from collections import namedtuple
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+from encryption import (Header, HEADER, HEADER_V2, FILE_ID_SIZE, DEFAULT_CHUNK_SIZE, NONCE_SIZE, TAG_SIZE,
+                        CHUNK_OVERHEAD)
+
+# Encrypted pack format (v2):
+#   header:  magic | version | flags | reserved | chunk size | salt | pack id (same layout as v3 files)
+#   members: chunk records (nonce | ciphertext | tag) for each member, back to back
+#   index:   one sealed record holding the zlib-compressed JSON member list
+#   trailer: index offset | index length | trailer magic
+# Every record authenticates the header, which holds a random pack id, so
+# records cannot move between packs. Member chunks also authenticate the
+# member id, the chunk index and the final marker, so chunks cannot move
+# between members or positions. The index authenticates its own offset and
+# length. v1 packs have no pack id and can still be read and appended to.
+# New packs are written to a temporary file and renamed into place on close.
+# Appending writes new members and a
+# new index after the old trailer. If an append is interrupted before its
+# trailer is written (even by a crash), opening the pack falls back to the last
+# complete trailer, and the next append truncates the unfinished data.
+PACK_MAGIC = b'DVPK'
+PACK_VERSION = 2
+# Header layout for each readable pack version
+PACK_HEADER_FORMATS = {1: HEADER_V2, PACK_VERSION: HEADER}
+TRAILER_MAGIC = b'DVPI'
+TRAILER = struct.Struct('>QQ4s')
+# Bytes read per step when scanning backwards for an earlier trailer
+SCAN_BLOCK_SIZE = 1024 * 1024
+MEMBER_AAD = struct.Struct('>QQB')
+INDEX_AAD = struct.Struct('>5sQQ')
+
+Member = namedtuple('Member', ['name', 'id', 'offset', 'size', 'mode', 'mtime'])
+
+
+def member_name(path):
+    """Normalise a relative path into a member name, rejecting anything that escapes the pack"""
+    parts = [part for part in path.replace('\\', '/').split('/') if part not in ('', '.')]
+    if not parts or '..' in parts or os.path.isabs(path) or os.path.splitdrive(path)[0]:
+        raise ValueError(f"Invalid member name: {path}")
+    return '/'.join(parts)
+
+
+class VaultPack:
+    """
+    Many files sealed into one encrypted container.
+
+    Each member is streamed through the same chunked AES-GCM scheme as single
+    encrypted files, and an encrypted index maps names to offsets and sizes.
+    Reading a member only decrypts that member's chunks. Use as a context
+    manager; the index is written when the pack is closed.
+
+    Modes: 'r' to read, 'w' to create (or overwrite), 'a' to add members to an
+    existing pack (created if missing). Adding a name that already exists
+    replaces that member.
+    """
+
+    def __init__(self, path, encryptor, password=None, mode='r', chunk_size=DEFAULT_CHUNK_SIZE):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError(f"Invalid mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self._members = {}
+        self._next_id = 0
+        self._restore_size = None
+        self._part_path = None
+        self._dirty = False
+
+        if mode == 'w' or (mode == 'a' and not os.path.exists(path)):
+            salt = encryptor.get_salt()
+            pack_id = get_random_bytes(FILE_ID_SIZE)
+            raw = HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, 0, chunk_size, salt, pack_id)
+            self.header = Header(PACK_VERSION, 0, chunk_size, salt, raw, pack_id)
+            self._key = encryptor.derive_key(password, salt)
+            # Any existing pack stays untouched until the new one is complete
+            fd, self._part_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                                   prefix='.' + os.path.basename(path), suffix='.part')
+            self._file = os.fdopen(fd, 'w+b')
+            self._file.write(raw)
+            self._dirty = True
+        else:
+            self._file = open(path, 'rb' if mode == 'r' else 'r+b')
+            try:
+                self.header = self._read_header()
+                self._key = encryptor.derive_key(password, self.header.salt)
+                committed = self._read_index()
+            except Exception:
+                self._file.close()
+                raise
+            if mode == 'a':
+                # Drop whatever an interrupted append left after the last trailer
+                self._file.truncate(committed)
+                self._restore_size = committed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def __len__(self):
+        return len(self._members)
+
+    @property
+    def chunk_size(self):
+        return self.header.chunk_size
+
+    def names(self):
+        """Member names in the order they were added"""
+        return list(self._members)
+
+    def members(self):
+        """Member records (name, id, offset, size, mode, mtime)"""
+        return list(self._members.values())
+
+    def get_member(self, name):
+        try:
+            return self._members[name]
+        except KeyError:
+            raise KeyError(f"No such member: {name}")
+
+    def add_file(self, file_path, name=None):
+        """
+        Encrypt a file into the pack
+
+        Args:
+            file_path: File to add
+            name: Member name (default: the file's base name)
+
+        Returns:
+            The new Member
+        """
+        name = member_name(name if name is not None else os.path.basename(file_path))
+        st = os.stat(file_path)
+        with open(file_path, 'rb') as src:
+            return self._write_member(name, src, stat.S_IMODE(st.st_mode), st.st_mtime)
+
+    def add_bytes(self, name, data, mode=0o600, mtime=None):
+        """Encrypt an in-memory blob into the pack as member `name`"""
+        return self._write_member(member_name(name), io.BytesIO(data), mode,
+                                  mtime if mtime is not None else 0.0)
+
+    def iter_member(self, name):
+        """Yield the plaintext of one member chunk by chunk, verifying each chunk"""
+        member = self.get_member(name)
+        chunk_size = self.header.chunk_size
+        record_size = chunk_size + CHUNK_OVERHEAD
+        count = max(1, -(-member.size // chunk_size))
+        for index in range(count):
+            length = min(chunk_size, member.size - index * chunk_size) + CHUNK_OVERHEAD
+            self._file.seek(member.offset + index * record_size)
+            record = self._file.read(length)
+            yield self._open_record(MEMBER_AAD.pack(member.id, index, index == count - 1), record)
+
+    def read(self, name):
+        """Return the full plaintext of one member"""
+        return b''.join(self.iter_member(name))
+
+    def extract(self, name, directory):
+        """
+        Decrypt one member into directory, recreating its relative path
+
+        Returns:
+            Path of the extracted file
+        """
+        member = self.get_member(name)
+        output_path = os.path.join(directory, *member.name.split('/'))
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        part_path = output_path + '.part'
+        try:
+            with open(part_path, 'wb') as out:
+                for plaintext in self.iter_member(name):
+                    out.write(plaintext)
+            os.chmod(part_path, member.mode)
+            os.utime(part_path, (member.mtime, member.mtime))
+            os.replace(part_path, output_path)
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return output_path
+
+    def extract_all(self, directory, progress_callback=None):
+        """Extract every member into directory; returns the extracted paths"""
+        extracted = []
+        total = len(self._members)
+        for done, name in enumerate(self.names(), 1):
+            extracted.append(self.extract(name, directory))
+            if progress_callback:
+                progress_callback(done, total, name, None)
+        return extracted
+
+    def close(self):
+        """Write the index (if anything changed) and close the pack"""
+        if self._file.closed:
+            return
+        try:
+            if self.mode != 'r' and self._dirty:
+                self._write_index()
+        except Exception:
+            self.abort()
+            raise
+        self._file.close()
+        if self._part_path is not None:
+            os.replace(self._part_path, self.path)
+            self._part_path = None
+
+    def abort(self):
+        """Close without committing: new packs are discarded, appended members are dropped"""
+        if self._file.closed:
+            return
+        try:
+            if self._restore_size is not None:
+                self._file.truncate(self._restore_size)
+        finally:
+            self._file.close()
+        if self._part_path is not None:
+            os.remove(self._part_path)
+            self._part_path = None
+
+    def _seal_record(self, aad, plaintext):
+        nonce = get_random_bytes(NONCE_SIZE)
+        cipher = AES.new(self._key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(self.header.raw + aad)
+        ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+        return nonce + ciphertext + tag
+
+    def _open_record(self, aad, record):
+        if len(record) < CHUNK_OVERHEAD:
+            raise ValueError("Pack is truncated")
+        cipher = AES.new(self._key, AES.MODE_GCM, nonce=record[:NONCE_SIZE])
+        cipher.update(self.header.raw + aad)
+        return cipher.decrypt_and_verify(record[NONCE_SIZE:-TAG_SIZE], record[-TAG_SIZE:])
+
+    def _write_member(self, name, src, mode, mtime):
+        if self.mode == 'r':
+            raise ValueError("Pack is open for reading")
+        member_id = self._next_id
+        self._next_id += 1
+        chunk_size = self.header.chunk_size
+        offset = self._file.seek(0, os.SEEK_END)
+
+        # Read one chunk ahead so the last chunk can be marked final
+        size = 0
+        index = 0
+        chunk = src.read(chunk_size)
+        while True:
+            next_chunk = src.read(chunk_size)
+            final = not next_chunk
+            self._file.write(self._seal_record(MEMBER_AAD.pack(member_id, index, final), chunk))
+            size += len(chunk)
+            if final:
+                break
+            chunk = next_chunk
+            index += 1
+
+        member = Member(name, member_id, offset, size, mode, mtime)
+        self._members.pop(name, None)
+        self._members[name] = member
+        self._dirty = True
+        return member
+
+    def _read_header(self):
+        raw = self._file.read(len(PACK_MAGIC) + 1)
+        if len(raw) < len(PACK_MAGIC) + 1 or raw[:len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError("Not an encrypted pack")
+        layout = PACK_HEADER_FORMATS.get(raw[len(PACK_MAGIC)])
+        if layout is None:
+            raise ValueError(f"Unsupported pack version: {raw[len(PACK_MAGIC)]}")
+        raw += self._file.read(layout.size - len(raw))
+        if len(raw) < layout.size:
+            raise ValueError("Pack is truncated")
+        _, version, flags, _, chunk_size, salt, *pack_id = layout.unpack(raw)
+        if chunk_size == 0:
+            raise ValueError("Corrupt pack header")
+        return Header(version, flags, chunk_size, salt, raw, pack_id[0] if pack_id else None)
+
+    def _read_trailer(self, end):
+        """Return (offset, length) of the index whose trailer ends at end, or None if there is none"""
+        self._file.seek(end - TRAILER.size)
+        offset, length, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+        if magic != TRAILER_MAGIC or offset < len(self.header.raw) or offset + length != end - TRAILER.size:
+            return None
+        return offset, length
+
+    def _find_trailer(self, end):
+        """Scan backwards from end for the last well-formed trailer; return (trailer end, offset, length)"""
+        minimum = len(self.header.raw) + TRAILER.size
+        position = end
+        tail = b''
+        while position > len(self.header.raw):
+            start = max(len(self.header.raw), position - SCAN_BLOCK_SIZE)
+            self._file.seek(start)
+            block = self._file.read(position - start) + tail
+            found = block.rfind(TRAILER_MAGIC)
+            while found >= 0:
+                trailer_end = start + found + len(TRAILER_MAGIC)
+                if trailer_end >= minimum:
+                    index = self._read_trailer(trailer_end)
+                    if index is not None:
+                        return (trailer_end,) + index
+                found = block.rfind(TRAILER_MAGIC, 0, found + len(TRAILER_MAGIC) - 1)
+            # Keep enough overlap to catch a magic split across blocks
+            tail = block[:len(TRAILER_MAGIC) - 1]
+            position = start
+        raise ValueError("Pack index is missing or damaged")
+
+    def _read_index(self):
+        """Load the last committed index and return the size of the pack it commits"""
+        end = self._file.seek(0, os.SEEK_END)
+        if end < len(self.header.raw) + TRAILER.size:
+            raise ValueError("Pack is truncated")
+        end, offset, length = self._find_trailer(end)
+
+        self._file.seek(offset)
+        payload = self._open_record(INDEX_AAD.pack(b'index', offset, length), self._file.read(length))
+        index = json.loads(zlib.decompress(payload).decode('utf-8'))
+        self._next_id = index['next_id']
+        self._members = {entry[0]: Member(*entry) for entry in index['members']}
+        return end
+
+    def _write_index(self):
+        offset = self._file.seek(0, os.SEEK_END)
+        index = {'next_id': self._next_id, 'members': [list(m) for m in self._members.values()]}
+        payload = zlib.compress(json.dumps(index, separators=(',', ':')).encode('utf-8'))
+        length = len(payload) + CHUNK_OVERHEAD
+        self._file.write(self._seal_record(INDEX_AAD.pack(b'index', offset, length), payload))
+        self._file.write(TRAILER.pack(offset, length, TRAILER_MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._dirty = False
+
+
+def pack_directory(encryptor, directory_path, pack_path=None, password=None, recursive=True,
+                   progress_callback=None):
+    """
+    Bundle the files under a directory into one encrypted pack
+
+    Args:
+        encryptor: FileEncryptor supplying the salt and key
+        directory_path: Directory to pack
+        pack_path: Output pack (default: directory path with .dvpack); an existing pack is appended to
+        password: Optional password to use (default: master password)
+        recursive: Whether to include subdirectories
+        progress_callback: Called as progress_callback(done, total, file_path, error)
+
+    Returns:
+        Dictionary with the packed and failed files
+    """
+    if pack_path is None:
+        pack_path = os.path.normpath(directory_path) + '.dvpack'
+
+    file_paths = []
+    for root, dirs, files in os.walk(directory_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if os.path.abspath(file_path) != os.path.abspath(pack_path):
+                file_paths.append(file_path)
+        if not recursive:
+            break
+
+    packed = []
+    failed = []
+    with VaultPack(pack_path, encryptor, password, mode='a') as pack:
+        for done, file_path in enumerate(file_paths, 1):
+            error = None
+            try:
+                pack.add_file(file_path, os.path.relpath(file_path, directory_path))
+                packed.append(file_path)
+            except OSError as e:
+                error = e
+                failed.append((file_path, str(e)))
+            if progress_callback:
+                progress_callback(done, len(file_paths), file_path, error)
+
+    return {'pack': pack_path, 'packed': packed, 'failed': failed}
@@ -0,0 +1,341 @@
+import ctypes
+import ctypes.util
+import math
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+# inotify event bits (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+# Writes in place plus the create/rename/delete dance editors use when saving
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+_EVENT = struct.Struct('iIII')
+
+Watch = namedtuple('Watch', ['callback', 'inactivity', 'mtime'])
+
+
+def _load_inotify():
+    """Return libc with the inotify functions bound, or None where inotify is unavailable"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel keyed by arbitrary hashable keys.
+
+    Timers are bucketed by expiry tick modulo the number of slots, so scheduling,
+    rescheduling and cancelling are O(1) however many timers are pending, and
+    advancing only looks at the slots for ticks that have elapsed. Timers fire
+    at most one `resolution` late.
+    """
+
+    def __init__(self, resolution=0.5, slots=256, now=None):
+        self.resolution = resolution
+        self.slots = [{} for _ in range(slots)]
+        self._due = {}  # key -> expiry tick
+        self._current = self._tick(time.monotonic() if now is None else now)
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, key):
+        return key in self._due
+
+    def _tick(self, t):
+        return int(t // self.resolution)
+
+    def schedule(self, key, delay, now=None):
+        """(Re)start the timer for key so it expires `delay` seconds from now"""
+        now = time.monotonic() if now is None else now
+        self.cancel(key)
+        tick = max(math.ceil((now + delay) / self.resolution), self._current)
+        self.slots[tick % len(self.slots)][key] = tick
+        self._due[key] = tick
+
+    def cancel(self, key):
+        """Stop the timer for key; return True if one was pending"""
+        tick = self._due.pop(key, None)
+        if tick is None:
+            return False
+        del self.slots[tick % len(self.slots)][key]
+        return True
+
+    def advance(self, now=None):
+        """Expire every timer due at or before now and return their keys"""
+        now_tick = self._tick(time.monotonic() if now is None else now)
+        expired = []
+        if self._due:
+            # After a long gap one full rotation already visits every slot
+            last = min(now_tick, self._current + len(self.slots) - 1)
+            for tick in range(self._current, last + 1):
+                slot = self.slots[tick % len(self.slots)]
+                for key, due in list(slot.items()):
+                    if due <= now_tick:
+                        del slot[key]
+                        del self._due[key]
+                        expired.append(key)
+        self._current = max(self._current, now_tick + 1)
+        return expired
+
+    def next_deadline(self):
+        """Monotonic time at which the earliest pending timer expires, or None"""
+        if not self._due:
+            return None
+        for tick in range(self._current, self._current + len(self.slots)):
+            slot = self.slots[tick % len(self.slots)]
+            if any(due == tick for due in slot.values()):
+                return tick * self.resolution
+        # Everything pending is more than a rotation away; wake up after one
+        return (self._current + len(self.slots)) * self.resolution
+
+
+class FileWatcher:
+    """
+    One background thread that watches any number of files for inactivity.
+
+    Each watched file has an inactivity timer that is restarted whenever the
+    file is written, created or renamed. Once a file has been left alone for
+    `inactivity` seconds its callback is called (on the watcher thread) with
+    the path and the watch is dropped.
+
+    On Linux the thread blocks on a single inotify descriptor, with one watch
+    per parent directory, so it uses no CPU while nothing happens. Elsewhere it
+    falls back to checking modification times every `poll_interval` seconds.
+    """
+
+    def __init__(self, inactivity=10.0, poll_interval=2.0, resolution=0.5, use_inotify=True):
+        self.inactivity = inactivity
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._timers = TimerWheel(resolution)
+        self._watches = {}     # path -> Watch
+        self._dirs = {}        # directory -> inotify watch descriptor
+        self._dir_paths = {}   # watch descriptor -> directory
+        self._libc = _load_inotify() if use_inotify else None
+        self._inotify_fd = None
+        self._wake_r = self._wake_w = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._watches)
+
+    def is_watching(self, path):
+        with self._lock:
+            return os.path.abspath(path) in self._watches
+
+    @property
+    def uses_inotify(self):
+        return self._inotify_fd is not None
+
+    def watch(self, path, callback, inactivity=None):
+        """
+        Call callback(path) once path has not been modified for `inactivity` seconds
+
+        Args:
+            path: File to watch; watching it again replaces the previous callback
+            callback: Called on the watcher thread with the watched path
+            inactivity: Seconds without changes before the callback fires
+        """
+        path = os.path.abspath(path)
+        inactivity = self.inactivity if inactivity is None else inactivity
+        with self._lock:
+            self._start()
+            if self._inotify_fd is not None:
+                self._add_dir_watch(os.path.dirname(path))
+            self._watches[path] = Watch(callback, inactivity, _mtime(path))
+            self._timers.schedule(path, inactivity)
+        self._wake()
+
+    def unwatch(self, path):
+        """Stop watching path without calling its callback"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._drop(path)
+        self._wake()
+
+    def stop(self):
+        """Stop the watcher thread; pending callbacks are not called"""
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+        self._wake()
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            for fd in (self._inotify_fd, self._wake_r, self._wake_w):
+                if fd is not None:
+                    os.close(fd)
+            self._inotify_fd = self._wake_r = self._wake_w = None
+            self._watches.clear()
+            self._timers = TimerWheel(self._timers.resolution)
+            self._dirs.clear()
+            self._dir_paths.clear()
+            self._thread = None
+
+    def _start(self):
+        """Start the watcher thread on first use (called with the lock held)"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._inotify_fd = fd
+                self._wake_r, self._wake_w = os.pipe()
+                os.set_blocking(self._wake_r, False)
+        self._thread = threading.Thread(target=self._run, name='file-watcher', daemon=True)
+        self._thread.start()
+
+    def _add_dir_watch(self, directory):
+        if directory in self._dirs:
+            return
+        wd = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), directory)
+        self._dirs[directory] = wd
+        self._dir_paths[wd] = directory
+
+    def _drop(self, path):
+        """Forget a watch and release its directory watch if unused (called with the lock held)"""
+        if self._watches.pop(path, None) is None:
+            return
+        self._timers.cancel(path)
+        directory = os.path.dirname(path)
+        wd = self._dirs.get(directory)
+        if wd is not None and not any(os.path.dirname(p) == directory for p in self._watches):
+            self._libc.inotify_rm_watch(self._inotify_fd, wd)
+            del self._dirs[directory]
+            self._dir_paths.pop(wd, None)
+
+    def _wake(self):
+        """Make the watcher thread recompute its timeout"""
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'\0')
+            except OSError:
+                pass
+        self._wakeup.set()
+
+    def _wait(self, timeout):
+        """Block until a file event, a wake-up or the timeout; return True if inotify has events"""
+        if self._inotify_fd is None:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            return False
+        readable, _, _ = select.select([self._inotify_fd, self._wake_r], [], [], timeout)
+        if self._wake_r in readable:
+            try:
+                while os.read(self._wake_r, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+        return self._inotify_fd in readable
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                deadline = self._timers.next_deadline()
+                polling = self._inotify_fd is None and bool(self._watches)
+
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if polling:
+                timeout = self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+
+            if self._wait(timeout):
+                self._read_events()
+            elif polling:
+                self._poll_mtimes()
+
+            with self._lock:
+                expired = self._timers.advance()
+                fired = [(path, self._watches[path].callback) for path in expired]
+                for path in expired:
+                    self._drop(path)
+
+            for path, callback in fired:
+                try:
+                    callback(path)
+                except Exception as e:
+                    print(f"Error in file watcher callback for {path}: {str(e)}")
+
+    def _read_events(self):
+        """Restart the inactivity timer of every watched file named in pending inotify events"""
+        try:
+            data = os.read(self._inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        now = time.monotonic()
+        with self._lock:
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+                offset += _EVENT.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost; treat every file as active
+                    for path, watch in self._watches.items():
+                        self._timers.schedule(path, watch.inactivity, now)
+                    continue
+                directory = self._dir_paths.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # The directory itself went away
+                    del self._dir_paths[wd]
+                    self._dirs.pop(directory, None)
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                watch = self._watches.get(path)
+                if watch is not None:
+                    self._timers.schedule(path, watch.inactivity, now)
+
+    def _poll_mtimes(self):
+        """Fallback for platforms without inotify: compare modification times"""
+        now = time.monotonic()
+        with self._lock:
+            for path, watch in list(self._watches.items()):
+                mtime = _mtime(path)
+                if mtime != watch.mtime:
+                    self._watches[path] = watch._replace(mtime=mtime)
+                    self._timers.schedule(path, watch.inactivity, now)
+
+
+# Shared watcher for decrypted files opened from the application
+file_watcher = FileWatcher()
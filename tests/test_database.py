@@ -0,0 +1,611 @@
+import unittest
+import os
+import tempfile
+import shutil
+import time
+import threading
+import sqlite3
+from datetime import datetime, timezone
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from database import (DatabaseQueue, migrate, user_logs_query, user_logs_page_query, SCHEMA_VERSION,
+                      ActivityRepository, CloudCredentialRepository, CloudCredentials, UserRepository,
+                      MIGRATIONS, BIN_ACTION, activity_folder, FileAccessRepository,
+                      frecency_key, frecency_score, FRECENCY_HALF_LIFE_DAYS)
+
+
+def create_table(conn):
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.commit()
+
+
+def insert_event(conn, value):
+    conn.execute("INSERT INTO events (value) VALUES (?)", (value,))
+    return value
+
+
+def count_events(conn):
+    return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+
+class TestDatabaseQueue(unittest.TestCase):
+    """Test cases for the serialized database worker."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_queue = DatabaseQueue(os.path.join(self.test_dir, "test.db"))
+        self.db_queue.execute(create_table)
+        self.statements = []
+        self.db_queue.execute(lambda conn: conn.set_trace_callback(self.statements.append))
+        self.db_queue.flush()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_batched_writes_share_commits(self):
+        """Thousands of batched writes are committed in a handful of transactions."""
+        start = time.monotonic()
+        for i in range(10000):
+            self.db_queue.execute(insert_event, (i,), batch=True)
+        self.db_queue.flush()
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(self.db_queue.execute(count_events).result(timeout=5), 10000)
+
+        commits = [s for s in self.statements if s.strip().upper() == "COMMIT"]
+        self.assertLessEqual(len(commits), 10000 // self.db_queue.max_batch_size + 5)
+        self.assertLess(elapsed, 10)
+
+    def test_failing_task_does_not_roll_back_batch(self):
+        """A task that raises is rolled back alone; the rest of its batch commits."""
+        def failing(conn):
+            conn.execute("INSERT INTO events (value) VALUES (NULL)")
+
+        results = []
+        self.db_queue.execute(insert_event, (1,), lambda ok, r: results.append(ok), batch=True)
+        self.db_queue.execute(failing, (), lambda ok, r: results.append(ok), batch=True)
+        self.db_queue.execute(insert_event, (2,), lambda ok, r: results.append(ok), batch=True)
+        self.db_queue.flush()
+
+        self.assertEqual(results, [True, False, True])
+        self.assertEqual(self.db_queue.execute(count_events).result(timeout=5), 2)
+
+    def test_unbatched_task_ends_batch(self):
+        """A regular task runs after the batch before it has been committed."""
+        for i in range(3):
+            self.db_queue.execute(insert_event, (i,), batch=True)
+        self.assertEqual(self.db_queue.execute(count_events).result(timeout=5), 3)
+
+    def test_future_reports_result_and_errors(self):
+        """Futures carry task results and exceptions without busy-waiting."""
+        future = self.db_queue.execute(insert_event, (7,), batch=True)
+        self.assertEqual(future.result(timeout=5), 7)
+
+        def broken(conn):
+            conn.execute("SELECT * FROM missing_table")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db_queue.execute(broken).result(timeout=5)
+
+    def test_after_delivers_completion_on_widget_loop(self):
+        """after() polls through the widget instead of calling back from the worker."""
+        scheduled = []
+
+        class FakeWidget:
+            def winfo_exists(self):
+                return True
+
+            def after(self, interval, callback):
+                scheduled.append(callback)
+
+        done = []
+        future = self.db_queue.execute(count_events)
+        future.result(timeout=5)
+        future.after(FakeWidget(), done.append)
+        self.assertEqual(done, [future])
+
+        blocker = threading.Event()
+        slow = self.db_queue.execute(lambda conn: blocker.wait(5))
+        slow.after(FakeWidget(), done.append)
+        self.assertEqual(len(scheduled), 1)
+        blocker.set()
+        slow.result(timeout=5)
+        scheduled.pop()()
+        self.assertEqual(done, [future, slow])
+
+    def test_database_uses_wal(self):
+        """The writer switches the database to WAL journaling."""
+        mode = self.db_queue.read(lambda conn: conn.execute("PRAGMA journal_mode").fetchone()[0])
+        self.assertEqual(mode.result(timeout=5), "wal")
+
+    def test_read_does_not_wait_for_open_write(self):
+        """Reads see the last committed data while the writer is mid-transaction."""
+        self.db_queue.execute(insert_event, (1,)).result(timeout=5)
+        self.db_queue.execute(lambda conn: conn.commit()).result(timeout=5)
+
+        in_write = threading.Event()
+        release = threading.Event()
+
+        def long_write(conn):
+            conn.execute("INSERT INTO events (value) VALUES (2)")
+            in_write.set()
+            release.wait(5)
+            conn.commit()
+
+        writing = self.db_queue.execute(long_write)
+        self.assertTrue(in_write.wait(5))
+        try:
+            self.assertEqual(self.db_queue.read(count_events).result(timeout=2), 1)
+        finally:
+            release.set()
+        writing.result(timeout=5)
+        self.assertEqual(self.db_queue.read(count_events).result(timeout=5), 2)
+
+    def test_readers_cannot_write(self):
+        """Reader connections are query-only."""
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db_queue.read(insert_event, (1,)).result(timeout=5)
+
+
+def query_plan(conn, query, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+
+class TestSchemaMigrations(unittest.TestCase):
+    """Test cases for versioned schema migrations and log query plans."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.conn = sqlite3.connect(os.path.join(self.test_dir, "test.db"))
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_migrate_sets_user_version_once(self):
+        """Migrating records the schema version, and migrating again is a no-op."""
+        self.assertEqual(migrate(self.conn), 0)
+        self.assertEqual(self.conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+        self.assertEqual(migrate(self.conn), SCHEMA_VERSION)
+
+    def test_migrate_upgrades_existing_database(self):
+        """A database created before versioning keeps its rows and gains the indexes."""
+        self.conn.execute("CREATE TABLE user_activity (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                          "timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, username TEXT NOT NULL, "
+                          "action_type TEXT NOT NULL, item_type TEXT NOT NULL, "
+                          "item_path TEXT NOT NULL, details TEXT)")
+        self.conn.execute("INSERT INTO user_activity (username, action_type, item_type, item_path) "
+                          "VALUES ('alice', 'OPEN', 'FILE', '/tmp/a')")
+        self.conn.commit()
+
+        migrate(self.conn)
+
+        indexes = {row[1] for row in self.conn.execute("PRAGMA index_list(user_activity)")}
+        self.assertIn("idx_user_activity_user_keyset", indexes)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM user_activity").fetchone()[0], 1)
+
+    def test_newer_schema_is_rejected(self):
+        """A database from a newer release is not silently downgraded."""
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        with self.assertRaises(sqlite3.DatabaseError):
+            migrate(self.conn)
+
+    def test_log_queries_are_index_only(self):
+        """Per-user log queries read a covering index in order, without sorting."""
+        migrate(self.conn)
+
+        plan = query_plan(self.conn, *user_logs_query("alice", 100))
+        self.assertTrue(any("COVERING INDEX idx_user_activity_user_keyset" in step for step in plan), plan)
+        self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+
+        plan = query_plan(self.conn, *user_logs_query(None, 100))
+        self.assertFalse(any(step.startswith("SCAN user_activity") and "INDEX" not in step
+                             for step in plan), plan)
+        self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+
+        plan = query_plan(self.conn, "SELECT timestamp, action, old_path, new_path FROM logs "
+                          "WHERE username = ? ORDER BY timestamp DESC LIMIT ?", ("alice", 100))
+        self.assertTrue(any("COVERING INDEX idx_logs_user_time" in step for step in plan), plan)
+        self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+
+        plan = query_plan(self.conn, *user_logs_page_query("alice", before=("2026-01-01 00:00:00", 10),
+                                                           action_type="OPEN", path="docs",
+                                                           since="2025-01-01"))
+        self.assertTrue(any("COVERING INDEX idx_user_activity_user_keyset" in step for step in plan), plan)
+        self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+
+
+class TestLogPagination(unittest.TestCase):
+    """Test cases for keyset-paginated activity log queries."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.conn = sqlite3.connect(os.path.join(self.test_dir, "test.db"))
+        migrate(self.conn)
+        rows = []
+        for i in range(300):
+            # Several rows share each timestamp so the id tie-break matters
+            timestamp = f"2026-01-{1 + i // 100:02d} 12:00:{(i // 7) % 60:02d}"
+            action = "OPEN" if i % 3 else "DELETE"
+            rows.append((timestamp, "alice" if i % 4 else "bob", action, "FILE", f"/docs/file_{i}.txt"))
+        self.conn.executemany("INSERT INTO user_activity (timestamp, username, action_type, item_type, item_path) "
+                              "VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.test_dir)
+
+    def fetch_all(self, username=None, page_size=7, **filters):
+        pages = []
+        before = None
+        while True:
+            page = self.conn.execute(*user_logs_page_query(username, before, limit=page_size,
+                                                           **filters)).fetchall()
+            if not page:
+                return pages
+            pages.append(page)
+            before = page[-1][1], page[-1][0]
+
+    def expected(self, condition):
+        return self.conn.execute("SELECT id, timestamp, action_type, item_type, item_path, details "
+                                 "FROM user_activity WHERE " + condition +
+                                 " ORDER BY timestamp DESC, id DESC").fetchall()
+
+    def test_pages_cover_every_row_once_in_order(self):
+        """Following the cursor visits every row exactly once, newest first."""
+        pages = self.fetch_all("alice")
+        rows = [row for page in pages for row in page]
+        self.assertEqual(rows, self.expected("username = 'alice'"))
+        self.assertTrue(all(len(page) <= 7 for page in pages))
+
+    def test_after_cursor_pages_back_towards_newest(self):
+        """Paging with `after` returns the rows just newer than the cursor."""
+        rows = self.expected("username = 'alice'")
+        cursor = rows[50]
+        page = self.conn.execute(*user_logs_page_query("alice", after=(cursor[1], cursor[0]),
+                                                       limit=10)).fetchall()
+        self.assertEqual(page[::-1], rows[40:50])
+
+    def test_filters_are_applied_in_the_query(self):
+        """Action type, path and date range filters narrow the pages."""
+        pages = self.fetch_all("alice", action_type="DELETE", path="file_1",
+                               since="2026-01-02", until="2026-01-03")
+        rows = [row for page in pages for row in page]
+        self.assertEqual(rows, self.expected("username = 'alice' AND action_type = 'DELETE' "
+                                             "AND item_path LIKE '%file\\_1%' ESCAPE '\\' "
+                                             "AND timestamp >= '2026-01-02' AND timestamp < '2026-01-03'"))
+        self.assertTrue(rows)
+
+    def test_path_filter_treats_wildcards_literally(self):
+        """LIKE wildcards typed into the path filter match themselves."""
+        self.assertEqual(self.fetch_all("alice", path="file%"), [])
+
+
+class TestLogRetention(unittest.TestCase):
+    """Test cases for rolling old log rows up into daily counts."""
+
+    NOW = datetime(2026, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.test_dir, "test.db")
+        self.db_queue = DatabaseQueue(self.db_path)
+        self.db_queue.execute(migrate).result(timeout=5)
+        self.activity = ActivityRepository(self.db_queue)
+
+        def populate(conn):
+            conn.execute("INSERT INTO users (username, password) VALUES ('alice', 'x')")
+            rows = []
+            for day, count in (("2025-11-03", 40), ("2026-01-15", 30), ("2026-05-20", 20)):
+                for i in range(count):
+                    action = "DELETE" if i % 2 else "CREATE"
+                    rows.append((f"{day} 10:{i % 60:02d}:00", "alice", action, "FILE",
+                                 f"/docs/{day}/{i}.txt", "x" * 2000))
+            conn.executemany("INSERT INTO user_activity (timestamp, username, action_type, item_type, "
+                             "item_path, details) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT INTO logs (timestamp, action, old_path, username) "
+                         "VALUES ('2025-11-03 09:00:00', 'MOVE', '/a', 'alice')")
+            conn.commit()
+        self.db_queue.execute(populate).result(timeout=5)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def query(self, sql):
+        return self.db_queue.read(lambda conn: conn.execute(sql).fetchall()).result(timeout=5)
+
+    def daily_counts(self):
+        return self.query("""
+            SELECT day, action_type, SUM(count) FROM (
+                SELECT day, action_type, count FROM activity_rollup
+                UNION ALL
+                SELECT substr(timestamp, 1, 10), action_type, 1 FROM user_activity
+            ) GROUP BY 1, 2 ORDER BY 1, 2""")
+
+    def test_old_rows_are_rolled_up(self):
+        """Rows past retention become daily counts; recent rows stay raw."""
+        before = self.daily_counts()
+
+        self.assertEqual(self.activity.apply_retention(keep_days=90, now=self.NOW), 2)
+
+        self.assertEqual(self.query("SELECT DISTINCT substr(timestamp, 1, 10) FROM user_activity"),
+                         [("2026-05-20",)])
+        self.assertEqual(self.query("SELECT day, action_type, count FROM activity_rollup ORDER BY 1, 2"),
+                         [("2025-11-03", "CREATE", 20), ("2025-11-03", "DELETE", 20),
+                          ("2026-01-15", "CREATE", 15), ("2026-01-15", "DELETE", 15)])
+        self.assertEqual(self.query("SELECT * FROM logs_rollup"), [("alice", "2025-11-03", "MOVE", 1)])
+        self.assertEqual(self.daily_counts(), before)
+
+    def test_retention_is_idempotent(self):
+        """Running retention again does not count rows twice."""
+        self.activity.apply_retention(keep_days=90, now=self.NOW)
+        self.assertEqual(self.activity.apply_retention(keep_days=90, now=self.NOW), 0)
+        self.assertEqual(self.query("SELECT SUM(count) FROM activity_rollup"), [(70,)])
+
+    def test_freed_pages_are_returned(self):
+        """Incremental vacuum shrinks the file after old rows are removed."""
+        pages_before = self.query("PRAGMA page_count")[0][0]
+        self.activity.apply_retention(keep_days=90, now=self.NOW)
+        self.assertEqual(self.query("PRAGMA freelist_count"), [(0,)])
+        self.assertLess(self.query("PRAGMA page_count")[0][0], pages_before)
+
+    def test_older_files_are_not_fully_vacuumed(self):
+        """Files without incremental auto-vacuum keep their free pages instead of a blocking VACUUM."""
+        def disable_auto_vacuum(conn):
+            conn.execute("PRAGMA auto_vacuum = NONE")
+            conn.execute("VACUUM")
+        self.db_queue.execute(disable_auto_vacuum).result(timeout=5)
+
+        self.assertEqual(self.activity.apply_retention(keep_days=90, now=self.NOW), 2)
+        self.assertEqual(self.query("PRAGMA auto_vacuum"), [(0,)])
+        self.assertGreater(self.query("PRAGMA freelist_count")[0][0], 0)
+
+
+class TestRepositories(unittest.TestCase):
+    """Test cases for the user and cloud credential repositories."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_queue = DatabaseQueue(os.path.join(self.test_dir, "test.db"))
+        self.db_queue.execute(migrate).result(timeout=5)
+        self.users = UserRepository(self.db_queue)
+        self.activity = ActivityRepository(self.db_queue)
+        self.cloud_credentials = CloudCredentialRepository(self.db_queue)
+        self.users.register_async("alice", "secret").result(timeout=5)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_register_and_check_password(self):
+        """Passwords are verified against the stored hash; unknown users give None."""
+        self.assertTrue(self.users.check_password_async("alice", "secret").result(timeout=5))
+        self.assertFalse(self.users.check_password_async("alice", "wrong").result(timeout=5))
+        self.assertIsNone(self.users.check_password_async("bob", "secret").result(timeout=5))
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.users.register_async("alice", "other").result(timeout=5)
+
+    def test_automation_folder_round_trip(self):
+        """The automation folder can be set, read back and cleared."""
+        self.assertIsNone(self.users.get_automation_folder("alice"))
+        self.users.set_automation_folder_async("alice", "/home/alice/auto").result(timeout=5)
+        self.assertEqual(self.users.get_automation_folder("alice"), "/home/alice/auto")
+        self.users.set_automation_folder_async("alice", None).result(timeout=5)
+        self.assertIsNone(self.users.get_automation_folder("alice"))
+
+    def test_deleting_user_removes_activity(self):
+        """Deleting an account cascades to the user's activity rows."""
+        self.activity.log_action("alice", "CREATE", "FILE", "/a.txt").result(timeout=5)
+        self.assertEqual(len(self.activity.recent_async("alice").result(timeout=5)), 1)
+        self.users.delete("alice")
+        self.assertEqual(self.activity.recent_async("alice").result(timeout=5), [])
+
+    def test_cloud_credentials_are_upserted(self):
+        """Saving credentials twice replaces the stored row."""
+        self.assertIsNone(self.cloud_credentials.get("alice"))
+        first = CloudCredentials("https://a", b"u1", b"p1", b"s" * 16)
+        second = CloudCredentials("https://b", b"u2", b"p2", b"s" * 16)
+        self.cloud_credentials.save("alice", first)
+        self.cloud_credentials.save("alice", second)
+        self.assertEqual(self.cloud_credentials.get("alice"), second)
+
+
+class TestActivityStats(unittest.TestCase):
+    """Test cases for the incrementally maintained dashboard statistics."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_queue = DatabaseQueue(os.path.join(self.test_dir, "test.db"))
+        self.db_queue.execute(migrate).result(timeout=5)
+        self.activity = ActivityRepository(self.db_queue)
+        self.db_queue.execute(lambda conn: (conn.execute("INSERT INTO users (username, password) "
+                                                         "VALUES ('alice', 'x')"), conn.commit())
+                              ).result(timeout=5)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_log_action_updates_daily_stats(self):
+        """Each logged action bumps its (day, action, folder) count in the same batch."""
+        home = os.path.expanduser("~")
+        for name in ("a.txt", "b.txt", "c.txt"):
+            self.activity.log_action("alice", "MOVE", "FILE",
+                                     f"{os.path.join(home, 'Documents', 'work', name)} -> /tmp/{name}")
+        self.activity.log_action("alice", "DELETE", "FILE", "/tmp/d.txt", "Move to Bin")
+        self.activity.log_action("alice", "CREATE", "FILE", "/tmp/e.txt").result(timeout=5)
+
+        summary = self.activity.summary_async("alice", days=7).result(timeout=5)
+        self.assertEqual(summary["per_day"][-1][1], 5)
+        self.assertEqual(len(summary["per_day"]), 7)
+        self.assertEqual(summary["actions"][0], ("MOVE", 3))
+        self.assertEqual(summary["moved_folders"], [(os.path.join(home, "Documents"), 3)])
+        self.assertEqual(summary["bin_items"], 1)
+
+    def test_summary_reads_only_the_stats_table(self):
+        """The dashboard summary comes from the aggregates, not the raw log."""
+        self.activity.log_action("alice", "CREATE", "FILE", "/tmp/a.txt").result(timeout=5)
+        self.db_queue.execute(lambda conn: (conn.execute("DELETE FROM user_activity"), conn.commit())
+                              ).result(timeout=5)
+        summary = self.activity.summary_async("alice", days=1).result(timeout=5)
+        self.assertEqual(summary["actions"], [("CREATE", 1)])
+
+    def test_migration_backfills_existing_rows(self):
+        """Rows logged before the stats table existed are counted by the migration."""
+        conn = sqlite3.connect(os.path.join(self.test_dir, "old.db"))
+        stats_migration = [step.__name__ for step in MIGRATIONS].index("_create_activity_stats")
+        for step in MIGRATIONS[:stats_migration]:
+            step(conn.cursor())
+        conn.execute(f"PRAGMA user_version = {stats_migration}")
+        conn.execute("INSERT INTO users (username, password) VALUES ('alice', 'x')")
+        conn.execute("INSERT INTO user_activity (timestamp, username, action_type, item_type, item_path, details) "
+                     "VALUES ('2026-02-01 10:00:00', 'alice', 'DELETE', 'FILE', '/tmp/a.txt', 'Move to Bin')")
+        conn.commit()
+
+        migrate(conn)
+
+        self.assertEqual(conn.execute("SELECT * FROM activity_daily_stats").fetchall(),
+                         [("alice", "2026-02-01", BIN_ACTION, "/tmp", 1)])
+        conn.close()
+
+    def test_activity_folder(self):
+        """Home paths group by their first folder; others by their parent."""
+        home = os.path.expanduser("~")
+        self.assertEqual(activity_folder(os.path.join(home, "Pictures", "2026", "a.png")),
+                         os.path.join(home, "Pictures"))
+        self.assertEqual(activity_folder("/srv/share/a.txt -> /srv/b.txt"), "/srv/share")
+        self.assertEqual(activity_folder(""), "")
+
+
+class TestFileAccessStore(unittest.TestCase):
+    """Test cases for the append-only file access store."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_queue = DatabaseQueue(os.path.join(self.test_dir, "test.db"))
+        self.db_queue.execute(migrate).result(timeout=5)
+        self.file_access = FileAccessRepository(self.db_queue)
+        self.db_queue.execute(lambda conn: (conn.executemany("INSERT INTO users (username, password) "
+                                                             "VALUES (?, 'x')", [("alice",), ("bob",)]),
+                                            conn.commit())).result(timeout=5)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def count_events(self):
+        return self.db_queue.read(lambda conn: conn.execute(
+            "SELECT COUNT(*) FROM file_access_events").fetchone()[0]).result(timeout=5)
+
+    def test_accessed_since(self):
+        """Recent accesses are returned once per path and per user."""
+        now = time.time()
+        self.file_access.record("alice", "/docs/a.txt", now - 10 * 86400)
+        self.file_access.record("alice", "/docs/b.txt", now - 3600)
+        self.file_access.record("alice", "/docs/b.txt", now - 60)
+        self.file_access.record("bob", "/docs/c.txt", now - 60).result(timeout=5)
+
+        self.assertEqual(self.file_access.accessed_since("alice", now - 86400), ["/docs/b.txt"])
+        self.assertEqual(sorted(self.file_access.accessed_since("alice", now - 30 * 86400)),
+                         ["/docs/a.txt", "/docs/b.txt"])
+        self.assertEqual(self.count_events(), 4)
+
+    def test_compact_keeps_latest_old_event(self):
+        """Compaction collapses old events per file and leaves recent ones alone."""
+        now = time.time()
+        accesses = [("/docs/a.txt", now - day * 86400) for day in (40, 35, 31, 2, 1)]
+        self.file_access.record_many_async("alice", accesses).result(timeout=5)
+
+        self.assertEqual(self.file_access.compact(keep_days=30, now=now), 2)
+        self.assertEqual(self.count_events(), 3)
+        self.assertEqual(self.file_access.accessed_since("alice", now - 32 * 86400), ["/docs/a.txt"])
+        self.assertEqual(self.file_access.compact(keep_days=30, now=now), 0)
+
+    def test_range_query_uses_index(self):
+        """The recent-files query is a range scan of the covering index."""
+        plan = self.db_queue.read(lambda conn: query_plan(
+            conn, "SELECT DISTINCT path FROM file_access_events WHERE username = ? AND accessed_at >= ?",
+            ("alice", 0.0))).result(timeout=5)
+        self.assertTrue(any("COVERING INDEX idx_file_access_user_time" in step for step in plan), plan)
+
+    def test_frecency_decays_and_accumulates(self):
+        """Each access adds one to a score that halves every half-life."""
+        now = 1.8e9
+        half_life = FRECENCY_HALF_LIFE_DAYS * 86400
+        key = None
+        for accessed_at in (now - 2 * half_life, now - half_life, now):
+            key = frecency_key(key, accessed_at)
+        self.assertAlmostEqual(frecency_score(key, now), 1.75)
+        self.assertAlmostEqual(frecency_score(key, now + half_life), 0.875)
+
+    def test_top_ranks_by_frecency(self):
+        """Often-opened files outrank a single recent open, and recent() orders by last access."""
+        now = time.time()
+        for hours in range(10):
+            self.file_access.record("alice", "/docs/hot.txt", now - 86400 - hours * 3600)
+        self.file_access.record("alice", "/docs/once.txt", now - 60)
+        self.file_access.record("alice", "/docs/old.txt", now - 60 * 86400)
+        self.file_access.record("bob", "/docs/bob.txt", now).result(timeout=5)
+
+        top = self.file_access.top("alice", limit=2, now=now)
+        self.assertEqual([path for path, score in top], ["/docs/hot.txt", "/docs/once.txt"])
+        self.assertGreater(top[0][1], 8)
+        self.assertEqual([path for path, score in self.file_access.top("alice", since=now - 3600)],
+                         ["/docs/once.txt"])
+        self.assertEqual([path for path, _ in self.file_access.recent("alice")],
+                         ["/docs/once.txt", "/docs/hot.txt", "/docs/old.txt"])
+
+        scores = self.file_access.scores("alice", ["/docs/once.txt", "/docs/missing.txt"], now=now)
+        self.assertEqual(list(scores), ["/docs/once.txt"])
+        self.assertAlmostEqual(scores["/docs/once.txt"], 1.0, places=3)
+
+    def test_compact_forgets_cold_files(self):
+        """Files whose score has decayed away drop out of the frecency table."""
+        now = time.time()
+        self.file_access.record("alice", "/docs/cold.txt", now - 120 * 86400)
+        self.file_access.record("alice", "/docs/warm.txt", now - 86400).result(timeout=5)
+
+        self.file_access.compact(now=now)
+        self.assertEqual([path for path, _ in self.file_access.top("alice")], ["/docs/warm.txt"])
+
+    def test_frecency_queries_use_indexes(self):
+        """Top-N and recent lists walk an index instead of sorting every file."""
+        plans = self.db_queue.read(lambda conn: [
+            query_plan(conn, "SELECT path, score_key FROM file_frecency WHERE username = ? "
+                       "AND last_access >= ? ORDER BY score_key DESC LIMIT ?", ("alice", 0.0, 10)),
+            query_plan(conn, "SELECT path, last_access FROM file_frecency WHERE username = ? "
+                       "ORDER BY last_access DESC LIMIT ?", ("alice", 10)),
+        ]).result(timeout=5)
+        for plan, index in zip(plans, ("idx_file_frecency_score", "idx_file_frecency_recent")):
+            self.assertTrue(any(f"COVERING INDEX {index}" in step for step in plan), plan)
+            self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+
+    def test_frecency_backfilled_from_events(self):
+        """The frecency migration scores files from the existing access events."""
+        conn = sqlite3.connect(os.path.join(self.test_dir, "upgrade.db"))
+        steps = [step.__name__ for step in MIGRATIONS]
+        for step in MIGRATIONS[:steps.index("_create_file_frecency")]:
+            step(conn.cursor())
+        conn.execute("INSERT INTO users (username, password) VALUES ('alice', 'x')")
+        conn.executemany("INSERT INTO file_access_events (username, path, accessed_at) VALUES (?, ?, ?)",
+                         [("alice", "/docs/a.txt", 1000.0), ("alice", "/docs/a.txt", 2000.0),
+                          ("alice", "/docs/b.txt", 1500.0)])
+        conn.execute(f"PRAGMA user_version = {steps.index('_create_file_frecency')}")
+        conn.commit()
+        migrate(conn)
+
+        rows = dict((path, (key, last)) for path, key, last in conn.execute(
+            "SELECT path, score_key, last_access FROM file_frecency"))
+        conn.close()
+        self.assertAlmostEqual(rows["/docs/a.txt"][0], frecency_key(frecency_key(None, 1000.0), 2000.0))
+        self.assertEqual(rows["/docs/a.txt"][1], 2000.0)
+        self.assertEqual(rows["/docs/b.txt"], (frecency_key(None, 1500.0), 1500.0))
+
+    def test_events_removed_with_user(self):
+        """Deleting a user removes their access history."""
+        self.file_access.record("alice", "/docs/a.txt").result(timeout=5)
+        UserRepository(self.db_queue).delete("alice")
+        self.assertEqual(self.count_events(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import tempfile
+import shutil
+import threading
+import time
+from unittest.mock import patch
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from diskusage import DiskUsageService, parse_mounts
+
+
+class FakeStatvfs:
+    f_blocks = 1000
+    f_bfree = 400
+    f_bavail = 300
+    f_frsize = 4096
+
+
+class TestDiskUsageService(unittest.TestCase):
+    """Test cases for mount enumeration and cached disk usage."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.mounts_file = os.path.join(self.test_dir, "mounts")
+        with open(self.mounts_file, "w") as f:
+            f.write("/dev/sda1 / ext4 rw,relatime 0 0\n")
+            f.write("proc /proc proc rw,nosuid 0 0\n")
+            f.write("/dev/sdb1 /home ext4 rw,relatime 0 0\n")
+            f.write("server:/share /mnt/My\\040Share nfs4 rw 0 0\n")
+        self.service = DiskUsageService(ttl=60, timeout=0.2, mounts_file=self.mounts_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_parse_mounts_unescapes_mount_points(self):
+        """Octal escapes in mount points are decoded."""
+        mount_points = [m.mount_point for m in parse_mounts(self.mounts_file)]
+        self.assertIn("/mnt/My Share", mount_points)
+
+    def test_pseudo_filesystems_are_skipped(self):
+        """Kernel pseudo filesystems are not reported as mounts."""
+        mount_points = [m.mount_point for m in self.service.mounts()]
+        self.assertNotIn("/proc", mount_points)
+        self.assertEqual(len(mount_points), 3)
+
+    @unittest.skipIf(os.name == 'nt', "POSIX mount table semantics")
+    def test_mount_for_uses_longest_prefix(self):
+        """A path resolves to the most specific mount containing it."""
+        self.assertEqual(self.service.mount_for("/home/user/docs"), "/home")
+        self.assertEqual(self.service.mount_for("/homework"), "/")
+        self.assertEqual(self.service.mount_for("/mnt/My Share/a.txt"), "/mnt/My Share")
+        self.assertEqual(self.service.mount_for("/mnt/My Share/../../home/x"), "/home")
+
+    @unittest.skipIf(os.name == 'nt', "POSIX mount table semantics")
+    def test_mount_for_does_not_touch_filesystem(self):
+        """Resolving a path never stats it, so a hung mount cannot block the caller."""
+        no_table = DiskUsageService(mounts_file=os.path.join(self.test_dir, "missing"))
+        with patch('os.stat', side_effect=AssertionError("stat called")), \
+                patch('os.lstat', side_effect=AssertionError("lstat called")):
+            self.assertEqual(self.service.mount_for("/mnt/My Share/a.txt"), "/mnt/My Share")
+            self.assertEqual(no_table.mount_for("/mnt/hung/a.txt"), "/mnt/hung/a.txt")
+
+    @patch('os.statvfs', return_value=FakeStatvfs(), create=True)
+    def test_usage_is_cached_within_ttl(self, mock_statvfs):
+        """Repeated lookups within the TTL do not stat the filesystem again."""
+        first = self.service.usage_for_mount("/home")
+        second = self.service.usage_for_mount("/home")
+
+        self.assertEqual(first, (1000 * 4096, 600 * 4096, 300 * 4096))
+        self.assertEqual(first, second)
+        self.assertEqual(mock_statvfs.call_count, 1)
+
+    def test_slow_mount_does_not_block(self):
+        """A hung mount returns None after the timeout instead of blocking."""
+        release = threading.Event()
+
+        def slow_statvfs(path):
+            release.wait(5)
+            return FakeStatvfs()
+
+        with patch('os.statvfs', side_effect=slow_statvfs, create=True):
+            self.assertIsNone(self.service.usage_for_mount("/mnt/My Share"))
+            release.set()
+
+
+    def test_all_usage_shares_one_deadline(self):
+        """Hung mounts share one timeout, and fast mounts still report their usage."""
+        release = threading.Event()
+
+        def statvfs(path):
+            if path != "/":
+                release.wait(5)
+            return FakeStatvfs()
+
+        with patch('os.statvfs', side_effect=statvfs, create=True):
+            start = time.monotonic()
+            usage = self.service.all_usage()
+            elapsed = time.monotonic() - start
+            release.set()
+
+        self.assertLess(elapsed, 1.5 * self.service.timeout)
+        self.assertEqual(usage, {"/": (1000 * 4096, 600 * 4096, 300 * 4096),
+                                 "/home": None, "/mnt/My Share": None})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ import os
 import shutil
 import tempfile
 import subprocess
+import threading
 from unittest.mock import patch, MagicMock
 from io import StringIO
 import sqlite3
@@ -15,7 +16,10 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
 
 # Import the FileEncryptor class (assuming it's in a module named encryption)
-from encryption import FileEncryptor
+import encryption
+from encryption import FileEncryptor, session_keys, seal_chunk, MAGIC, HEADER, HEADER_V2, CHUNK_OVERHEAD
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
 
 class TestFileEncryption(unittest.TestCase):
     """Test cases for FileEncryptor encrypt_file and decrypt_file methods."""
@@ -179,6 +183,554 @@ class TestFileEncryption(unittest.TestCase):
         # Check that encryption was still successful
         self.assertTrue(os.path.exists(self.encrypted_file_path))
     
+    def test_derived_key_is_cached(self):
+        """Test that PBKDF2 runs once per session for repeated operations."""
+        session_keys.clear()
+        
+        with patch('encryption.PBKDF2', wraps=encryption.PBKDF2) as mock_kdf:
+            self.encryptor.encrypt_file(self.test_file_path)
+            os.remove(self.test_file_path)
+            self.encryptor.decrypt_file(self.encrypted_file_path)
+            
+        self.assertEqual(mock_kdf.call_count, 1)
+        
+        with open(self.test_file_path, 'r') as f:
+            self.assertEqual(f.read(), "This is test content for encryption and decryption tests.")
+    
+    def test_warm_up_derives_key_in_background(self):
+        """Test that a warmed-up key is reused by the first encryption."""
+        session_keys.clear()
+        
+        with patch('encryption.PBKDF2', wraps=encryption.PBKDF2) as mock_kdf:
+            future = self.encryptor.warm_up_key()
+            self.encryptor.encrypt_file(self.test_file_path)
+            self.assertEqual(bytes(future.result(timeout=30)), bytes(self.encryptor.derive_key()))
+            
+        self.assertEqual(mock_kdf.call_count, 1)
+        self.assertTrue(self.encryptor.warm_up_key().done())
+    
+    def test_clear_discards_in_flight_warm_up(self):
+        """Test that signing out during a warm-up does not leave the key cached."""
+        session_keys.clear()
+        release = threading.Event()
+        
+        def slow_kdf(*args, **kwargs):
+            release.wait(5)
+            return b"k" * 32
+        
+        with patch('encryption.PBKDF2', side_effect=slow_kdf):
+            future = self.encryptor.warm_up_key()
+            session_keys.clear()
+            release.set()
+            future.result(timeout=5)
+        
+        self.assertEqual(len(session_keys), 0)
+    
+    def test_set_master_password_keeps_salt(self):
+        """Test that setting the password again does not invalidate the stored salt."""
+        salt = self.encryptor.get_salt()
+        self.encryptor.set_master_password("test_password")
+        self.assertEqual(self.encryptor.get_salt(), salt)
+    
+    def test_chunked_round_trip(self):
+        """Test that multi-chunk files survive encryption and decryption."""
+        content = os.urandom(10000)
+        with open(self.test_file_path, 'wb') as f:
+            f.write(content)
+        
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=4096)
+        os.remove(self.test_file_path)
+        
+        with open(self.encrypted_file_path, 'rb') as f:
+            self.assertEqual(f.read(len(MAGIC)), MAGIC)
+        # Three chunk records follow the header
+        self.assertEqual(os.path.getsize(self.encrypted_file_path),
+                         HEADER.size + 3 * CHUNK_OVERHEAD + len(content))
+        
+        self.encryptor.decrypt_file(self.encrypted_file_path)
+        with open(self.test_file_path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+    
+    def test_empty_file_round_trip(self):
+        """Test that an empty file encrypts to a single final chunk."""
+        open(self.test_file_path, 'wb').close()
+        
+        self.encryptor.encrypt_file(self.test_file_path)
+        os.remove(self.test_file_path)
+        self.encryptor.decrypt_file(self.encrypted_file_path)
+        
+        self.assertEqual(os.path.getsize(self.test_file_path), 0)
+    
+    def test_truncated_file_fails(self):
+        """Test that dropping the final chunk is detected."""
+        with open(self.test_file_path, 'wb') as f:
+            f.write(os.urandom(8192))
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=4096)
+        os.remove(self.test_file_path)
+        
+        # Cut the file after the first chunk record
+        with open(self.encrypted_file_path, 'r+b') as f:
+            f.truncate(HEADER.size + 4096 + CHUNK_OVERHEAD)
+        
+        with self.assertRaises(RuntimeError):
+            self.encryptor.decrypt_file(self.encrypted_file_path)
+        self.assertFalse(os.path.exists(self.test_file_path))
+    
+    def test_swapped_chunks_fail(self):
+        """Test that reordering chunk records is detected."""
+        with open(self.test_file_path, 'wb') as f:
+            f.write(os.urandom(8192 + 100))
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=4096)
+        
+        record = 4096 + CHUNK_OVERHEAD
+        with open(self.encrypted_file_path, 'r+b') as f:
+            f.seek(HEADER.size)
+            first, second = f.read(record), f.read(record)
+            f.seek(HEADER.size)
+            f.write(second + first)
+        
+        with self.assertRaises(RuntimeError):
+            self.encryptor.decrypt_file(self.encrypted_file_path, output_path=self.temp_decrypted_path)
+    
+    def test_chunks_spliced_between_files_fail(self):
+        """Test that chunk records copied from another file under the same key are rejected."""
+        other_path = os.path.join(self.test_dir, "other.txt")
+        with open(self.test_file_path, 'wb') as f:
+            f.write(b"A" * 5000)
+        with open(other_path, 'wb') as f:
+            f.write(b"B" * 5000)
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=4096)
+        self.encryptor.encrypt_file(other_path, chunk_size=4096)
+        
+        # Keep the other file's header but carry this file's chunk records
+        with open(self.encrypted_file_path, 'rb') as f:
+            records = f.read()[HEADER.size:]
+        with open(other_path + '.enc', 'r+b') as f:
+            f.seek(HEADER.size)
+            f.write(records)
+            f.truncate()
+        
+        with self.assertRaises(RuntimeError):
+            self.encryptor.decrypt_file(other_path + '.enc', output_path=self.temp_decrypted_path)
+    
+    def test_decrypt_v2_file(self):
+        """Test that chunked files written before the file id was added still decrypt."""
+        key = self.encryptor.derive_key()
+        salt = self.encryptor.get_salt()
+        raw = HEADER_V2.pack(MAGIC, 2, 0, 0, 4096, salt)
+        header = encryption.Header(2, 0, 4096, salt, raw)
+        content = os.urandom(5000)
+        with open(self.encrypted_file_path, 'wb') as f:
+            f.write(raw)
+            f.write(encryption.seal_chunk(key, header, 0, False, content[:4096]))
+            f.write(encryption.seal_chunk(key, header, 1, True, content[4096:]))
+        
+        self.assertEqual(encryption.detect_format(self.encrypted_file_path), 2)
+        self.encryptor.decrypt_file(self.encrypted_file_path, output_path=self.temp_decrypted_path)
+        with open(self.temp_decrypted_path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(self.encryptor.read_range(self.encrypted_file_path, 4000, 200), content[4000:4200])
+    
+    def test_decrypt_legacy_v1_file(self):
+        """Test that files in the original nonce + tag + ciphertext format still decrypt."""
+        key = self.encryptor.derive_key()
+        nonce = get_random_bytes(16)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        ciphertext, tag = cipher.encrypt_and_digest(b"legacy content")
+        with open(self.encrypted_file_path, 'wb') as f:
+            f.write(nonce + tag + ciphertext)
+        
+        self.encryptor.decrypt_file(self.encrypted_file_path, output_path=self.temp_decrypted_path)
+        
+        with open(self.temp_decrypted_path, 'rb') as f:
+            self.assertEqual(f.read(), b"legacy content")
+    
+    def test_parallel_directory_round_trip(self):
+        """Test encrypting and decrypting a directory on a worker pool."""
+        folder = os.path.join(self.test_dir, "docs")
+        os.makedirs(os.path.join(folder, "nested"))
+        expected = {}
+        for i in range(12):
+            path = os.path.join(folder, "nested" if i % 2 else "", f"doc_{i}.txt")
+            expected[path] = f"document {i}".encode()
+            with open(path, 'wb') as f:
+                f.write(expected[path])
+        
+        progress = []
+        result = self.encryptor.encrypt_directory(
+            folder, workers=4, progress_callback=lambda done, total, path, error: progress.append((done, total, error)))
+        
+        self.assertEqual(len(result['encrypted']), 12)
+        self.assertEqual(result['failed'], [])
+        self.assertEqual([done for done, _, _ in progress], list(range(1, 13)))
+        self.assertTrue(all(total == 12 and error is None for _, total, error in progress))
+        self.assertTrue(all(not os.path.exists(path) for path in expected))
+        
+        result = self.encryptor.decrypt_directory(folder, workers=4)
+        
+        self.assertEqual(sorted(result['decrypted']), sorted(expected))
+        for path, content in expected.items():
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), content)
+    
+    def test_random_access_reader(self):
+        """Test seeking and reading within an encrypted file."""
+        content = os.urandom(20000)
+        with open(self.test_file_path, 'wb') as f:
+            f.write(content)
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=4096)
+        
+        with self.encryptor.open_encrypted(self.encrypted_file_path) as reader:
+            self.assertEqual(reader.size, len(content))
+            self.assertEqual(reader.chunk_count, 5)
+            
+            reader.seek(10000)
+            self.assertEqual(reader.read(100), content[10000:10100])
+            self.assertEqual(reader.read_chunk(4), content[16384:])
+            
+            reader.seek(-10, os.SEEK_END)
+            self.assertEqual(reader.read(), content[-10:])
+        
+        self.assertEqual(self.encryptor.read_range(self.encrypted_file_path, 4000, 9000),
+                         content[4000:13000])
+    
+    def test_random_access_decrypts_only_touched_chunks(self):
+        """Test that a range read only opens the chunks it needs."""
+        with open(self.test_file_path, 'wb') as f:
+            f.write(os.urandom(40960))
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=4096)
+        
+        with patch('encryption.open_chunk', wraps=encryption.open_chunk) as mock_open_chunk:
+            self.encryptor.read_range(self.encrypted_file_path, 8192, 100)
+        
+        self.assertEqual(mock_open_chunk.call_count, 1)
+    
+    def test_detects_encrypted_file_by_header(self):
+        """Test that encrypted files are recognised without relying on the .enc suffix."""
+        self.encryptor.encrypt_file(self.test_file_path)
+        renamed_path = os.path.join(self.test_dir, "renamed.bin")
+        os.rename(self.encrypted_file_path, renamed_path)
+        
+        self.assertTrue(self.encryptor.is_file_encrypted(renamed_path))
+        self.assertEqual(encryption.detect_format(renamed_path), encryption.FORMAT_VERSION)
+        
+        # A plaintext file of any size is not mistaken for an encrypted one
+        self.assertFalse(self.encryptor.is_file_encrypted(self.test_file_path))
+        self.assertIsNone(encryption.detect_format(os.path.join(self.test_dir, "missing.txt")))
+        
+        # Nor is plaintext that happens to start with the magic bytes
+        lookalike_path = os.path.join(self.test_dir, "lookalike.txt")
+        with open(lookalike_path, 'wb') as f:
+            f.write(MAGIC + b"X is not a vault file")
+        self.assertFalse(self.encryptor.is_file_encrypted(lookalike_path))
+        self.assertIsNone(encryption.detect_format(lookalike_path))
+    
+    def test_detection_is_cached_until_file_changes(self):
+        """Test that detection reads a file once until its mtime or size changes."""
+        self.encryptor.encrypt_file(self.test_file_path)
+        
+        with patch('encryption._sniff_format', wraps=encryption._sniff_format) as mock_sniff:
+            self.encryptor.is_file_encrypted(self.encrypted_file_path)
+            self.encryptor.is_file_encrypted(self.encrypted_file_path)
+            self.assertEqual(mock_sniff.call_count, 1)
+            
+            # Rewriting the file invalidates the cached result
+            with open(self.encrypted_file_path, 'wb') as f:
+                f.write(b"now plaintext")
+            self.assertEqual(encryption.detect_format(self.encrypted_file_path), 1)
+            self.assertEqual(mock_sniff.call_count, 2)
+    
+    def test_clear_wipes_cached_keys(self):
+        """Test that clearing the session cache zeroes the key material."""
+        key = self.encryptor.derive_key()
+        self.assertEqual(len(key), 32)
+        cached = list(session_keys._keys.values())
+        
+        session_keys.clear()
+        
+        self.assertEqual(len(session_keys), 0)
+        self.assertTrue(cached)
+        self.assertTrue(all(bytes(buffer) == bytes(32) for buffer in cached))
+        # The caller's copy is untouched
+        self.assertNotEqual(bytes(key), bytes(32))
+    
+    def test_clear_during_encryption_keeps_file_readable(self):
+        """Test that signing out while a file is being encrypted does not corrupt it."""
+        with open(self.test_file_path, 'wb') as f:
+            f.write(os.urandom(8 * 1024))
+        with open(self.test_file_path, 'rb') as f:
+            original = f.read()
+        calls = []
+        
+        def seal_then_clear(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 3:
+                session_keys.clear()
+            return get_random_bytes(*args, **kwargs)
+        
+        with patch('encryption.get_random_bytes', side_effect=seal_then_clear):
+            worker = threading.Thread(target=self.encryptor.encrypt_file,
+                                      args=(self.test_file_path,), kwargs={'chunk_size': 1024})
+            worker.start()
+            worker.join(30)
+        
+        self.assertGreater(len(calls), 3)
+        decrypted_path = os.path.join(self.test_dir, "decrypted.bin")
+        self.encryptor.decrypt_file(self.encrypted_file_path, decrypted_path)
+        with open(decrypted_path, 'rb') as f:
+            self.assertEqual(f.read(), original)
+    
+    @unittest.skipIf(os.name == 'nt', "POSIX permissions")
+    def test_temp_decryption_uses_private_directory(self):
+        """Test that viewing copies go to a directory only this user can read."""
+        self.encryptor.encrypt_file(self.test_file_path)
+        
+        temp_file = self.encryptor.decrypt_for_viewing(self.encrypted_file_path)
+        try:
+            view_dir = os.path.dirname(temp_file)
+            self.assertNotEqual(view_dir, tempfile.gettempdir())
+            self.assertEqual(os.stat(encryption.private_view_dir()).st_mode & 0o077, 0)
+            with open(temp_file, 'r') as f:
+                self.assertIn("This is test content", f.read())
+        finally:
+            self.encryptor.cleanup_all_temp_files()
+        self.assertFalse(os.path.exists(temp_file))
+    
+    @unittest.skipUnless(hasattr(os, 'memfd_create'), "memfd is Linux only")
+    def test_read_only_view_is_sealed_memory_file(self):
+        """Test that read-only viewing decrypts into a sealed memfd with no filesystem name."""
+        self.encryptor.encrypt_file(self.test_file_path)
+        
+        view_path = self.encryptor.decrypt_for_viewing(self.encrypted_file_path, read_only=True)
+        self.assertTrue(view_path.startswith(f"/proc/{os.getpid()}/fd/"))
+        with open(view_path, 'r') as f:
+            self.assertIn("This is test content", f.read())
+        
+        # The plaintext cannot be modified through the exposed path
+        with self.assertRaises(OSError):
+            with open(view_path, 'r+b') as f:
+                f.write(b"tampered")
+        
+        self.encryptor.close_memory_views()
+        self.assertFalse(os.path.exists(view_path))
+    
+    @unittest.skipUnless(sys.platform.startswith('linux') and hasattr(os, 'memfd_create'), "Linux only")
+    def test_no_memory_directory_never_writes_plaintext_to_disk(self):
+        """Test that without tmpfs the view falls back to a sealed memory file, not the temp directory."""
+        self.encryptor.encrypt_file(self.test_file_path)
+        
+        with patch('encryption._view_dir', None), \
+                patch('encryption._on_memory_filesystem', return_value=False), \
+                patch('encryption.tempfile.mkdtemp', side_effect=AssertionError("plaintext on disk")):
+            with self.assertRaises(OSError):
+                encryption.private_view_dir()
+            view_path = self.encryptor.decrypt_for_viewing(self.encrypted_file_path)
+        
+        self.assertIn(view_path, self.encryptor.memory_views)
+        self.assertEqual(self.encryptor.temp_files, {})
+        with open(view_path, 'r') as f:
+            self.assertIn("This is test content", f.read())
+        self.encryptor.close_memory_views()
+    
+    def _records(self, path, chunk_size):
+        """Split a v2 file into its chunk records."""
+        with open(path, 'rb') as f:
+            data = f.read()[HEADER.size:]
+        record_size = chunk_size + CHUNK_OVERHEAD
+        return [data[i:i + record_size] for i in range(0, len(data), record_size)]
+    
+    def test_unchanged_temp_file_is_not_reencrypted(self):
+        """Test that closing a file that was only viewed leaves the original untouched."""
+        self.encryptor.encrypt_file(self.test_file_path)
+        with open(self.encrypted_file_path, 'rb') as f:
+            original = f.read()
+        
+        temp_file = self.encryptor.decrypt_file(self.encrypted_file_path, temp=True)
+        with patch.object(self.encryptor, 'encrypt_file') as mock_encrypt:
+            self.assertEqual(self.encryptor.sync_temp_file(temp_file), 0)
+            self.encryptor.cleanup_temp_file(temp_file)
+            mock_encrypt.assert_not_called()
+        
+        self.assertFalse(os.path.exists(temp_file))
+        with open(self.encrypted_file_path, 'rb') as f:
+            self.assertEqual(f.read(), original)
+    
+    def test_only_changed_chunks_are_resealed(self):
+        """Test that an in-place edit re-seals just the chunk it touched."""
+        content = bytes(range(100)) * 2
+        with open(self.test_file_path, 'wb') as f:
+            f.write(content)
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=16)
+        before = self._records(self.encrypted_file_path, 16)
+        
+        temp_file = self.encryptor.decrypt_file(self.encrypted_file_path, temp=True)
+        try:
+            with open(temp_file, 'r+b') as f:
+                f.seek(40)
+                f.write(b"XY")
+            
+            self.assertEqual(self.encryptor.sync_temp_file(temp_file), 1)
+            after = self._records(self.encrypted_file_path, 16)
+            changed = [i for i in range(len(before)) if before[i] != after[i]]
+            self.assertEqual(changed, [2])
+            
+            expected = content[:40] + b"XY" + content[42:]
+            self.assertEqual(self.encryptor.read_range(self.encrypted_file_path, 0, len(content)), expected)
+        finally:
+            self.encryptor.cleanup_all_temp_files()
+    
+    def test_interrupted_patch_leaves_original_intact(self):
+        """Test that a failure part-way through re-sealing chunks does not mix old and new chunks."""
+        content = bytes(range(100)) * 2
+        with open(self.test_file_path, 'wb') as f:
+            f.write(content)
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=16)
+        with open(self.encrypted_file_path, 'rb') as f:
+            original = f.read()
+        
+        temp_file = self.encryptor.decrypt_file(self.encrypted_file_path, temp=True)
+        calls = []
+        
+        def crash_on_second_chunk(*args):
+            calls.append(1)
+            if len(calls) == 2:
+                raise OSError("power lost")
+            return seal_chunk(*args)
+        
+        try:
+            with open(temp_file, 'r+b') as f:
+                f.seek(0)
+                f.write(b"AB")
+                f.seek(100)
+                f.write(b"CD")
+            with patch('encryption.seal_chunk', side_effect=crash_on_second_chunk):
+                with self.assertRaises(RuntimeError):
+                    self.encryptor.sync_temp_file(temp_file)
+            
+            with open(self.encrypted_file_path, 'rb') as f:
+                self.assertEqual(f.read(), original)
+            self.assertEqual([name for name in os.listdir(self.test_dir) if name.endswith('.part')], [])
+        finally:
+            self.encryptor.cleanup_all_temp_files()
+    
+    def test_resized_temp_file_rewrites_tail(self):
+        """Test that growing or shrinking a file moves the final chunk correctly."""
+        content = os.urandom(100)
+        with open(self.test_file_path, 'wb') as f:
+            f.write(content)
+        self.encryptor.encrypt_file(self.test_file_path, chunk_size=16)
+        
+        temp_file = self.encryptor.decrypt_file(self.encrypted_file_path, temp=True)
+        try:
+            with open(temp_file, 'ab') as f:
+                f.write(b"appended" * 5)
+            self.assertEqual(self.encryptor.sync_temp_file(temp_file), 3)
+            self.encryptor.decrypt_file(self.encrypted_file_path, output_path=self.temp_decrypted_path)
+            with open(self.temp_decrypted_path, 'rb') as f:
+                self.assertEqual(f.read(), content + b"appended" * 5)
+            
+            with open(temp_file, 'r+b') as f:
+                f.truncate(30)
+            self.encryptor.sync_temp_file(temp_file)
+            self.encryptor.decrypt_file(self.encrypted_file_path, output_path=self.temp_decrypted_path)
+            with open(self.temp_decrypted_path, 'rb') as f:
+                self.assertEqual(f.read(), content[:30])
+        finally:
+            self.encryptor.cleanup_all_temp_files()
+    
+    def test_compressed_round_trip(self):
+        """Test that zlib and lzma compressed files decrypt to the original and are smaller."""
+        content = b"timestamp,user,action\n" + b"2024-01-01,alice,open\n" * 5000
+        with open(self.test_file_path, 'wb') as f:
+            f.write(content)
+        
+        for codec in ('zlib', 'lzma'):
+            self.encryptor.encrypt_file(self.test_file_path, codec=codec, chunk_size=1024)
+            with open(self.encrypted_file_path, 'rb') as f:
+                self.assertEqual(HEADER.unpack(f.read(HEADER.size))[2], encryption.get_codec(codec).id)
+            self.assertLess(os.path.getsize(self.encrypted_file_path), len(content) // 10)
+            
+            self.encryptor.decrypt_file(self.encrypted_file_path, output_path=self.temp_decrypted_path)
+            with open(self.temp_decrypted_path, 'rb') as f:
+                self.assertEqual(f.read(), content)
+        
+        # Compressed files can only be read sequentially
+        with self.assertRaises(ValueError):
+            self.encryptor.open_encrypted(self.encrypted_file_path)
+    
+    def test_auto_codec_skips_incompressible_files(self):
+        """Test that 'auto' compresses text but not random data or known compressed types."""
+        text_path = os.path.join(self.test_dir, "report.csv")
+        with open(text_path, 'w') as f:
+            f.write("a,b,c\n" * 1000)
+        random_path = os.path.join(self.test_dir, "random.bin")
+        with open(random_path, 'wb') as f:
+            f.write(os.urandom(8192))
+        photo_path = os.path.join(self.test_dir, "photo.jpg")
+        shutil.copy(text_path, photo_path)
+        
+        self.assertEqual(encryption.choose_codec(text_path).name, 'zlib')
+        self.assertEqual(encryption.choose_codec(random_path).name, 'none')
+        self.assertEqual(encryption.choose_codec(photo_path).name, 'none')
+        
+        self.encryptor.encrypt_file(random_path, codec='auto')
+        self.assertEqual(encryption.detect_format(random_path + '.enc'), encryption.FORMAT_VERSION)
+        with self.encryptor.open_encrypted(random_path + '.enc') as reader:
+            self.assertEqual(reader.size, 8192)
+    
+    def test_registered_codec_is_used(self):
+        """Test that a codec added to the registry round-trips through encryption."""
+        import bz2
+        try:
+            encryption.register_codec(200, 'bz2-test', bz2.BZ2Compressor, bz2.BZ2Decompressor)
+            self.encryptor.encrypt_file(self.test_file_path, codec='bz2-test')
+            self.encryptor.decrypt_file(self.encrypted_file_path, output_path=self.temp_decrypted_path)
+            with open(self.temp_decrypted_path, 'r') as f:
+                self.assertIn("This is test content", f.read())
+            with self.assertRaises(ValueError):
+                encryption.register_codec(200, 'other', bz2.BZ2Compressor, bz2.BZ2Decompressor)
+        finally:
+            encryption._codecs.pop(200, None)
+    
+    def test_compressed_temp_file_keeps_codec_when_rewritten(self):
+        """Test that editing a compressed file re-encrypts it with the same codec."""
+        self.encryptor.encrypt_file(self.test_file_path, codec='zlib')
+        temp_file = self.encryptor.decrypt_file(self.encrypted_file_path, temp=True)
+        try:
+            self.assertEqual(self.encryptor.sync_temp_file(temp_file), 0)
+            with open(temp_file, 'a') as f:
+                f.write(" More text.")
+            self.encryptor.sync_temp_file(temp_file)
+            
+            with open(self.encrypted_file_path, 'rb') as f:
+                self.assertEqual(HEADER.unpack(f.read(HEADER.size))[2], encryption.get_codec('zlib').id)
+            self.encryptor.decrypt_file(self.encrypted_file_path, output_path=self.temp_decrypted_path)
+            with open(self.temp_decrypted_path, 'r') as f:
+                self.assertTrue(f.read().endswith("More text."))
+        finally:
+            self.encryptor.cleanup_all_temp_files()
+    
+    def test_legacy_temp_file_rewritten_only_when_changed(self):
+        """Test that a viewed legacy file stays as is and an edited one is upgraded."""
+        key = self.encryptor.derive_key()
+        nonce = get_random_bytes(16)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        ciphertext, tag = cipher.encrypt_and_digest(b"legacy content")
+        with open(self.encrypted_file_path, 'wb') as f:
+            f.write(nonce + tag + ciphertext)
+        
+        temp_file = self.encryptor.decrypt_file(self.encrypted_file_path, temp=True)
+        try:
+            self.assertEqual(self.encryptor.sync_temp_file(temp_file), 0)
+            self.assertEqual(encryption.detect_format(self.encrypted_file_path), 1)
+            
+            with open(temp_file, 'wb') as f:
+                f.write(b"edited legacy content")
+            self.assertEqual(self.encryptor.sync_temp_file(temp_file), 1)
+            self.assertEqual(encryption.detect_format(self.encrypted_file_path), encryption.FORMAT_VERSION)
+        finally:
+            self.encryptor.cleanup_all_temp_files()
+    
 
 
 if __name__ == '__main__':
@@ -0,0 +1,100 @@
+import unittest
+import os
+import csv
+import gzip
+import json
+import tempfile
+import shutil
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from database import DatabaseQueue, migrate
+from export import export_logs, export_format
+
+
+class TestLogExport(unittest.TestCase):
+    """Test cases for streaming log exports."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_queue = DatabaseQueue(os.path.join(self.test_dir, "test.db"))
+        self.db_queue.execute(migrate).result(timeout=5)
+
+        def populate(conn):
+            conn.executemany("INSERT INTO users (username, password) VALUES (?, 'x')", [("alice",), ("bob",)])
+            rows = []
+            for i in range(2500):
+                rows.append((f"2026-03-{1 + i // 1000:02d} 08:00:{i % 60:02d}", "alice" if i % 2 else "bob",
+                             "CREATE", "FILE", f"/docs/{i}, \"quoted\".txt", None))
+            conn.executemany("INSERT INTO user_activity (timestamp, username, action_type, item_type, "
+                             "item_path, details) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT INTO logs (timestamp, action, old_path, new_path, username) "
+                         "VALUES ('2026-03-01 09:00:00', 'MOVE', '/a', '/b', 'alice')")
+            conn.commit()
+        self.db_queue.execute(populate).result(timeout=5)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def export(self, name, **kwargs):
+        path = os.path.join(self.test_dir, name)
+        count = export_logs(path, queue=self.db_queue, **kwargs).result(timeout=10)
+        return path, count
+
+    def test_compressed_csv_round_trip(self):
+        """Every row is exported, in order, with CSV quoting intact."""
+        batches = []
+        path, count = self.export("audit.csv.gz", batch_size=400, progress_callback=batches.append)
+
+        with gzip.open(path, "rt", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(count, 2500)
+        self.assertEqual(rows[0], ["id", "timestamp", "username", "action_type", "item_type",
+                                   "item_path", "details"])
+        self.assertEqual(len(rows) - 1, 2500)
+        self.assertEqual(rows[1][5], '/docs/0, "quoted".txt')
+        self.assertEqual([row[1] for row in rows[1:]], sorted(row[1] for row in rows[1:]))
+        self.assertEqual(batches[-1], 2500)
+        self.assertEqual(len(batches), 7)
+
+    def test_jsonl_with_filters(self):
+        """User and date filters are applied, and each line is one JSON object."""
+        path, count = self.export("audit.jsonl", username="alice", since="2026-03-02", until="2026-03-03")
+
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(count, 500)
+        self.assertEqual(len(records), 500)
+        self.assertTrue(all(r["username"] == "alice" and r["timestamp"].startswith("2026-03-02")
+                            for r in records))
+        self.assertIsNone(records[0]["details"])
+
+    def test_logs_table_export(self):
+        """The file operation log can be exported too."""
+        path, count = self.export("ops.csv", table="logs")
+        self.assertEqual(count, 1)
+        with open(path, newline="") as f:
+            self.assertEqual(list(csv.reader(f))[1][3:], ["MOVE", "/a", "/b"])
+
+    def test_failed_export_leaves_no_file(self):
+        """A failing export removes its partial output."""
+        path = os.path.join(self.test_dir, "broken.csv")
+
+        def fail(written):
+            raise RuntimeError("disk full")
+
+        with self.assertRaises(RuntimeError):
+            export_logs(path, queue=self.db_queue, progress_callback=fail).result(timeout=10)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_format_from_extension(self):
+        """The export format follows the file extension."""
+        self.assertEqual(export_format("a.CSV.gz"), ("csv", True))
+        self.assertEqual(export_format("a.jsonl"), ("jsonl", False))
+        with self.assertRaises(ValueError):
+            export_format("a.xlsx")
+
+
+if __name__ == '__main__':
+    unittest.main()
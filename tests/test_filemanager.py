@@ -2,10 +2,10 @@ import unittest
 import os
 import shutil
 import tempfile
+import json
 import subprocess
 from unittest.mock import patch, MagicMock
 from io import StringIO
-import sqlite3
 import sys
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
 
@@ -22,15 +22,9 @@ class TestFileManager(unittest.TestCase):
         self.bin_dir = tempfile.mkdtemp()
         self.archive_dir = tempfile.mkdtemp()
         
-        # Create a test database connection
-        test_db_path = os.path.join(self.test_dir, 'test_filemanager.db')
-        
-        # Create a FileManager instance with test database
+        # Create a FileManager instance
         self.file_manager = FileManager("test_user", self.bin_dir, self.archive_dir)
         
-        # Override the database connection for testing
-        self.file_manager.db_connection = sqlite3.connect(test_db_path, isolation_level=None)
-        
         # Create test files and folders
         self.test_file = os.path.join(self.test_dir, "test_file.txt")
         with open(self.test_file, "w") as f:
@@ -174,17 +168,13 @@ class TestFileManager(unittest.TestCase):
         new_path = os.path.join(self.test_dir, new_name)
         print(f"Old path: {self.test_file}, New path: {new_path}")
         
-        # Mock the database connection and cursor
-        with patch.object(self.file_manager, 'db_connection') as mock_conn:
-            mock_cursor = mock_conn.cursor.return_value
-            
-            success, path = self.file_manager.rename_item(self.test_file, new_name)
-            print(f"Success: {success}, Path: {path}")
-            
-            self.assertTrue(success)
-            self.assertEqual(path, new_path)
-            self.assertFalse(os.path.exists(self.test_file))
-            self.assertTrue(os.path.exists(new_path))
+        success, path = self.file_manager.rename_item(self.test_file, new_name)
+        print(f"Success: {success}, Path: {path}")
+        
+        self.assertTrue(success)
+        self.assertEqual(path, new_path)
+        self.assertFalse(os.path.exists(self.test_file))
+        self.assertTrue(os.path.exists(new_path))
 
     
     def test_rename_item_conflict(self):
@@ -270,6 +260,29 @@ class TestFileManager(unittest.TestCase):
         
         self.assertTrue(found)
         self.assertEqual(len(results), 2)  # Should find both files
+    
+    def test_import_legacy_access_logs(self):
+        """Test merging both legacy access logs, keeping the latest time per path."""
+        home_log = os.path.join(self.test_dir, "home_log.json")
+        cwd_log = os.path.join(self.test_dir, "cwd_log.json")
+        with open(home_log, "w") as f:
+            json.dump({"/docs/a.txt": 100.0, "/docs/b.txt": 300.0}, f)
+        with open(cwd_log, "w") as f:
+            json.dump({"/docs/a.txt": 200.0, "/docs/c.txt": 50.0}, f)
+        
+        with patch('filemanager.file_access') as mock_access:
+            mock_access.record_many_async.return_value.result.return_value = 3
+            count = self.file_manager.import_legacy_access_log([home_log, cwd_log, home_log])
+        
+        self.assertEqual(count, 3)
+        mock_access.record_many_async.assert_called_once()
+        username, accesses = mock_access.record_many_async.call_args[0]
+        self.assertEqual(username, "test_user")
+        self.assertEqual(sorted(accesses),
+                         [("/docs/a.txt", 200.0), ("/docs/b.txt", 300.0), ("/docs/c.txt", 50.0)])
+        for log_path in (home_log, cwd_log):
+            self.assertFalse(os.path.exists(log_path))
+            self.assertTrue(os.path.exists(log_path + ".imported"))
 
 if __name__ == '__main__':
     unittest.main()
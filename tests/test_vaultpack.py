@@ -0,0 +1,197 @@
+import unittest
+import os
+import tempfile
+import shutil
+from unittest.mock import patch
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from encryption import FileEncryptor
+from encryption import HEADER, CHUNK_OVERHEAD
+from vaultpack import VaultPack, pack_directory, member_name
+
+
+class TestVaultPack(unittest.TestCase):
+    """Test cases for the encrypted pack container."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.encryptor = FileEncryptor()
+        self.encryptor.key_file = os.path.join(self.test_dir, "keys.json")
+        self.encryptor.set_master_password("test_password")
+
+        self.source_dir = os.path.join(self.test_dir, "documents")
+        self.contents = {}
+        for i in range(30):
+            relative = os.path.join("sub" if i % 3 == 0 else "", f"note_{i}.txt")
+            path = os.path.join(self.source_dir, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = f"note {i}\n".encode() * (i + 1)
+            with open(path, "wb") as f:
+                f.write(data)
+            self.contents[relative.replace(os.sep, "/")] = data
+        self.pack_path = os.path.join(self.test_dir, "documents.dvpack")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_pack_directory_round_trip(self):
+        """Every file comes back out of the pack unchanged."""
+        result = pack_directory(self.encryptor, self.source_dir, self.pack_path)
+        self.assertEqual(len(result["packed"]), 30)
+        self.assertEqual(result["failed"], [])
+
+        with open(self.pack_path, "rb") as f:
+            self.assertNotIn(b"note 1", f.read())
+
+        output_dir = os.path.join(self.test_dir, "restored")
+        with VaultPack(self.pack_path, self.encryptor) as pack:
+            self.assertEqual(sorted(pack.names()), sorted(self.contents))
+            pack.extract_all(output_dir)
+        for name, data in self.contents.items():
+            with open(os.path.join(output_dir, *name.split("/")), "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    def test_reading_one_member_decrypts_only_its_chunks(self):
+        """Extracting a member leaves the other members' chunks untouched."""
+        with VaultPack(self.pack_path, self.encryptor, mode="w", chunk_size=16) as pack:
+            for name, data in self.contents.items():
+                pack.add_bytes(name, data)
+
+        with VaultPack(self.pack_path, self.encryptor) as pack:
+            with patch.object(pack, "_open_record", wraps=pack._open_record) as mock_open:
+                self.assertEqual(pack.read("note_5.txt"), self.contents["note_5.txt"])
+            expected_chunks = -(-len(self.contents["note_5.txt"]) // 16)
+            self.assertEqual(mock_open.call_count, expected_chunks)
+
+    def test_append_adds_and_replaces_members(self):
+        """Appending keeps existing members readable and replaces same-named ones."""
+        with VaultPack(self.pack_path, self.encryptor, mode="w") as pack:
+            pack.add_bytes("a.txt", b"first")
+            pack.add_bytes("b.txt", b"second")
+
+        with VaultPack(self.pack_path, self.encryptor, mode="a") as pack:
+            pack.add_bytes("c.txt", b"third")
+            pack.add_bytes("a.txt", b"first, edited")
+
+        with VaultPack(self.pack_path, self.encryptor) as pack:
+            self.assertEqual(pack.names(), ["b.txt", "c.txt", "a.txt"])
+            self.assertEqual(pack.read("a.txt"), b"first, edited")
+            self.assertEqual(pack.read("b.txt"), b"second")
+            self.assertEqual(pack.read("c.txt"), b"third")
+
+    def test_failed_append_keeps_previous_index(self):
+        """An append that raises is rolled back to the last committed pack."""
+        with VaultPack(self.pack_path, self.encryptor, mode="w") as pack:
+            pack.add_bytes("a.txt", b"first")
+        size = os.path.getsize(self.pack_path)
+
+        with self.assertRaises(RuntimeError):
+            with VaultPack(self.pack_path, self.encryptor, mode="a") as pack:
+                pack.add_bytes("b.txt", b"second")
+                raise RuntimeError("interrupted")
+
+        self.assertEqual(os.path.getsize(self.pack_path), size)
+        with VaultPack(self.pack_path, self.encryptor) as pack:
+            self.assertEqual(pack.names(), ["a.txt"])
+
+    def test_crashed_append_keeps_previous_index(self):
+        """A pack left without its new index by a crash reopens at the last committed state."""
+        with VaultPack(self.pack_path, self.encryptor, mode="w", chunk_size=16) as pack:
+            pack.add_bytes("a.txt", b"first")
+        size = os.path.getsize(self.pack_path)
+
+        # Member data reaches the disk, then the process dies before close()
+        pack = VaultPack(self.pack_path, self.encryptor, mode="a")
+        pack.add_bytes("b.txt", os.urandom(64 * 1024))
+        pack._file.close()
+        self.assertGreater(os.path.getsize(self.pack_path), size)
+
+        # Small scan blocks so the backwards search crosses block boundaries
+        with patch("vaultpack.SCAN_BLOCK_SIZE", 1000), VaultPack(self.pack_path, self.encryptor) as pack:
+            self.assertEqual(pack.names(), ["a.txt"])
+            self.assertEqual(pack.read("a.txt"), b"first")
+
+        with VaultPack(self.pack_path, self.encryptor, mode="a") as pack:
+            self.assertEqual(os.path.getsize(self.pack_path), size)
+            pack.add_bytes("c.txt", b"third")
+        with VaultPack(self.pack_path, self.encryptor) as pack:
+            self.assertEqual(pack.names(), ["a.txt", "c.txt"])
+            self.assertEqual(pack.read("c.txt"), b"third")
+
+    def test_tampering_is_detected(self):
+        """Swapping member data or altering the index fails authentication."""
+        with VaultPack(self.pack_path, self.encryptor, mode="w") as pack:
+            first = pack.add_bytes("a.txt", b"A" * 32)
+            second = pack.add_bytes("b.txt", b"B" * 32)
+
+        # Copy b's record over a's: same length, wrong member id
+        with open(self.pack_path, "r+b") as f:
+            f.seek(second.offset)
+            record = f.read(second.offset - first.offset)
+            f.seek(first.offset)
+            f.write(record)
+        with VaultPack(self.pack_path, self.encryptor) as pack:
+            with self.assertRaises(ValueError):
+                pack.read("a.txt")
+
+        with open(self.pack_path, "r+b") as f:
+            f.seek(-30, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-30, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 1]))
+        with self.assertRaises(ValueError):
+            VaultPack(self.pack_path, self.encryptor)
+
+    def test_records_spliced_between_packs_fail(self):
+        """Member records and indexes copied from another pack under the same key are rejected."""
+        other_path = os.path.join(self.test_dir, "other.dvpack")
+        for path, data in ((self.pack_path, b"A" * 32), (other_path, b"B" * 32)):
+            with VaultPack(path, self.encryptor, mode="w") as pack:
+                member = pack.add_bytes("a.txt", data)
+        record_end = member.offset + 32 + CHUNK_OVERHEAD
+        with open(self.pack_path, "rb") as f:
+            header = f.read(HEADER.size)
+            body = f.read()
+        with open(other_path, "rb") as f:
+            other_body = f.read()[HEADER.size:]
+
+        # The other pack's members and index behind this pack's header
+        with open(self.pack_path, "wb") as f:
+            f.write(header + other_body)
+        with self.assertRaises(ValueError):
+            VaultPack(self.pack_path, self.encryptor)
+
+        # Only the other pack's member data, keeping this pack's index
+        with open(self.pack_path, "wb") as f:
+            f.write(header + other_body[:record_end - HEADER.size] + body[record_end - HEADER.size:])
+        with VaultPack(self.pack_path, self.encryptor) as pack:
+            with self.assertRaises(ValueError):
+                pack.read("a.txt")
+
+    def test_failed_rewrite_keeps_existing_pack(self):
+        """Rewriting a pack that raises leaves the previous pack in place."""
+        with VaultPack(self.pack_path, self.encryptor, mode="w") as pack:
+            pack.add_bytes("a.txt", b"first")
+
+        with self.assertRaises(RuntimeError):
+            with VaultPack(self.pack_path, self.encryptor, mode="w") as pack:
+                pack.add_bytes("b.txt", b"second")
+                raise RuntimeError("interrupted")
+
+        self.assertEqual(os.listdir(self.test_dir).count("documents.dvpack"), 1)
+        self.assertFalse([name for name in os.listdir(self.test_dir) if name.endswith(".part")])
+        with VaultPack(self.pack_path, self.encryptor) as pack:
+            self.assertEqual(pack.names(), ["a.txt"])
+            self.assertEqual(pack.read("a.txt"), b"first")
+
+    def test_member_names_cannot_escape(self):
+        """Absolute paths and parent references are rejected."""
+        self.assertEqual(member_name("./a\\b/c.txt"), "a/b/c.txt")
+        for bad in ("../evil.txt", "/etc/passwd", "a/../../b", ""):
+            with self.assertRaises(ValueError):
+                member_name(bad)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import os
+import tempfile
+import shutil
+import threading
+import time
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from watcher import FileWatcher, TimerWheel
+
+
+class TestTimerWheel(unittest.TestCase):
+    """Test cases for the hashed timer wheel."""
+
+    def test_timers_expire_in_order(self):
+        """Timers fire once their deadline has passed, not before."""
+        wheel = TimerWheel(resolution=1.0, slots=8, now=0)
+        wheel.schedule("a", 3, now=0)
+        wheel.schedule("b", 20, now=0)
+
+        self.assertEqual(wheel.next_deadline(), 3.0)
+        self.assertEqual(wheel.advance(now=2.5), [])
+        self.assertEqual(wheel.advance(now=3.0), ["a"])
+        # "b" shares slots with earlier ticks but is several rotations away
+        self.assertEqual(wheel.advance(now=19.9), [])
+        self.assertEqual(wheel.advance(now=25), ["b"])
+        self.assertEqual(len(wheel), 0)
+        self.assertIsNone(wheel.next_deadline())
+
+    def test_reschedule_and_cancel(self):
+        """Rescheduling pushes a timer back; cancelling removes it."""
+        wheel = TimerWheel(resolution=1.0, slots=8, now=0)
+        wheel.schedule("a", 2, now=0)
+        wheel.schedule("a", 2, now=1.5)
+        self.assertEqual(wheel.advance(now=2.5), [])
+        self.assertEqual(wheel.advance(now=4), ["a"])
+
+        wheel.schedule("b", 1, now=4)
+        self.assertTrue(wheel.cancel("b"))
+        self.assertFalse(wheel.cancel("b"))
+        self.assertEqual(wheel.advance(now=10), [])
+
+
+class TestFileWatcher(unittest.TestCase):
+    """Test cases for the shared inactivity watcher."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "opened.txt")
+        with open(self.path, "w") as f:
+            f.write("content")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _assert_fires_after_activity_stops(self, watcher):
+        fired = []
+        done = threading.Event()
+
+        def on_idle(path):
+            fired.append((path, time.monotonic()))
+            done.set()
+
+        watcher.watch(self.path, on_idle, inactivity=0.6)
+        # Keep writing for a while; the timer must keep being pushed back
+        last_write = None
+        for i in range(5):
+            time.sleep(0.25)
+            with open(self.path, "a") as f:
+                f.write(str(i))
+            last_write = time.monotonic()
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(len(fired), 1)
+        self.assertEqual(fired[0][0], self.path)
+        self.assertGreaterEqual(fired[0][1] - last_write, 0.5)
+        self.assertFalse(watcher.is_watching(self.path))
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "inotify is Linux only")
+    def test_inotify_watcher(self):
+        """Writes reset the inactivity timer and the callback fires once."""
+        watcher = FileWatcher(resolution=0.1)
+        try:
+            self._assert_fires_after_activity_stops(watcher)
+            self.assertTrue(watcher.uses_inotify)
+        finally:
+            watcher.stop()
+
+    def test_polling_fallback(self):
+        """Without inotify, modification times are polled on the same thread."""
+        watcher = FileWatcher(poll_interval=0.1, resolution=0.1, use_inotify=False)
+        try:
+            self._assert_fires_after_activity_stops(watcher)
+            self.assertFalse(watcher.uses_inotify)
+        finally:
+            watcher.stop()
+
+    def test_many_files_share_one_thread(self):
+        """Watching many files does not start more threads."""
+        watcher = FileWatcher(resolution=0.1)
+        try:
+            before = threading.active_count()
+            paths = []
+            for i in range(20):
+                path = os.path.join(self.test_dir, f"file_{i}.txt")
+                open(path, "w").close()
+                watcher.watch(path, lambda p: None, inactivity=30)
+                paths.append(path)
+            self.assertEqual(len(watcher), 20)
+            self.assertLessEqual(threading.active_count(), before + 1)
+
+            watcher.unwatch(paths[0])
+            self.assertFalse(watcher.is_watching(paths[0]))
+        finally:
+            watcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()